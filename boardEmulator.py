@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+#
+# software board emulator: answers the rio frames over UDP like the W5500 / ESP32 bridge
+#
+# python3 boardEmulator.py configs/Tangoboard/config.json --port 2390
+# python3 boardEmulator.py configs/Tangoboard/config.json --shm /dev/shm/rio
+#
+# steppers integrate jointFreqCmd into jointFeedback at PRU_OSC,
+# vouts are echoed to the vins and douts to the dins,
+# with a rotating sub-frame the answer carries the slot of the command,
+# with a crc frames with a wrong crc are dropped and counted like by the gateware,
+# with a sequence number the answer echoes the one of the command
+#
+
+import argparse
+import contextlib
+import io
+import os
+import socket
+import time
+
+import projectLoader
+from frameLayout import PRU_DATA, PRU_READ, PRU_WRITE, FrameCodec, crc
+from transport import SHM_SPINS, ShmMailbox
+
+
+def wrap(value, bits):
+    """value as signed integer of the given width"""
+    value &= (1 << bits) - 1
+    if value >= 1 << (bits - 1):
+        value -= 1 << bits
+    return value
+
+
+class BoardEmulator:
+    """state of an emulated board, exchange() answers one frame"""
+
+    def __init__(self, project):
+        self.command = FrameCodec(project["frame_layout"], "rx")
+        self.feedback = FrameCodec(project["frame_layout"], "tx")
+        self.osc = int(project["jdata"]["clock"]["speed"])
+        self.steppers = [jtype == "joint_stepper" for jtype in project["jointtypes"]]
+        self.vin_bits = [vin.get("_bits", 32) for vin in project["vinnames"]]
+        self.freq_cmd = [0] * project["joints"]
+        self.enable = [0] * project["joints"]
+        self.position = [0.0] * project["joints"]
+        self.values = {
+            "header": [PRU_DATA],
+            "joint": [0] * project["joints"],
+            "vin": [0] * project["vins"],
+            "bin": [b""] * project["bins"],
+            "din": [0] * project["dins"],
+            "slot": [0],
+            "sequence": [0],
+            "crc": [0],
+        }
+        self.last = time.perf_counter()
+        self.frames = 0
+        self.errors = 0
+
+    def step(self, duration):
+        """runs the step generators for duration seconds"""
+        for num, cmd in enumerate(self.freq_cmd):
+            if cmd == 0 or not self.enable[num] or not self.steppers[num]:
+                continue
+            # joint_stepper toggles STP every abs(cmd) + 1 clocks, two toggles per step
+            steps = duration * self.osc / (2 * (abs(cmd) + 1))
+            if cmd > 0:
+                self.position[num] += steps
+            else:
+                self.position[num] -= steps
+            self.values["joint"][num] = wrap(int(self.position[num]), 32)
+
+    def exchange(self, data):
+        """the answer frame, None for unknown headers (ignored like by the bridge)"""
+        now = time.perf_counter()
+        self.step(now - self.last)
+        self.last = now
+
+        if self.command.crc and crc(data[: self.command.size], self.command.crc):
+            self.values["crc"] = [wrap(self.values["crc"][0] + 1, 8)]
+            self.frames += 1
+            return self.feedback.encode(self.values)
+
+        header = int.from_bytes(data[:4], "little")
+        if header not in (PRU_READ, PRU_WRITE):
+            self.errors += 1
+            return None
+        if header == PRU_WRITE:
+            try:
+                values = self.command.decode(data)
+            except ValueError:
+                self.errors += 1
+                return None
+            self.freq_cmd = values.get("joint", [])
+            self.enable = values.get("enable", [])
+            vins = self.values["vin"]
+            for num, vout in enumerate(values.get("vout", [])[: len(vins)]):
+                # None: slow vout of another slot
+                if vout is not None:
+                    vins[num] = wrap(vout, self.vin_bits[num])
+            dins = self.values["din"]
+            for num, dout in enumerate(values.get("dout", [])[: len(dins)]):
+                dins[num] = dout
+            self.values["slot"] = values.get("slot", [0])
+            self.values["sequence"] = values.get("sequence", [0])
+        self.frames += 1
+        return self.feedback.encode(self.values)
+
+
+def serve(emulator, host, port, stats=False):
+    sock = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+    sock.bind((host, port))
+    buffer = bytearray(65536)
+    view = memoryview(buffer)
+    print(f"listening on {host}:{port}")
+    last_frames = 0
+    last_report = time.perf_counter()
+    while True:
+        size, address = sock.recvfrom_into(buffer)
+        answer = emulator.exchange(view[:size])
+        if answer is not None:
+            sock.sendto(answer, address)
+        if stats and time.perf_counter() - last_report >= 1.0:
+            now = time.perf_counter()
+            rate = (emulator.frames - last_frames) / (now - last_report)
+            print(f"{rate:.0f} frames/s, {emulator.errors} errors, feedback {emulator.values['joint']}")
+            last_frames = emulator.frames
+            last_report = now
+
+
+def serve_shm(emulator, filename, stats=False):
+    mailbox = ShmMailbox(filename, emulator.command.size)
+    print(f"serving {filename}")
+    last_frames = 0
+    last_report = time.perf_counter()
+    idle = 0
+    while True:
+        data = mailbox.pending()
+        if data is None:
+            idle += 1
+            if idle > SHM_SPINS:
+                os.sched_yield()
+        else:
+            idle = 0
+            answer = emulator.exchange(data)
+            # unknown headers are answered anyway, the host is waiting for the sequence
+            mailbox.answer(answer if answer is not None else bytes(emulator.command.size))
+        if stats and time.perf_counter() - last_report >= 1.0:
+            now = time.perf_counter()
+            rate = (emulator.frames - last_frames) / (now - last_report)
+            print(f"{rate:.0f} frames/s, {emulator.errors} errors, feedback {emulator.values['joint']}")
+            last_frames = emulator.frames
+            last_report = now
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("json", help="json config", type=str, default=None)
+    parser.add_argument("--host", help="listen address", type=str, default="0.0.0.0")
+    parser.add_argument("--port", "-p", help="udp port", type=int, default=2390)
+    parser.add_argument("--shm", help="serve a shared memory mailbox instead of udp (/dev/shm/rio)", type=str, default=None)
+    parser.add_argument("--stats", "-s", help="print the frame rate every second", action="store_true")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        project = projectLoader.load(args.json)
+    try:
+        if args.shm:
+            serve_shm(BoardEmulator(project), args.shm, args.stats)
+        else:
+            serve(BoardEmulator(project), args.host, args.port, args.stats)
+    except KeyboardInterrupt:
+        pass
@@ -3,14 +3,60 @@
 #
 
 import argparse
+import collections
+import concurrent.futures
+import contextlib
+import io
+import json
 import os
+import subprocess
+import time
 
+import profiler
 import projectLoader
+from fileWriter import changed_files, copy_file, copy_files, make_dirs, write_file
 
 
-def main(configfile, outputdir=None):
+def run_generator(project, generator, parent=None):
+    start = time.perf_counter()
+    with profiler.span(generator, cat="generator", parent=parent):
+        project["generators"][generator].generate(project)
+    return time.perf_counter() - start
 
-    project = projectLoader.load(configfile)
+
+def run_generators(project):
+    """runs the generators in a thread pool, each one as soon as the generators in its 'requires' list are done"""
+    pending = {
+        generator: set(getattr(module, "requires", [])) & set(project["generators"])
+        for generator, module in project["generators"].items()
+    }
+    running = {}
+    done = set()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(pending) or 1) as pool:
+        while pending or running:
+            for generator, requires in list(pending.items()):
+                if requires <= done:
+                    future = pool.submit(
+                        run_generator, project, generator, profiler.current()
+                    )
+                    running[future] = generator
+                    del pending[generator]
+            if not running:
+                print(f"ERROR: unresolvable generator dependencies: {pending}")
+                exit(1)
+            finished, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in finished:
+                generator = running.pop(future)
+                duration = future.result()
+                done.add(generator)
+                print(f"{generator} done in {duration:.3f}s")
+
+
+def main(configfile, outputdir=None, cache=True):
+
+    project = projectLoader.load(configfile, cache=cache)
 
     # file structure
     if outputdir:
@@ -24,16 +70,18 @@ def main(configfile, outputdir=None):
     project["SOURCE_PATH"] = f"{project['GATEWARE_PATH']}"
     project["PINS_PATH"] = f"{project['GATEWARE_PATH']}"
     project["LINUXCNC_PATH"] = f"{project['OUTPUT_PATH']}/LinuxCNC"
-    os.system(f"mkdir -p {project['OUTPUT_PATH']}")
-    os.system(f"mkdir -p {project['SOURCE_PATH']}")
-    os.system(f"mkdir -p {project['PINS_PATH']}")
-    os.system(f"mkdir -p {project['LINUXCNC_PATH']}")
-    os.system(f"mkdir -p {project['LINUXCNC_PATH']}/Components/")
-    os.system(f"mkdir -p {project['LINUXCNC_PATH']}/ConfigSamples/rio")
-    os.system(f"mkdir -p {project['LINUXCNC_PATH']}/ConfigSamples/rio/subroutines")
-    os.system(f"mkdir -p {project['LINUXCNC_PATH']}/ConfigSamples/rio/m_codes")
-    os.system(
-        f"cp -a files/subroutines/* {project['LINUXCNC_PATH']}/ConfigSamples/rio/subroutines"
+    make_dirs(
+        project["OUTPUT_PATH"],
+        project["SOURCE_PATH"],
+        project["PINS_PATH"],
+        f"{project['LINUXCNC_PATH']}/Components",
+        f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/subroutines",
+        f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/m_codes",
+    )
+    copy_files(
+        project,
+        "files/subroutines/*",
+        f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/subroutines",
     )
 
     if project["verilog_defines"]:
@@ -41,14 +89,14 @@ def main(configfile, outputdir=None):
         for key, value in project["verilog_defines"].items():
             verilog_defines.append(f"`define {key} {value}")
         verilog_defines.append("")
-        open(f"{project['SOURCE_PATH']}/defines.v", "w").write(
-            "\n".join(verilog_defines)
+        write_file(
+            project, f"{project['SOURCE_PATH']}/defines.v", "\n".join(verilog_defines)
         )
         project["verilog_files"].append("defines.v")
 
     if project["gateware_extrafiles"]:
         for filename, content in project["gateware_extrafiles"].items():
-            open(f"{project['SOURCE_PATH']}/{filename}", "w").write(content)
+            write_file(project, f"{project['SOURCE_PATH']}/{filename}", content)
 
     for plugin in project["plugins"]:
         if hasattr(project["plugins"][plugin], "ips"):
@@ -60,7 +108,7 @@ def main(configfile, outputdir=None):
                 ipv_path = f"plugins/{plugin}/{ipv}"
                 if not os.path.isfile(ipv_path):
                     ipv_path = f"generators/gateware/{ipv}"
-                os.system(f"cp -a {ipv_path} {project['SOURCE_PATH']}/{ipv_name}")
+                copy_file(project, ipv_path, f"{project['SOURCE_PATH']}/{ipv_name}")
                 """
                 if ipv.endswith(".v") and not ipv.startswith("PLL_"):
                     os.system(
@@ -74,18 +122,138 @@ def main(configfile, outputdir=None):
                 component_path = f"plugins/{plugin}/{component}"
                 if not os.path.isfile(component_path):
                     component_path = f"generators/firmware/{component}"
-                os.system(
-                    f"cp -a {component_path} {project['LINUXCNC_PATH']}/Components/{component}"
+                copy_file(
+                    project,
+                    component_path,
+                    f"{project['LINUXCNC_PATH']}/Components/{component}",
                 )
 
     print(f"generating files in {project['OUTPUT_PATH']}")
 
-    for generator in project["generators"]:
-        if generator != "documentation":
-            project["generators"][generator].generate(project)
-    for generator in project["generators"]:
-        if generator == "documentation":
-            project["generators"][generator].generate(project)
+    with profiler.span("generators"):
+        run_generators(project)
+
+    # backup active configuration (after the generators, linuxcnc_config adds the axis names)
+    write_file(
+        project,
+        f"{project['SOURCE_PATH']}/config.json",
+        json.dumps(project["jdata"], indent=2),
+    )
+
+    changed = changed_files(project)
+    print(f"{len(changed)} of {len(project['output_files'])} files changed")
+    for filename in changed:
+        print(f"  {filename}")
+
+    return project
+
+
+def output_paths(configfiles):
+    """default output directory per config, configs sharing a name get the config filename appended"""
+    names = {}
+    for configfile in configfiles:
+        try:
+            name = json.loads(open(configfile, "r").read())["name"]
+        except Exception:
+            name = configfile.split("/")[-1]
+        names[configfile] = name.replace(" ", "_").replace("/", "_")
+    counts = collections.Counter(names.values())
+    paths = {}
+    for configfile, name in names.items():
+        if counts[name] > 1:
+            name = f"{name}-{configfile.split('/')[-1].rsplit('.', 1)[0]}"
+        paths[configfile] = f"Output/{name}"
+    return paths
+
+
+def build_config(configfile, outputdir, cache=True, make=False):
+    result = {
+        "config": configfile,
+        "output": outputdir,
+        "status": "ok",
+        "changed": 0,
+        "generate_time": 0.0,
+        "build_time": None,
+    }
+
+    log = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log):
+            project = main(configfile, outputdir, cache=cache)
+        result["changed"] = len(changed_files(project))
+    except (Exception, SystemExit) as error:
+        result["status"] = "generate failed"
+        result["error"] = f"{error.__class__.__name__}: {error}"
+    result["generate_time"] = round(time.perf_counter() - start, 3)
+    make_dirs(outputdir)
+    open(f"{outputdir}/generate.log", "w").write(log.getvalue())
+
+    if make and result["status"] == "ok":
+        gateware_path = f"{outputdir}/Gateware"
+        target = "all"
+        if "gowin_build" in open(f"{gateware_path}/Makefile", "r").read():
+            target = "gowin_build"
+        start = time.perf_counter()
+        with open(f"{gateware_path}/build.log", "w") as logfile:
+            returncode = subprocess.run(
+                ["make", target],
+                cwd=gateware_path,
+                stdout=logfile,
+                stderr=subprocess.STDOUT,
+            ).returncode
+        result["build_time"] = round(time.perf_counter() - start, 3)
+        if returncode != 0:
+            result["status"] = "build failed"
+            result["error"] = f"make {target} returned {returncode}"
+
+    return result
+
+
+def main_all(configfiles, jobs=None, cache=True, make=False, summary=None):
+    """generates (and optionally builds) a list of configs in a shared process pool"""
+    # load the plugin registry and the generators once, the forked workers inherit them
+    projectLoader.plugin_types()
+    projectLoader.load_generators({})
+
+    paths = output_paths(configfiles)
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(build_config, configfile, paths[configfile], cache, make)
+            for configfile in configfiles
+        ]
+        results = []
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            build_time = ""
+            if result["build_time"] is not None:
+                build_time = f"{result['build_time']:8.3f}s"
+            print(
+                f"{result['generate_time']:8.3f}s {build_time:9s} {result['changed']:4d} {result['status']:16s} {result['config']}"
+            )
+    total_time = round(time.perf_counter() - start, 3)
+
+    failed = [result for result in results if result["status"] != "ok"]
+    print(f"{len(configfiles)} configs, {len(failed)} failed, {total_time}s")
+    for result in failed:
+        print(f"ERROR: {result['config']}: {result['error']}")
+
+    if summary:
+        open(summary, "w").write(
+            json.dumps(
+                {
+                    "jobs": jobs or os.cpu_count(),
+                    "make": make,
+                    "total_time": total_time,
+                    "failed": len(failed),
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+    return not failed
 
 
 if __name__ == "__main__":
@@ -96,6 +264,59 @@ if __name__ == "__main__":
     parser.add_argument(
         "outputdir", help="output directory", type=str, nargs="?", default=None
     )
+    parser.add_argument(
+        "--no-cache", help="do not use the project cache", action="store_true"
+    )
+    parser.add_argument(
+        "--all",
+        help="generate all given configs in a process pool",
+        type=str,
+        nargs="+",
+        metavar="CONFIG",
+    )
+    parser.add_argument(
+        "-j", "--jobs", help="number of parallel jobs for --all", type=int, default=None
+    )
+    parser.add_argument(
+        "--make", help="also build the gateware of each config (--all)", action="store_true"
+    )
+    parser.add_argument(
+        "--summary",
+        help="json summary file for --all",
+        type=str,
+        default="build-testall.json",
+    )
+    parser.add_argument(
+        "--profile",
+        help="write a timing trace of all stages, plugin hooks and tool calls to this file",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--profile-format",
+        help="format of the timing trace (json: hierarchical, chrome: trace-event format)",
+        choices=("json", "chrome"),
+        default="json",
+    )
     args = parser.parse_args()
 
-    main(args.configfile, args.outputdir)
+    if args.profile:
+        if args.all:
+            print("ERROR: --profile is not supported with --all")
+            exit(1)
+        profiler.enable()
+
+    if args.all:
+        if not main_all(
+            args.all,
+            jobs=args.jobs,
+            cache=not args.no_cache,
+            make=args.make,
+            summary=args.summary,
+        ):
+            exit(1)
+    else:
+        main(args.configfile, args.outputdir, cache=not args.no_cache)
+
+    if args.profile:
+        profiler.save(args.profile, args.profile_format)
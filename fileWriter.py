@@ -0,0 +1,87 @@
+import glob
+import os
+import shutil
+
+# source file contents, shared by all projects generated in this process
+_sources = {}
+
+
+def _record(project, filename, changed):
+    project.setdefault("output_files", {})[filename] = changed
+
+
+def _unchanged(filename, content):
+    if not os.path.isfile(filename) or os.path.getsize(filename) != len(content):
+        return False
+    with open(filename, "rb") as f:
+        return f.read() == content
+
+
+def write_file(project, filename, content):
+    """writes content to filename, leaves the file (and its mtime) untouched if the content is the same"""
+    if isinstance(content, str):
+        content = content.encode()
+    changed = not _unchanged(filename, content)
+    if changed:
+        with open(filename, "wb") as f:
+            f.write(content)
+    _record(project, filename, changed)
+    return changed
+
+
+def _read_source(source):
+    stat = os.stat(source)
+    cached = _sources.get(source)
+    if cached is None or cached[0] != (stat.st_mtime_ns, stat.st_size):
+        with open(source, "rb") as f:
+            cached = ((stat.st_mtime_ns, stat.st_size), f.read())
+        _sources[source] = cached
+    return cached[1]
+
+
+def make_dirs(*paths):
+    for path in paths:
+        os.makedirs(path, exist_ok=True)
+
+
+def copy_file(project, source, target):
+    """copies source to target (file or directory), only if the content differs"""
+    if os.path.isdir(target):
+        target = os.path.join(target, os.path.basename(source))
+    content = _read_source(source)
+    changed = not _unchanged(target, content)
+    if changed:
+        with open(target, "wb") as f:
+            f.write(content)
+        shutil.copymode(source, target)
+    _record(project, target, changed)
+    return changed
+
+
+def copy_files(project, pattern, target):
+    """copies all files matching the glob pattern into the target directory"""
+    make_dirs(target)
+    for source in sorted(glob.glob(pattern)):
+        if os.path.isfile(source):
+            copy_file(project, source, target)
+
+
+def copy_tree(project, source, target, exclude=()):
+    """copies a directory recursively, skipping the excluded names and python caches"""
+    exclude = set(exclude) | {"__pycache__"}
+    for path, dirs, files in os.walk(source):
+        dirs[:] = sorted(name for name in dirs if name not in exclude)
+        subpath = os.path.relpath(path, source)
+        target_path = os.path.normpath(os.path.join(target, subpath))
+        make_dirs(target_path)
+        for name in sorted(files):
+            if name not in exclude:
+                copy_file(project, os.path.join(path, name), target_path)
+
+
+def changed_files(project):
+    return [
+        filename
+        for filename, changed in project.get("output_files", {}).items()
+        if changed
+    ]
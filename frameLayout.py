@@ -0,0 +1,432 @@
+from struct import Struct
+
+PRU_DATA = 0x64617461
+PRU_READ = 0x72656164
+PRU_WRITE = 0x77726974
+
+# struct codes of the (signed) numeric fields
+STRUCT_CODES = {8: "b", 16: "h", 32: "i"}
+
+# frame crc: msb first (like the bits on the wire), init all ones, no final xor (CRC-16/CCITT-FALSE, CRC-32/MPEG-2)
+CRC_POLYS = {16: 0x1021, 32: 0x04C11DB7}
+
+
+def crc_table(bits):
+    """the 256 entries of the bytewise crc table"""
+    top = 1 << (bits - 1)
+    mask = (1 << bits) - 1
+    table = []
+    for byte in range(256):
+        value = byte << (bits - 8)
+        for bit in range(8):
+            value = ((value << 1) ^ CRC_POLYS[bits]) if value & top else (value << 1)
+        table.append(value & mask)
+    return table
+
+
+CRC_TABLES = {bits: crc_table(bits) for bits in CRC_POLYS}
+
+
+def crc(data, bits):
+    """crc of the data, 0 for data with a valid (big endian) crc trailer"""
+    table = CRC_TABLES[bits]
+    shift = bits - 8
+    mask = (1 << bits) - 1
+    value = mask
+    for byte in data:
+        value = ((value << 8) & mask) ^ table[(value >> shift) ^ byte]
+    return value
+
+
+class FrameLayout:
+    """
+    position of every field in the rx (host -> fpga) and tx (fpga -> host) frames
+
+    offsets and widths are in bits, the offset counts from the start of the frame:
+    byte = offset // 8, bit = offset % 8 (lsb = 0), numeric fields are little endian
+
+    regions are the consecutive blocks of the frame as they are declared in rio.h
+    (txData_t/rxData_t), every region references the fields it contains
+    """
+
+    def __init__(self, project):
+        self.fields = {"rx": [], "tx": []}
+        self.regions = {"rx": [], "tx": []}
+        self.size = {"rx": 0, "tx": 0}
+        # rotating sub-frame: number of slots, 0 = every field in every frame
+        self.slots = project.get("frame_slots", 0)
+        # crc trailer (bits) at the end of both frames, 0 = no crc
+        self.crc = project.get("frame_crc", 0)
+        # 16bit sequence number of the command, echoed in the answer
+        self.sequence = project.get("frame_sequence", False)
+
+        # rx: header, joint commands and vouts (grouped by size), bouts, joint enables, douts
+        # the groups are ordered by size, so every member of txData_t in rio.h is aligned without padding
+        # the slow vouts of the rotating sub-frame are behind the 32bit groups, the slot number behind the 8bit groups,
+        # the sequence number in front of the 16bit groups
+        vouts = {"fast": [], "slow": []}
+        for num, vout in enumerate(project["voutnames"]):
+            speed = "slow" if self.slots and not vout.get("fast", False) else "fast"
+            vouts[speed].append((vout["_prefix"], num, vout.get("_bits", 32)))
+        self._numeric("rx", "header", "header", [("header", 0)], 32)
+        for bits in (32, 16, 8):
+            if self.sequence and bits == 16:
+                self._numeric("rx", "sequence", "sequence", [("sequence", 0)], 16, signed=False)
+            self._numeric(
+                "rx",
+                "joint",
+                f"jointFreqCmd{bits}",
+                [
+                    (joint["_prefix"], num)
+                    for num, joint in enumerate(project["jointnames"])
+                    if joint.get("_bits", 32) == bits
+                ],
+                bits,
+            )
+            self._numeric(
+                "rx",
+                "vout",
+                f"setPoint{bits}",
+                [(prefix, num) for prefix, num, vbits in vouts["fast"] if vbits == bits],
+                bits,
+            )
+            if self.slots and bits == 32:
+                self._slots("rx", "vout", "setPoint", vouts["slow"])
+        if self.slots:
+            self._numeric("rx", "slot", "slot", [("slot", 0)], 8)
+        for num, bout in enumerate(project["boutnames"]):
+            self._bytes("rx", "bout", bout["_prefix"], num, bout["size"])
+        self._bits(
+            "rx",
+            "enable",
+            "jointEnable",
+            [joint["_prefix"] for joint in project["jointnames"]],
+            project["joints_en_total"],
+            msb_first=False,
+        )
+        self._bits(
+            "rx",
+            "dout",
+            "outputs",
+            [dout["_prefix"] for dout in project["doutnames"]],
+            project["douts_total"],
+        )
+
+        # tx: header, joint feedback, vins (grouped by size), bins, dins
+        # like rx with the slow vins in the rotating sub-frame and the crc error counter of the gateware
+        vins = {"fast": [], "slow": []}
+        for num, vin in enumerate(project["vinnames"]):
+            speed = "slow" if self.slots and not vin.get("fast", False) else "fast"
+            vins[speed].append((vin["_prefix"], num, vin.get("_bits", 32)))
+        self._numeric("tx", "header", "header", [("header", 0)], 32)
+        self._numeric(
+            "tx",
+            "joint",
+            "jointFeedback",
+            [(joint["_prefix"], num) for num, joint in enumerate(project["jointnames"])],
+            32,
+        )
+        for bits in (32, 16, 8):
+            if self.sequence and bits == 16:
+                self._numeric("tx", "sequence", "sequence", [("sequence", 0)], 16, signed=False)
+            self._numeric(
+                "tx",
+                "vin",
+                f"processVariable{bits}",
+                [(prefix, num) for prefix, num, vbits in vins["fast"] if vbits == bits],
+                bits,
+            )
+            if self.slots and bits == 32:
+                self._slots("tx", "vin", "processVariable", vins["slow"])
+        if self.slots:
+            self._numeric("tx", "slot", "slot", [("slot", 0)], 8)
+        if self.crc:
+            self._numeric("tx", "crc", "crcErrors", [("crcErrors", 0)], 8)
+        for num, bins in enumerate(project["binnames"]):
+            self._bytes("tx", "bin", bins["_prefix"], num, bins["size"])
+        self._bits(
+            "tx",
+            "din",
+            "inputs",
+            [din["_prefix"] for din in project["dinnames"]],
+            project["dins_total"],
+        )
+
+        self.data_size = max(self.size["rx"], self.size["tx"]) + self.crc
+
+    def _add(self, direction, kind, name, num, width, signed, offset):
+        field = {
+            "name": name,
+            "kind": kind,
+            "index": num,
+            "offset": offset,
+            "width": width,
+            "signed": signed,
+            "direction": direction,
+        }
+        self.fields[direction].append(field)
+        return field
+
+    def _region(self, direction, kind, name, rtype, width, bits, fields, fmt):
+        region = {
+            "kind": kind,
+            "name": name,
+            "type": rtype,
+            "offset": self.size[direction],
+            "width": width,
+            "bits": bits,
+            "signed": rtype == "numeric",
+            "fields": fields,
+            "format": fmt,
+        }
+        self.regions[direction].append(region)
+        self.size[direction] += width
+        return region
+
+    def _numeric(self, direction, kind, name, items, bits, signed=True):
+        offset = self.size[direction]
+        fields = []
+        for prefix, num in items:
+            fields.append(self._add(direction, kind, prefix, num, bits, signed, offset))
+            offset += bits
+        code = STRUCT_CODES[bits] if signed else STRUCT_CODES[bits].upper()
+        fmt = f"{len(fields)}{code}"
+        region = self._region(
+            direction, kind, name, "numeric", bits * len(fields), bits, fields, fmt
+        )
+        region["signed"] = signed
+
+    def _slots(self, direction, kind, name, items):
+        """
+        the payload of the rotating sub-frame, all slots start at the same offset
+
+        the slow fields are spread over the slots by size, inside of a slot they are grouped by size like
+        the fast ones, every slot is a list of numeric regions (without padding, the payload is 32bit aligned)
+        """
+        offset = self.size[direction]
+        loads = [0] * self.slots
+        members = [[] for slot in range(self.slots)]
+        for prefix, num, bits in sorted(items, key=lambda item: -item[2]):
+            slot = loads.index(min(loads))
+            members[slot].append((prefix, num, bits))
+            loads[slot] += bits
+
+        slots = []
+        fields = []
+        for slot, smembers in enumerate(members):
+            regions = []
+            soffset = offset
+            for bits in (32, 16, 8):
+                sfields = []
+                for prefix, num, fbits in smembers:
+                    if fbits == bits:
+                        field = self._add(direction, kind, prefix, num, bits, True, soffset)
+                        field["slot"] = slot
+                        sfields.append(field)
+                        soffset += bits
+                if sfields:
+                    regions.append(
+                        {
+                            "kind": kind,
+                            "name": f"{name}{bits}",
+                            "type": "numeric",
+                            "offset": soffset - bits * len(sfields),
+                            "width": bits * len(sfields),
+                            "bits": bits,
+                            "signed": True,
+                            "fields": sfields,
+                            "format": f"{len(sfields)}{STRUCT_CODES[bits]}",
+                        }
+                    )
+            slots.append(regions)
+            fields += sum((region["fields"] for region in regions), [])
+
+        width = (max(loads) + 31) // 32 * 32
+        region = self._region(direction, kind, "slots", "slots", width, 32, fields, None)
+        region["slots"] = slots
+
+    def _bytes(self, direction, kind, name, num, size):
+        field = self._add(
+            direction, kind, name, num, size, False, self.size[direction]
+        )
+        self._region(
+            direction, kind, name, "bytes", size, 8, [field], f"{size // 8}s"
+        )
+
+    def _bits(self, direction, kind, name, prefixes, total, msb_first=True):
+        # douts and dins start at the msb of each byte, joint enables at the lsb
+        offset = self.size[direction]
+        fields = []
+        for num, prefix in enumerate(prefixes):
+            byte, bit = divmod(num, 8)
+            if msb_first:
+                bit = 7 - bit
+            fields.append(
+                self._add(direction, kind, prefix, num, 1, False, offset + byte * 8 + bit)
+            )
+        self._region(
+            direction, kind, name, "bits", total, 8, fields, f"{total // 8}s"
+        )
+
+    def region(self, direction, name):
+        for region in self.regions[direction]:
+            if region["name"] == name:
+                return region
+        return None
+
+    def kind(self, direction, kind):
+        """all fields of one kind, ordered by their index"""
+        return sorted(
+            (field for field in self.fields[direction] if field["kind"] == kind),
+            key=lambda field: field["index"],
+        )
+
+    def buffer_bit(self, offset):
+        """index of a frame bit in the data_size wide shift register of the gateware (first byte in the top bits)"""
+        byte, bit = divmod(offset, 8)
+        return self.data_size - byte * 8 - 8 + bit
+
+    def bit_fields(self, region):
+        """(offset, field or None) for every bit of a bit region, msb of each byte first"""
+        fields = {field["offset"]: field for field in region["fields"]}
+        for byte in range(region["offset"], region["offset"] + region["width"], 8):
+            for bit in range(7, -1, -1):
+                yield (byte + bit, fields.get(byte + bit))
+
+    def frame_regions(self, direction, slot=0):
+        """the regions of a frame, the rotating sub-frame replaced by the regions of the slot"""
+        regions = []
+        for region in self.regions[direction]:
+            if region["type"] == "slots":
+                regions += region["slots"][slot]
+            else:
+                regions.append(region)
+        return regions
+
+    def struct_format(self, direction, slot=0):
+        """struct format of the whole frame (data_size bits), one item per numeric field and per byte/bit region"""
+        fmt = "<"
+        for region in self.regions[direction]:
+            if region["type"] == "slots":
+                sregions = region["slots"][slot]
+                fmt += "".join(sregion["format"] for sregion in sregions)
+                fill = (region["width"] - sum(sregion["width"] for sregion in sregions)) // 8
+                if fill:
+                    fmt += f"{fill}x"
+            else:
+                fmt += region["format"]
+        fill = (self.data_size - self.size[direction]) // 8
+        if fill:
+            fmt += f"{fill}x"
+        return fmt
+
+
+class FrameCodec:
+    """
+    precompiled struct codec for one direction of the frame
+
+    encode() packs into a preallocated buffer, decode() reads the whole frame with a single unpack_from(),
+    values are lists of field values by index for each kind (see FrameLayout.kind()), missing kinds are sent as 0
+
+    with a rotating sub-frame there is one struct per slot, encode() uses the slot of values["slot"],
+    decode() the slot number in the frame and returns None for the slow fields of the other slots
+
+    with a crc, encode() appends the trailer and decode() raises a ValueError for a wrong crc
+
+    the sequence number (values["sequence"]) is sent modulo 2^16
+    """
+
+    def __init__(self, layout, direction):
+        slots = max(layout.slots, 1)
+        self.frames = [Struct(layout.struct_format(direction, slot)) for slot in range(slots)]
+        self.frame = self.frames[0]
+        self.size = self.frame.size
+        self.crc = layout.crc
+        self.buffer = bytearray(self.size)
+        self.counts = {}
+        for field in layout.fields[direction]:
+            self.counts[field["kind"]] = self.counts.get(field["kind"], 0) + 1
+        # one entry per struct item and slot: (type, kind, argument)
+        self.slot_items = [self._items(layout.frame_regions(direction, slot)) for slot in range(slots)]
+        self.items = self.slot_items[0]
+        # slow fields that are not in the frame of a slot
+        self.absent = [
+            [(field["kind"], field["index"]) for field in layout.fields[direction] if field.get("slot", slot) != slot]
+            for slot in range(slots)
+        ]
+        region = layout.region(direction, "slot")
+        self.slot_byte = region["offset"] // 8 if region else None
+        self.sequence = layout.sequence
+        self.zeros = {kind: [0] * count for kind, count in self.counts.items()}
+
+    def _items(self, regions):
+        items = []
+        for region in regions:
+            kind = region["kind"]
+            fields = region["fields"]
+            if region["type"] == "numeric":
+                for field in fields:
+                    items.append(("numeric", kind, field["index"]))
+            elif region["type"] == "bytes":
+                items.append(("bytes", kind, (fields[0]["index"], region["width"] // 8)))
+            else:
+                bits = []
+                for field in fields:
+                    byte, bit = divmod(field["offset"] - region["offset"], 8)
+                    bits.append((field["index"], byte, bit))
+                items.append(("bits", kind, (region["width"] // 8, bits)))
+        return items
+
+    def encode(self, values):
+        """packs the values into the buffer and returns it (the buffer is reused by the next call)"""
+        slot = 0
+        if self.slot_byte is not None:
+            slot = int((values.get("slot") or [0])[0]) % len(self.frames)
+            values = dict(values, slot=[slot])
+        if self.sequence:
+            values = dict(values, sequence=[int((values.get("sequence") or [0])[0]) & 0xFFFF])
+        items = []
+        for itype, kind, arg in self.slot_items[slot]:
+            kvalues = values.get(kind) or self.zeros[kind]
+            if itype == "numeric":
+                items.append(int(kvalues[arg] or 0))
+            elif itype == "bytes":
+                index, size = arg
+                items.append(bytes(kvalues[index])[:size])
+            else:
+                size, bits = arg
+                data = bytearray(size)
+                for index, byte, bit in bits:
+                    if kvalues[index]:
+                        data[byte] |= 1 << bit
+                items.append(bytes(data))
+        # the padding of a slot keeps stale bytes of other slots, the answer does not depend on it
+        self.frames[slot].pack_into(self.buffer, 0, *items)
+        if self.crc:
+            payload = self.size - self.crc // 8
+            self.buffer[payload:] = crc(memoryview(self.buffer)[:payload], self.crc).to_bytes(self.crc // 8, "big")
+        return self.buffer
+
+    def decode(self, data):
+        if len(data) < self.size:
+            raise ValueError(f"wrong frame size: {len(data)} / {self.size}")
+        if self.crc and crc(data[: self.size], self.crc):
+            raise ValueError("wrong crc")
+        slot = 0
+        if self.slot_byte is not None:
+            slot = data[self.slot_byte]
+            if slot >= len(self.frames):
+                raise ValueError(f"wrong slot: {slot} / {len(self.frames)}")
+        values = {kind: [0] * count for kind, count in self.counts.items()}
+        for item, (itype, kind, arg) in zip(self.frames[slot].unpack_from(data), self.slot_items[slot]):
+            if itype == "numeric":
+                values[kind][arg] = item
+            elif itype == "bytes":
+                values[kind][arg[0]] = item
+            else:
+                kvalues = values[kind]
+                for index, byte, bit in arg[1]:
+                    kvalues[index] = (item[byte] >> bit) & 1
+        for kind, index in self.absent[slot]:
+            values[kind][index] = None
+        return values
@@ -1,5 +1,8 @@
 from .verilog2doc import verilog2doc
 
+# the documentation is generated from the verilog files of the gateware
+requires = ["gateware"]
+
 
 def generate(project):
     print("generating documentation")
@@ -10,7 +13,10 @@ def generate(project):
         verilogs.append(f"{project['GATEWARE_PATH']}/rio.v")
 
         verilog2doc(
-            verilogs, top="rio", output=f"{project['OUTPUT_PATH']}/Documentation"
+            verilogs,
+            top="rio",
+            output=f"{project['OUTPUT_PATH']}/Documentation",
+            project=project,
         )
     except Exception as error:
         print(f"# can't generate documentation: {error}")
@@ -1,8 +1,11 @@
 import argparse
+import io
 import os
 import re
 import zipfile
 
+from fileWriter import make_dirs, write_file
+
 try:
     import graphviz
 except:
@@ -10,7 +13,10 @@ except:
     graphviz = None
 
 
-def verilog2doc(verilogs, top=None, output=None):
+def verilog2doc(verilogs, top=None, output=None, project=None):
+    """writes the html documentation, files with the same content are not rewritten (see fileWriter.write_file)"""
+    if project is None:
+        project = {}
 
     patternModule = re.compile(
         r"module\s+(?P<name>\w+)(?P<params>\s*#\([^\)]*\))?\s*\((?P<args>[^\)]*)\)\s*;(?P<data>[\s\S]*?(?=endmodule))endmodule"
@@ -198,9 +204,14 @@ def verilog2doc(verilogs, top=None, output=None):
         print(f"setting output directory to {output}")
         os.makedirs(output, exist_ok=True)
 
-    zip_obj = zipfile.ZipFile("generators/documentation/highlight.zip", "r")
-    zip_obj.extractall(output)
-    zip_obj.close()
+    with zipfile.ZipFile("generators/documentation/highlight.zip", "r") as zip_obj:
+        for info in zip_obj.infolist():
+            target = os.path.join(output, info.filename)
+            if info.is_dir():
+                make_dirs(target)
+            else:
+                make_dirs(os.path.dirname(target))
+                write_file(project, target, zip_obj.read(info))
 
     def mexpand(dependsGraph, module):
         dependsGraph[module] = {}
@@ -220,25 +231,25 @@ def verilog2doc(verilogs, top=None, output=None):
     dependsGraph = mexpand({}, top)
 
     filename = modules[top]["filename"]
-    fd = open(f"{output}/index.html", "w")
+    fd = io.StringIO()
     fd.write("<html>")
     fd.write('  <frameset cols="200, *">')
     fd.write('    <frame src="menu.html" name="menu">')
     fd.write(f"    <frame src=\"{filename.split('/')[-1]}.html\" name=\"main\">")
     fd.write("  </frameset>")
     fd.write("</html>")
-    fd.close()
+    write_file(project, f"{output}/index.html", fd.getvalue())
 
-    fd = open(f"{output}/menu.html", "w")
+    fd = io.StringIO()
     dependsGraph2menu(fd, dependsGraph)
-    fd.close()
+    write_file(project, f"{output}/menu.html", fd.getvalue())
 
     if graphviz is not None:
         gAll = graphviz.Digraph("G", format="svg")
         gAll.attr(rankdir="LR")
 
     for verilog_file in verilogs:
-        fd = open(f"{output}/{verilog_file.split('/')[-1]}.html", "w")
+        fd = io.StringIO()
         fd.write("<link rel='stylesheet' href='styles/default.min.css'>\n")
         fd.write("<script src='highlight.min.js'></script>\n")
         fd.write("<script src='languages/verilog.min.js'></script>\n")
@@ -429,7 +440,7 @@ def verilog2doc(verilogs, top=None, output=None):
 
         fd.write("<script>hljs.highlightAll();</script>\n")
 
-        fd.close()
+        write_file(project, f"{output}/{verilog_file.split('/')[-1]}.html", fd.getvalue())
 
     # if graphviz is not None:
     # print("<hr/>")
@@ -1,5 +1,7 @@
 import os
 
+from fileWriter import make_dirs, write_file
+
 from .pins import *
 
 
@@ -86,7 +88,9 @@ def buildsys_gowin(project):
     makefile_data.append(f"	openFPGALoader -b {board.lower()} impl/pnr/project.fs -f")
     makefile_data.append("")
     makefile_data.append("")
-    open(f"{project['GATEWARE_PATH']}/Makefile", "w").write("\n".join(makefile_data))
+    write_file(
+        project, f"{project['GATEWARE_PATH']}/Makefile", "\n".join(makefile_data)
+    )
 
     # generating project file for the gowin toolchain
     prj_data = []
@@ -115,9 +119,9 @@ def buildsys_gowin(project):
     prj_data.append('    <File path="pins.cst" type="file.cst" enable="1"/>')
     prj_data.append("    </FileList>")
     prj_data.append("</Project>")
-    open(f"{project['GATEWARE_PATH']}/rio.gprj", "w").write("\n".join(prj_data))
+    write_file(project, f"{project['GATEWARE_PATH']}/rio.gprj", "\n".join(prj_data))
 
-    os.system(f"mkdir -p {project['GATEWARE_PATH']}/impl")
+    make_dirs(f"{project['GATEWARE_PATH']}/impl")
     pps_data = """{
  "Allow_Duplicate_Modules" : false,
  "Annotated_Properties_for_Analyst" : true,
@@ -202,8 +206,10 @@ def buildsys_gowin(project):
  "show_all_warnings" : false,
  "turn_off_bg" : false
 }"""
-    open(f"{project['GATEWARE_PATH']}/impl/project_process_config.json", "w").write(
-        pps_data
+    write_file(
+        project,
+        f"{project['GATEWARE_PATH']}/impl/project_process_config.json",
+        pps_data,
     )
 
 
@@ -297,7 +303,9 @@ def buildsys_icestorm(project):
         makefile_data.append(f"	 openFPGALoader -b ice40_generic {bitfileName}")
     makefile_data.append("")
     makefile_data.append("")
-    open(f"{project['GATEWARE_PATH']}/Makefile", "w").write("\n".join(makefile_data))
+    write_file(
+        project, f"{project['GATEWARE_PATH']}/Makefile", "\n".join(makefile_data)
+    )
 
 
 def buildsys_ise(project):
@@ -346,7 +354,9 @@ def buildsys_ise(project):
     makefile_data.append("	openFPGALoader -v -c usb-blaster $(PROJECT).bit")
     makefile_data.append("")
     makefile_data.append("")
-    open(f"{project['GATEWARE_PATH']}/Makefile", "w").write("\n".join(makefile_data))
+    write_file(
+        project, f"{project['GATEWARE_PATH']}/Makefile", "\n".join(makefile_data)
+    )
 
 
 def buildsys_vivado(project):
@@ -442,7 +452,9 @@ def buildsys_vivado(project):
     makefile_data.append("	openFPGALoader -b arty -f build/$(PROJECT).bit")
     makefile_data.append("")
     makefile_data.append("")
-    open(f"{project['GATEWARE_PATH']}/Makefile", "w").write("\n".join(makefile_data))
+    write_file(
+        project, f"{project['GATEWARE_PATH']}/Makefile", "\n".join(makefile_data)
+    )
 
 
 def buildsys_diamond(project):
@@ -498,7 +510,9 @@ def buildsys_diamond(project):
     makefile_data.append("	rm -rf build $(PROJECT).ldf $(PROJECT).tcl syn.tcl")
     makefile_data.append("")
     makefile_data.append("")
-    open(f"{project['GATEWARE_PATH']}/Makefile", "w").write("\n".join(makefile_data))
+    write_file(
+        project, f"{project['GATEWARE_PATH']}/Makefile", "\n".join(makefile_data)
+    )
 
     """
     bitfileName = "$(PROJECT).bit"
@@ -541,7 +555,9 @@ def buildsys_diamond(project):
         f"	rm -rf {bitfileName} $(PROJECT).svf $(PROJECT).config $(PROJECT).json yosys.log nextpnr.log"
     )
     makefile_data.append("")
-    open(f"{project['GATEWARE_PATH']}/Makefile.yosys", "w").write("\n".join(makefile_data))
+    write_file(
+        project, f"{project['GATEWARE_PATH']}/Makefile.yosys", "\n".join(makefile_data)
+    )
     """
 
 
@@ -643,7 +659,9 @@ def buildsys_quartus(project):
     makefile_data.append('	$(QP) --no_banner --mode=jtag -o "P;$(PROJECT).sof"')
     makefile_data.append("")
     makefile_data.append("")
-    open(f"{project['GATEWARE_PATH']}/Makefile", "w").write("\n".join(makefile_data))
+    write_file(
+        project, f"{project['GATEWARE_PATH']}/Makefile", "\n".join(makefile_data)
+    )
 
     clock = project['jdata']['clock'].get('osc', project['jdata']['clock']['speed'])
     sdc_data = []
@@ -652,7 +670,7 @@ def buildsys_quartus(project):
     sdc_data.append("derive_pll_clocks")
     sdc_data.append("derive_clock_uncertainty")
     sdc_data.append("")
-    open(f"{project['GATEWARE_PATH']}/rio.sdc", "w").write("\n".join(sdc_data))
+    write_file(project, f"{project['GATEWARE_PATH']}/rio.sdc", "\n".join(sdc_data))
 
 
 def buildsys_verilator(project):
@@ -668,15 +686,25 @@ def buildsys_verilator(project):
     makefile_data.append("all: obj_dir/V$(TOP)")
     makefile_data.append("")
     makefile_data.append("obj_dir/V$(TOP): $(VERILOGS)")
-    makefile_data.append("	verilator --cc --exe --build -j 0 -Wall main.cpp $(TOP).v")
+    makefile_data.append("	verilator --cc --exe --build -j 0 -Wall -O3 main.cpp $(TOP).v")
     makefile_data.append("")
     makefile_data.append("clean:")
     makefile_data.append("	rm -rf obj_dir")
     makefile_data.append("")
     makefile_data.append("")
-    open(f"{project['GATEWARE_PATH']}/Makefile", "w").write("\n".join(makefile_data))
+    write_file(
+        project, f"{project['GATEWARE_PATH']}/Makefile", "\n".join(makefile_data)
+    )
+
+    clock = int(project["jdata"]["clock"]["speed"])
+    interface = (project["jdata"].get("interface") or [{}])[0]
+    bus = interface.get("type")
+    if bus not in ("spi", "uart"):
+        # udp interfaces (w5500, udp_tangprimer20k) have no bus model, the harness still builds
+        print(f"WARNING: verilator: no frame driver for interface: {bus} (spi, uart), frames are not answered")
 
-    top_arguments = []
+    inputs = []
+    outputs = []
     for pname in sorted(list(project["pinlists"])):
         pins = project["pinlists"][pname]
         for pin in pins:
@@ -684,15 +712,12 @@ def buildsys_verilator(project):
                 continue
             if pin[1] == "USRMCLK":
                 continue
-
-            top_arguments.append(
-                {
-                    "dir": pin[2].lower(),
-                    "name": pin[0],
-                }
-            )
-
-    print(top_arguments)
+            if pin[0] == "sysclk" or pin[0].startswith("INTERFACE_"):
+                continue
+            if pin[2] == "INPUT":
+                inputs.append(pin[0])
+            elif pin[2] == "OUTPUT":
+                outputs.append(pin[0])
 
     main_cpp = []
     main_cpp.append("""
@@ -700,100 +725,421 @@ def buildsys_verilator(project):
 #include "verilated.h"
 
 #include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include <sched.h>
 #include <sys/types.h>
 #include <sys/stat.h>
+#include <sys/mman.h>
+#include <sys/socket.h>
+#include <netinet/in.h>
 #include <fcntl.h>
 #include <unistd.h>
+""")
+    main_cpp.append(f"#define BUFFER_BIT {project['data_size']}")
+    main_cpp.append("#define BUFFER_BYTES (BUFFER_BIT / 8)")
+    main_cpp.append(f"#define SYSCLK {clock}")
+    if bus == "spi":
+        # the spi slave samples SCK with a 3 stage synchronizer, at least 4 sysclk cycles per level
+        spi_speed = int(interface.get("max", 1000000))
+        half_period = max(clock // (spi_speed * 2), 4)
+        main_cpp.append("#define BUS_SPI")
+        main_cpp.append(
+            f"#define SPI_HALF_PERIOD {half_period} // sysclk cycles per SCK level ({clock // (half_period * 2)} Hz)"
+        )
+        main_cpp.append("#define SPI_SSEL_DELAY 8 // sysclk cycles between SSEL and SCK edges")
+    elif bus == "uart":
+        baud = int(interface.get("baud", 1000000))
+        main_cpp.append("#define BUS_UART")
+        main_cpp.append(f"#define UART_BIT {clock // baud} // sysclk cycles per bit ({baud} baud)")
+        main_cpp.append("#define UART_TIMEOUT (UART_BIT * 10 * BUFFER_BYTES * 4)")
+    else:
+        main_cpp.append(f"#define BUS_NONE // {bus}: no frame driver")
+    main_cpp.append("""
+// shared memory mailbox with the host (see transport.py: ShmMailbox)
+#define SHM_MAGIC 0x6F697273
+#define SHM_SLOT ((BUFFER_BYTES + 3) / 4 * 4)
 
-#define BUFFER_BIT 40
-#define BUFFER_BYTES (BUFFER_BIT / 8)
+typedef struct {
+    uint32_t magic;
+    uint32_t size;
+    uint32_t request;
+    uint32_t answer;
+    uint8_t request_frame[SHM_SLOT];
+    uint8_t answer_frame[SHM_SLOT];
+} shm_mailbox_t;
 
-int main(int argc, char** argv) {
+shm_mailbox_t *shm_open_mailbox(const char *filename) {
+    int fd = open(filename, O_RDWR | O_CREAT, 0666);
+    if (fd < 0 || ftruncate(fd, sizeof(shm_mailbox_t)) < 0) {
+        perror(filename);
+        exit(1);
+    }
+    shm_mailbox_t *shm = (shm_mailbox_t *)mmap(NULL, sizeof(shm_mailbox_t), PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    close(fd);
+    if (shm == MAP_FAILED) {
+        perror(filename);
+        exit(1);
+    }
+    if (shm->magic != SHM_MAGIC || shm->size != BUFFER_BYTES) {
+        shm->size = BUFFER_BYTES;
+        shm->request = 0;
+        shm->answer = 0;
+        __atomic_store_n(&shm->magic, SHM_MAGIC, __ATOMIC_RELEASE);
+    }
+    return shm;
+}
+
+// frame source: the shared memory mailbox (default) or udp like the W5500 / ESP32 bridge (--udp <port>)
+shm_mailbox_t *shm = NULL;
+uint32_t shm_request = 0;
+int udp_fd = -1;
+struct sockaddr_in udp_peer;
 
-    uint8_t spi_tx[BUFFER_BYTES] = {0x74, 0x69, 0x72, 0x77};
-    uint8_t spi_rx[BUFFER_BYTES];
-    int spi_rx_num = 0;
-    int spi_rx_bit = 0;
-    int spi_rx_cs = 1;
+int udp_open(int port) {
+    struct sockaddr_in addr;
+    int fd = socket(AF_INET, SOCK_DGRAM, 0);
+    memset(&addr, 0, sizeof(addr));
+    addr.sin_family = AF_INET;
+    addr.sin_addr.s_addr = htonl(INADDR_ANY);
+    addr.sin_port = htons(port);
+    if (fd < 0 || bind(fd, (struct sockaddr *)&addr, sizeof(addr)) < 0) {
+        perror("udp");
+        exit(1);
+    }
+    return fd;
+}
+
+int frame_next(uint8_t *frame) {
+    if (udp_fd >= 0) {
+        socklen_t len = sizeof(udp_peer);
+        return recvfrom(udp_fd, frame, BUFFER_BYTES, MSG_DONTWAIT, (struct sockaddr *)&udp_peer, &len) == BUFFER_BYTES;
+    }
+    shm_request = __atomic_load_n(&shm->request, __ATOMIC_ACQUIRE);
+    if (shm_request == shm->answer) {
+        return 0;
+    }
+    memcpy(frame, shm->request_frame, BUFFER_BYTES);
+    return 1;
+}
+
+void frame_answer(const uint8_t *frame) {
+    if (udp_fd >= 0) {
+        sendto(udp_fd, frame, BUFFER_BYTES, 0, (struct sockaddr *)&udp_peer, sizeof(udp_peer));
+        return;
+    }
+    memcpy(shm->answer_frame, frame, BUFFER_BYTES);
+    __atomic_store_n(&shm->answer, shm_request, __ATOMIC_RELEASE);
+}
+
+// frame driver, bus_tick() runs once per sysclk cycle and returns 1 when the answer frame is complete
+enum {
+    BUS_IDLE,
+    BUS_START,
+    BUS_LOW,
+    BUS_HIGH,
+    BUS_END,
+};
+
+typedef struct {
+    int state;
+    int wait;
+    int bit;
+    int rx_state;
+    int rx_wait;
+    int rx_bit;
+    int rx_byte;
+    uint32_t timeout;
+    uint8_t tx[BUFFER_BYTES];
+    uint8_t rx[BUFFER_BYTES];
+} bus_t;
+
+#ifdef BUS_SPI
+void bus_init(Vrio *rio) {
+    rio->INTERFACE_SPI_SSEL = 1;
+    rio->INTERFACE_SPI_SCK = 0;
+    rio->INTERFACE_SPI_MOSI = 0;
+}
+
+// spi master, mode 0, msb first
+int bus_tick(Vrio *rio, bus_t *bus) {
+    if (bus->wait > 0) {
+        bus->wait--;
+        return 0;
+    }
+    switch (bus->state) {
+        case BUS_START:
+            rio->INTERFACE_SPI_SSEL = 0;
+            memset(bus->rx, 0, BUFFER_BYTES);
+            bus->bit = 0;
+            bus->state = BUS_LOW;
+            bus->wait = SPI_SSEL_DELAY;
+            break;
+        case BUS_LOW:
+            rio->INTERFACE_SPI_SCK = 0;
+            rio->INTERFACE_SPI_MOSI = (bus->tx[bus->bit / 8] >> (7 - bus->bit % 8)) & 1;
+            bus->state = BUS_HIGH;
+            bus->wait = SPI_HALF_PERIOD - 1;
+            break;
+        case BUS_HIGH:
+            rio->INTERFACE_SPI_SCK = 1;
+            if (rio->INTERFACE_SPI_MISO) {
+                bus->rx[bus->bit / 8] |= 1 << (7 - bus->bit % 8);
+            }
+            bus->bit++;
+            bus->state = bus->bit < BUFFER_BIT ? BUS_LOW : BUS_END;
+            bus->wait = SPI_HALF_PERIOD - 1;
+            break;
+        case BUS_END:
+            rio->INTERFACE_SPI_SCK = 0;
+            rio->INTERFACE_SPI_SSEL = 1;
+            bus->state = BUS_IDLE;
+            bus->wait = SPI_SSEL_DELAY;
+            return 1;
+    }
+    return 0;
+}
+#endif
+
+#ifdef BUS_UART
+void bus_init(Vrio *rio) {
+    rio->INTERFACE_UART_RX = 1;
+}
+
+// 8N1, lsb first, the answer is received while sending
+int bus_tick(Vrio *rio, bus_t *bus) {
+    if (bus->state == BUS_IDLE) {
+        return 0;
+    }
+    if (bus->state == BUS_START) {
+        memset(bus->rx, 0, BUFFER_BYTES);
+        bus->bit = 0;
+        bus->wait = 0;
+        bus->rx_state = 0;
+        bus->rx_byte = 0;
+        bus->timeout = 0;
+        bus->state = BUS_LOW;
+    }
+
+    // transmitter: 10 bits per byte (start, 8 data, stop)
+    if (bus->state == BUS_LOW) {
+        if (bus->wait > 0) {
+            bus->wait--;
+        } else if (bus->bit < BUFFER_BYTES * 10) {
+            int bit = bus->bit % 10;
+            if (bit == 0) {
+                rio->INTERFACE_UART_RX = 0;
+            } else if (bit == 9) {
+                rio->INTERFACE_UART_RX = 1;
+            } else {
+                rio->INTERFACE_UART_RX = (bus->tx[bus->bit / 10] >> (bit - 1)) & 1;
+            }
+            bus->bit++;
+            bus->wait = UART_BIT - 1;
+        } else {
+            rio->INTERFACE_UART_RX = 1;
+            bus->state = BUS_HIGH;
+        }
+    }
+
+    // receiver: start bit edge, then sample in the middle of each bit
+    if (bus->rx_wait > 0) {
+        bus->rx_wait--;
+    } else if (bus->rx_state == 0) {
+        if (rio->INTERFACE_UART_TX == 0) {
+            bus->rx_state = 1;
+            bus->rx_bit = 0;
+            bus->rx_wait = UART_BIT + UART_BIT / 2 - 1;
+        }
+    } else {
+        if (bus->rx_bit < 8) {
+            bus->rx[bus->rx_byte] |= (rio->INTERFACE_UART_TX & 1) << bus->rx_bit;
+            bus->rx_bit++;
+            bus->rx_wait = UART_BIT - 1;
+        } else {
+            // stop bit
+            bus->rx_state = 0;
+            bus->rx_byte++;
+            if (bus->rx_byte == BUFFER_BYTES) {
+                bus->state = BUS_IDLE;
+                return 1;
+            }
+        }
+    }
+
+    if (bus->timeout++ > UART_TIMEOUT) {
+        // no (complete) answer, the host runs into its timeout
+        bus->state = BUS_IDLE;
+    }
+    return 0;
+}
+#endif
+
+#ifdef BUS_NONE
+void bus_init(Vrio *rio) {
+    (void)rio;
+}
+
+// no frame driver: the frame is dropped, the host runs into its timeout
+int bus_tick(Vrio *rio, bus_t *bus) {
+    (void)rio;
+    bus->state = BUS_IDLE;
+    return 0;
+}
+#endif
+""")
+
+    main_cpp.append("void print_pins(Vrio *rio) {")
+    for name in outputs:
+        main_cpp.append(f'    fprintf(stdout, "{name}=%i ", rio->{name});')
+    main_cpp.append('    fprintf(stdout, "\\n");')
+    main_cpp.append("    fflush(stdout);")
+    main_cpp.append("}")
+    main_cpp.append("")
+    main_cpp.append("int outputs_changed(Vrio *rio) {")
+    main_cpp.append(f"    static uint32_t last[{max(len(outputs), 1)}];")
+    main_cpp.append("    int changed = 0;")
+    for num, name in enumerate(outputs):
+        main_cpp.append(f"    if (rio->{name} != last[{num}]) {{")
+        main_cpp.append(f"        last[{num}] = rio->{name};")
+        main_cpp.append("        changed = 1;")
+        main_cpp.append("    }")
+    main_cpp.append("    return changed;")
+    main_cpp.append("}")
+
+    steppers = []
+    for num, joint in enumerate(project["jointnames"]):
+        prefix = joint["_prefix"]
+        if joint["type"] == "joint_stepper" and f"{prefix}_STEPPER_STP" in outputs:
+            steppers.append((num, prefix))
+    main_cpp.append("")
+    main_cpp.append("// co-simulation trace, one line per step (rising STP edge): S <joint> <cycle> <dir>")
+    main_cpp.append("void trace_steps(Vrio *rio, uint64_t cycle) {")
+    main_cpp.append(f"    static uint8_t last[{max(len(steppers), 1)}];")
+    for snum, (num, prefix) in enumerate(steppers):
+        main_cpp.append(f"    if (rio->{prefix}_STEPPER_STP != last[{snum}]) {{")
+        main_cpp.append(f"        last[{snum}] = rio->{prefix}_STEPPER_STP;")
+        main_cpp.append(f"        if (last[{snum}]) {{")
+        main_cpp.append(
+            f'            fprintf(stdout, "S {num} %llu %i\\n", (unsigned long long)cycle, rio->{prefix}_STEPPER_DIR);'
+        )
+        main_cpp.append("        }")
+        main_cpp.append("    }")
+    main_cpp.append("}")
+
+    main_cpp.append("""
+double now() {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec + ts.tv_nsec / 1e9;
+}
+
+// one sysclk cycle, returns 1 when an answer frame is complete
+int sim_cycle(Vrio *rio, bus_t *bus) {
+    rio->sysclk = 1;
+    rio->eval();
+    rio->sysclk = 0;
+    rio->eval();
+    if (bus->state == BUS_IDLE) {
+        if (bus->wait > 0) {
+            bus->wait--;
+        }
+        return 0;
+    }
+    return bus_tick(rio, bus);
+}
+
+int main(int argc, char** argv) {
+    const char *shm_file = "/dev/shm/rio";
+    int verbose = 0;
+    uint64_t cosim_period = 0;
+    for (int n = 1; n < argc; n++) {
+        if (strcmp(argv[n], "--udp") == 0 && n + 1 < argc) {
+            udp_fd = udp_open(atoi(argv[++n]));
+        } else if (strcmp(argv[n], "--shm") == 0 && n + 1 < argc) {
+            shm_file = argv[++n];
+        } else if (strcmp(argv[n], "--cosim") == 0 && n + 1 < argc) {
+            cosim_period = strtoull(argv[++n], NULL, 10);
+        } else if (strcmp(argv[n], "-v") == 0) {
+            verbose = 1;
+        }
+    }
+#ifdef BUS_NONE
+    fprintf(stderr, "WARNING: no frame driver for this interface, frames are not answered\\n");
+    if (cosim_period) {
+        fprintf(stderr, "ERROR: --cosim needs a frame driver (spi, uart)\\n");
+        exit(1);
+    }
+#endif
+    if (udp_fd < 0) {
+        shm = shm_open_mailbox(shm_file);
+    }
+    // the host is polled less often over udp (one syscall per poll)
+    uint32_t poll_mask = udp_fd >= 0 ? 1023 : 15;
 
     VerilatedContext* contextp = new VerilatedContext;
     contextp->commandArgs(argc, argv);
     Vrio* rio = new Vrio{contextp};
-    rio->BLINK_LED = 0;
-    rio->DIN0 = 0;
-    rio->DOUT0 = 0;
-    rio->DOUT1 = 0;
-    rio->INTERFACE_SPI_MOSI = 0;
-    rio->INTERFACE_SPI_MISO = 0;
-    rio->INTERFACE_SPI_SCK = 0;
-    rio->INTERFACE_SPI_SSEL = 0;
+""")
+    for name in inputs:
+        main_cpp.append(f"    rio->{name} = 0;")
+    main_cpp.append("""    bus_init(rio);
     rio->sysclk = 0;
     rio->eval();
 
-    int counter = 0;
-    int last = 0;
+    bus_t bus;
+    memset(&bus, 0, sizeof(bus));
+    uint64_t cycles = 0;
+    uint64_t frames = 0;
+    uint64_t last_cycles = 0;
+    uint64_t last_frames = 0;
+    double last_report = now();
+    while (!contextp->gotFinish() && cosim_period) {
+        // co-simulation (--cosim <cycles>): lockstep with the host, every frame starts a servo period,
+        // it is answered after exactly cosim_period cycles, the steps of the period are traced before
+        while (!frame_next(bus.tx)) {
+            sched_yield();
+        }
+        bus.state = BUS_START;
+        int answered = 0;
+        for (uint64_t end = cycles + cosim_period; cycles < end; cycles++) {
+            answered |= sim_cycle(rio, &bus);
+            trace_steps(rio, cycles);
+        }
+        if (!answered) {
+            fprintf(stderr, "ERROR: the frame does not fit into %llu cycles\\n", (unsigned long long)cosim_period);
+            exit(1);
+        }
+        fprintf(stdout, "P %llu\\n", (unsigned long long)cycles);
+        fflush(stdout);
+        frame_answer(bus.rx);
+    }
+
     while (!contextp->gotFinish()) {
-        rio->sysclk = 1 - rio->sysclk;
-        rio->eval();
-        rio->sysclk = 1 - rio->sysclk;
-        rio->eval();
-
-        if (rio->BLINK_LED != last) {
-            fprintf(stdout, "BLINK_LED=%i ", rio->BLINK_LED);
-            fprintf(stdout, "DOUT0=%i ", rio->DOUT0);
-            fprintf(stdout, "DOUT1=%i ", rio->DOUT1);
-            fprintf(stdout, "INTERFACE_SPI_MISO=%i ", rio->INTERFACE_SPI_MISO);
-            fprintf(stdout, "\\n");
+        if (sim_cycle(rio, &bus)) {
+            frame_answer(bus.rx);
+            frames++;
+        }
+        cycles++;
+        if (bus.state == BUS_IDLE && bus.wait == 0 && (cycles & poll_mask) == 0 && frame_next(bus.tx)) {
+            bus.state = BUS_START;
+        }
+
+        if (verbose && outputs_changed(rio)) {
+            print_pins(rio);
         }
-        last = rio->BLINK_LED;
-
-        if (counter++ > 100000) {
-            counter = 0;
-            if (rio->INTERFACE_SPI_SSEL == 0) {
-                if (rio->INTERFACE_SPI_SCK == 0) {
-                    if (spi_rx_bit < 8) {
-                        if ((spi_tx[spi_rx_num] & (1<<(7-spi_rx_bit))) > 0) {
-                            rio->INTERFACE_SPI_MOSI = 1;
-                        } else {
-                            rio->INTERFACE_SPI_MOSI = 0;
-                        }
-                    }
-                    rio->INTERFACE_SPI_SCK = 1;
-                } else if (spi_rx_num < BUFFER_BYTES) {
-                    if (spi_rx_bit < 8) {
-                        if (rio->INTERFACE_SPI_MISO == 1) {
-                            spi_rx[spi_rx_num] |= (1<<(7-spi_rx_bit));
-                        }
-                        spi_rx_bit++;
-                        if (spi_rx_bit == 8) {
-                            spi_rx_bit = 0;
-                            spi_rx_num++;
-                            if (spi_rx_num == BUFFER_BYTES) {
-                                int fd_rx = open("/dev/shm/verilog.rx", O_WRONLY);
-                                write(fd_rx, spi_rx, BUFFER_BYTES);
-                                close(fd_rx);
-                            } else {
-                                spi_rx[spi_rx_num] = 0;
-                            }
-                        }
-                    }
-                    if (spi_rx_num < BUFFER_BYTES) {
-                        rio->INTERFACE_SPI_SCK = 0;
-                    }
-                } else {
-                    rio->INTERFACE_SPI_SSEL = 1;
-                    spi_rx_bit = 0;
-                    spi_rx_num = 0;
-                }
-            } else if (rio->INTERFACE_SPI_SSEL == 1) {
-                int fd_tx = open("/dev/shm/verilog.tx", O_RDONLY);
-                read(fd_tx, spi_tx, BUFFER_BYTES);
-                close(fd_tx);
-                spi_rx_bit = 0;
-                spi_rx_num = 0;
-                spi_rx[spi_rx_num] = 0;
-                rio->INTERFACE_SPI_SSEL = 0;
-                rio->INTERFACE_SPI_SCK = 0;
+
+        // cycles per second counter
+        if ((cycles & 0xFFFF) == 0) {
+            double t = now();
+            if (t - last_report >= 1.0) {
+                double rate = (cycles - last_cycles) / (t - last_report);
+                fprintf(stdout, "%.0f cycles/s (%.3fx realtime), %.0f frames/s\\n", rate, rate / SYSCLK, (frames - last_frames) / (t - last_report));
+                fflush(stdout);
+                last_cycles = cycles;
+                last_frames = frames;
+                last_report = t;
             }
         }
     }
@@ -801,7 +1147,6 @@ int main(int argc, char** argv) {
     delete contextp;
     return 0;
 }
+""")
 
-    """)
-
-    open(f"{project['GATEWARE_PATH']}/main.cpp", "w").write("\n".join(main_cpp))
+    write_file(project, f"{project['GATEWARE_PATH']}/main.cpp", "\n".join(main_cpp))
@@ -0,0 +1,32 @@
+// crc of the frame bits as they are shifted in or out (msb first, init all ones, no final xor)
+// WIDTH 16: CRC-16/CCITT-FALSE, WIDTH 32: CRC-32/MPEG-2, DATA_BITS bits per enable
+// a frame with a valid crc trailer leaves a crc of 0
+module frame_crc
+    #(parameter WIDTH = 16, parameter DATA_BITS = 1)
+    (
+        input clk,
+        input init,
+        input enable,
+        input [DATA_BITS-1:0] data,
+        output reg [WIDTH-1:0] crc = {WIDTH{1'b1}}
+    );
+
+    localparam POLY = (WIDTH == 32) ? 32'h04C11DB7 : 32'h00001021;
+
+    reg [WIDTH-1:0] next;
+    integer i;
+    always @(*) begin
+        next = crc;
+        for (i = DATA_BITS - 1; i >= 0; i = i - 1) begin
+            next = {next[WIDTH-2:0], 1'b0} ^ ((next[WIDTH-1] ^ data[i]) ? POLY[WIDTH-1:0] : {WIDTH{1'b0}});
+        end
+    end
+
+    always @(posedge clk) begin
+        if (init) begin
+            crc <= {WIDTH{1'b1}};
+        end else if (enable) begin
+            crc <= next;
+        end
+    end
+endmodule
@@ -1,11 +1,37 @@
+import json
 import os
 import sys
-import json
+import tempfile
+
+import profiler
+from fileWriter import copy_file, write_file
 
 from .buildsys import *
 from .testbench import testbench
 
 
+def rx_slice(layout, field):
+    """the bytes of a little endian field in rx_data, msb first"""
+    pack = []
+    for byte in range(field["offset"], field["offset"] + field["width"], 8):
+        pack.append(f"rx_data[{layout.buffer_bit(byte + 7)}:{layout.buffer_bit(byte)}]")
+    pack.reverse()
+    return f"{{{', '.join(pack)}}}"
+
+
+def rx_signed(layout, field, bits=32):
+    """rx_slice() sign extended to bits (for joint commands and vouts with less than 32 bits)"""
+    if field["width"] >= bits:
+        return rx_slice(layout, field)
+    msb = f"rx_data[{layout.buffer_bit(field['offset'] + field['width'] - 1)}]"
+    return f"{{{{{bits - field['width']}{{{msb}}}}}, {rx_slice(layout, field)}}}"
+
+
+def tx_bytes(field, signal):
+    """the bytes of a signal in frame order (little endian)"""
+    return [f"{signal}[{bit + 7}:{bit}]" for bit in range(0, field["width"], 8)]
+
+
 def verilog_top(project):
     top_arguments = []
     for pname in sorted(list(project["pinlists"])):
@@ -82,17 +108,14 @@ def verilog_top(project):
 
         top_data.append("")
 
-    for pname, pins in project["pinlists"].items():
-        if not pins:
-            continue
-        for pin in pins:
-            if pin[1] == "USRMCLK":
-                top_data.append(f"    wire {pin[0]};")
-                top_data.append("    wire tristate_usrmclk = 1'b0;")
-                top_data.append(
-                    f"    USRMCLK u1 (.USRMCLKI({pin[0]}), .USRMCLKTS(tristate_usrmclk));"
-                )
-                top_data.append("")
+    if "USRMCLK" in project["pins"]:
+        pin = project["pins"]["USRMCLK"]["setup"]
+        top_data.append(f"    wire {pin[0]};")
+        top_data.append("    wire tristate_usrmclk = 1'b0;")
+        top_data.append(
+            f"    USRMCLK u1 (.USRMCLKI({pin[0]}), .USRMCLKTS(tristate_usrmclk));"
+        )
+        top_data.append("")
 
     if "blink" in project["jdata"]:
         top_data.append(
@@ -103,8 +126,8 @@ def verilog_top(project):
         top_data.append("    );")
         top_data.append("")
         project["verilog_files"].append("blink.v")
-        os.system(
-            f"cp -a generators/gateware/blink.v* {project['SOURCE_PATH']}/blink.v"
+        copy_file(
+            project, "generators/gateware/blink.v", f"{project['SOURCE_PATH']}/blink.v"
         )
 
     if "error" in project["jdata"]:
@@ -121,6 +144,9 @@ def verilog_top(project):
         top_data.append(f"    wire[{project['data_size'] - 1}:0] rx_data;")
         top_data.append(f"    wire[{project['data_size'] - 1}:0] tx_data;")
         top_data.append("")
+        if project["frame_crc"]:
+            top_data.append("    wire [7:0] INTERFACE_CRC_ERRORS;")
+            top_data.append("")
 
         top_data.append("    reg signed [31:0] header_tx;")
         top_data.append("    always @(posedge sysclk) begin")
@@ -142,41 +168,28 @@ def verilog_top(project):
                 top_data.append(f"    // {plugin}")
                 top_data += defs
 
-    # expansion wires
+    # expansion wires (pin directions are checked by the projectLoader)
     expansion_size = {}
     for expansions in project["expansions"].values():
         for enum, size in expansions.items():
             expansion_size[enum] = size
     expansion_ports = {}
-    for pname, pins in project["pinlists"].items():
-        for pin in pins:
-            if pin[1].startswith("EXPANSION"):
-                port = pin[1].split("[")[0]
-                pnum = int(pin[1].split("[")[1].split("]")[0])
-                size = expansion_size[port]
-                if port.endswith("_OUTPUT"):
-                    if port not in expansion_ports:
-                        expansion_ports[port] = {}
-                        for n in range(size):
-                            expansion_ports[port][n] = "1'd0"
-                if pin[2] == "OUTPUT":
-                    if "_OUTPUT" not in pin[1]:
-                        print("ERROR: pin-direction do not match:", pin)
-                        exit(1)
-                    expansion_ports[port][pnum] = pin[0]
-                else:
-                    if "_INPUT" not in pin[1]:
-                        print("ERROR: pin-direction do not match:", pin)
-                        exit(1)
+    for pin_id in project["expansion_pins"]:
+        pin = project["pins"][pin_id]["setup"]
+        port = pin_id.split("[")[0]
+        pnum = int(pin_id.split("[")[1].split("]")[0])
+        size = expansion_size[port]
+        if port.endswith("_OUTPUT"):
+            if port not in expansion_ports:
+                expansion_ports[port] = {}
+                for n in range(size):
+                    expansion_ports[port][n] = "1'd0"
+        if pin[2] == "OUTPUT":
+            expansion_ports[port][pnum] = pin[0]
     # top_data.append("")
 
-    for pname, pins in project["pinlists"].items():
-        for pin in pins:
-            if pin[1].startswith("EXPANSION"):
-                if pin[2] == "OUTPUT":
-                    top_data.append(f"    wire {pin[0]};")
-                else:
-                    top_data.append(f"    wire {pin[0]};")
+    for pin_id in project["expansion_pins"]:
+        top_data.append(f"    wire {project['pins'][pin_id]['name']};")
 
     jointEnables = []
     for num, joint in enumerate(project["jointnames"]):
@@ -199,8 +212,13 @@ def verilog_top(project):
 
     if project["voutnames"]:
         top_data.append(f"    // vouts {project['vouts']}")
+        slow = [field["index"] for field in project["frame_layout"].kind("rx", "vout") if "slot" in field]
         for num, vout in enumerate(project["voutnames"]):
-            top_data.append(f"    wire signed [31:0] {vout['_prefix']};")
+            if num in slow:
+                # latched from the rotating sub-frame
+                top_data.append(f"    reg signed [31:0] {vout['_prefix']} = 0;")
+            else:
+                top_data.append(f"    wire signed [31:0] {vout['_prefix']};")
         top_data.append("")
 
     if project["vinnames"]:
@@ -236,99 +254,115 @@ def verilog_top(project):
 
     if project["jdata"]["interface"]:
         top_data.append(f"    // rx_data {project['rx_data_size']}")
-        pos = project["data_size"]
+        layout = project["frame_layout"]
 
         top_data.append("    // wire [31:0] header_rx;")
-        top_data.append(
-            f"    // assign header_rx = {{rx_data[{pos-3*8-1}:{pos-3*8-8}], rx_data[{pos-2*8-1}:{pos-2*8-8}], rx_data[{pos-1*8-1}:{pos-1*8-8}], rx_data[{pos-1}:{pos-8}]}};"
-        )
-        pos -= 32
-
-        for num, joint in enumerate(project["jointnames"]):
+        for field in layout.kind("rx", "header"):
             top_data.append(
-                f"    assign {joint['_prefix']}FreqCmd = {{rx_data[{pos-3*8-1}:{pos-3*8-8}], rx_data[{pos-2*8-1}:{pos-2*8-8}], rx_data[{pos-1*8-1}:{pos-1*8-8}], rx_data[{pos-1}:{pos-8}]}};"
+                f"    // assign header_rx = {rx_slice(layout, field)};"
             )
-            pos -= 32
 
-        for num, vout in enumerate(project["voutnames"]):
+        for field in layout.kind("rx", "joint"):
             top_data.append(
-                f"    assign {vout['_prefix']} = {{rx_data[{pos-3*8-1}:{pos-3*8-8}], rx_data[{pos-2*8-1}:{pos-2*8-8}], rx_data[{pos-1*8-1}:{pos-1*8-8}], rx_data[{pos-1}:{pos-8}]}};"
+                f"    assign {field['name']}FreqCmd = {rx_signed(layout, field)};"
             )
-            pos -= 32
 
-        for num, bout in enumerate(project["boutnames"]):
-            boutsize = bout["size"]
-            pack = []
-            for bn in range(boutsize // 8):
-                pack.append(f"rx_data[{pos-1}:{pos-8}]")
-                pos -= 8
-            pack.reverse()
-            top_data.append(f"    assign {bout['_prefix']} = {{{', '.join(pack)}}};")
-
-        for dbyte in range(project["joints_en_total"] // 8):
-            for num in range(8):
-                bitnum = dbyte * 8 + (7 - num)
-                if bitnum < project["joints"]:
-                    jname = project["jointnames"][bitnum]["_prefix"]
-                    top_data.append(f"    assign {jname}Enable = rx_data[{pos-1}];")
-                pos -= 1
-
-        for dbyte in range(project["douts_total"] // 8):
-            for num in range(8):
-                bitnum = num + (dbyte * 8)
-                if bitnum < project["douts"]:
-                    dname = project["doutnames"][bitnum]["_prefix"]
-                    if project["doutnames"][bitnum].get("invert", False):
-                        top_data.append(f"    assign {dname} = ~rx_data[{pos-1}];")
-                    else:
-                        top_data.append(f"    assign {dname} = rx_data[{pos-1}];")
-                else:
-                    top_data.append(f"    // assign DOUTx = rx_data[{pos-1}];")
-                pos -= 1
+        for field in layout.kind("rx", "vout"):
+            if "slot" not in field:
+                top_data.append(f"    assign {field['name']} = {rx_signed(layout, field)};")
+
+        # the answer echoes the sequence number, the udp interfaces latch tx_data after rx_data
+        for field in layout.kind("rx", "sequence"):
+            top_data.append(f"    wire [15:0] rx_sequence = {rx_slice(layout, field)};")
+
+        if layout.slots:
+            # rotating sub-frame: the slow vouts are latched while their slot is in rx_data,
+            # tx_data sends the vins of the last received slot
+            for field in layout.kind("rx", "slot"):
+                top_data.append(f"    wire [7:0] rx_slot = {rx_slice(layout, field)};")
+            top_data.append("    always @(posedge sysclk) begin")
+            top_data.append("        case (rx_slot)")
+            for slot in range(layout.slots):
+                sfields = [field for field in layout.kind("rx", "vout") if field.get("slot") == slot]
+                if sfields:
+                    top_data.append(f"            8'd{slot}: begin")
+                    for field in sfields:
+                        top_data.append(f"                {field['name']} <= {rx_signed(layout, field)};")
+                    top_data.append("            end")
+            top_data.append("            default: begin")
+            top_data.append("            end")
+            top_data.append("        endcase")
+            top_data.append("    end")
+
+            region = layout.region("tx", "slots")
+            if region["width"]:
+                top_data.append(f"    wire [{region['width'] - 1}:0] tx_slots;")
+                top_data.append("    assign tx_slots =")
+                for slot, sregions in enumerate(region["slots"]):
+                    parts = []
+                    for sregion in sregions:
+                        for field in sregion["fields"]:
+                            parts += tx_bytes(field, field["name"])
+                    used = sum(sregion["width"] for sregion in sregions)
+                    if region["width"] > used:
+                        parts.append(f"{region['width'] - used}'d0")
+                    top_data.append(f"        (rx_slot == 8'd{slot}) ? {{{', '.join(parts)}}} :")
+                top_data.append(f"        {region['width']}'d0;")
+
+        for field in layout.kind("rx", "bout"):
+            top_data.append(f"    assign {field['name']} = {rx_slice(layout, field)};")
+
+        for offset, field in layout.bit_fields(layout.region("rx", "jointEnable")):
+            if field:
+                top_data.append(
+                    f"    assign {field['name']}Enable = rx_data[{layout.buffer_bit(offset)}];"
+                )
+
+        for offset, field in layout.bit_fields(layout.region("rx", "outputs")):
+            bit = layout.buffer_bit(offset)
+            if field is None:
+                top_data.append(f"    // assign DOUTx = rx_data[{bit}];")
+            elif project["doutnames"][field["index"]].get("invert", False):
+                top_data.append(f"    assign {field['name']} = ~rx_data[{bit}];")
+            else:
+                top_data.append(f"    assign {field['name']} = rx_data[{bit}];")
 
         # top_data.append("")
         top_data.append(f"    // tx_data {project['tx_data_size']}")
         top_data.append("    assign tx_data = {")
-        top_data.append(
-            "        header_tx[7:0], header_tx[15:8], header_tx[23:16], header_tx[31:24],"
-        )
+        for field in layout.kind("tx", "header"):
+            top_data.append(f"        {', '.join(tx_bytes(field, 'header_tx'))},")
 
-        for num, joint in enumerate(project["jointnames"]):
+        for field in layout.kind("tx", "joint"):
             top_data.append(
-                f"        {joint['_prefix']}Feedback[7:0], {joint['_prefix']}Feedback[15:8], {joint['_prefix']}Feedback[23:16], {joint['_prefix']}Feedback[31:24],"
+                f"        {', '.join(tx_bytes(field, field['name'] + 'Feedback'))},"
             )
 
-        for bitsize in (32, 16, 8):
-            for num, vin in enumerate(project["vinnames"]):
-                bits = vin.get("_bits", 32)
-                if bitsize != bits:
-                    continue
-                block = []
-                for bit in range(0, bits, 8):
-                    block.append(f"{vin['_prefix']}[{bit+7}:{bit}]")
-                top_data.append(f"        {', '.join(block)}, ")
-
-        for num, bins in enumerate(project["binnames"]):
-            binsize = bins["size"]
-            pack = []
-            for bn in range(binsize // 8):
-                pack.append(f"{bins['_prefix']}[{(bn * 8)+7}:{(bn * 8)}]")
-            top_data.append(f"        {', '.join(pack)},")
+        for region in layout.regions["tx"]:
+            if region["type"] == "slots":
+                if region["width"]:
+                    top_data.append("        tx_slots,")
+            elif region["kind"] == "vin":
+                for field in region["fields"]:
+                    top_data.append(f"        {', '.join(tx_bytes(field, field['name']))}, ")
+            elif region["kind"] == "slot":
+                top_data.append("        rx_slot,")
+            elif region["kind"] == "sequence":
+                top_data.append(f"        {', '.join(tx_bytes(region['fields'][0], 'rx_sequence'))},")
+            elif region["kind"] == "crc":
+                top_data.append("        INTERFACE_CRC_ERRORS,")
+
+        for field in layout.kind("tx", "bin"):
+            top_data.append(f"        {', '.join(tx_bytes(field, field['name']))},")
 
         tdins = []
-        ldin = project["dins"]
-        for dbyte in range(project["dins_total"] // 8):
-            for num in range(8):
-                bitnum = num + (dbyte * 8)
-                if bitnum < project["dins"]:
-                    dname = project["dinnames"][bitnum]["_prefix"]
-                    din_data = project["dinnames"][bitnum]
-                    if bitnum < ldin and din_data.get("invert", False):
-                        tdins.append(f"~{dname}")
-                    else:
-                        tdins.append(f"{dname}")
-                else:
-                    tdins.append(f"1'd0")
+        for offset, field in layout.bit_fields(layout.region("tx", "inputs")):
+            if field is None:
+                tdins.append("1'd0")
+            elif project["dinnames"][field["index"]].get("invert", False):
+                tdins.append(f"~{field['name']}")
+            else:
+                tdins.append(field["name"])
 
         fill = project["data_size"] - project["tx_data_size"]
 
@@ -340,11 +374,10 @@ def verilog_top(project):
         top_data.append("    };")
         # top_data.append("")
 
-        for pname, pins in project["pinlists"].items():
-            for pin in pins:
-                if pin[1].startswith("EXPANSION"):
-                    if pin[2] == "INPUT":
-                        top_data.append(f"    assign {pin[0]} = {pin[1]};")
+        for pin_id in project["expansion_pins"]:
+            pin = project["pins"][pin_id]
+            if pin["direction"] == "INPUT":
+                top_data.append(f"    assign {pin['name']} = {pin_id};")
         for port, pins in expansion_ports.items():
             assign_list = []
             size = expansion_size[port]
@@ -362,7 +395,7 @@ def verilog_top(project):
 
     top_data.append("endmodule")
     top_data.append("")
-    open(f"{project['SOURCE_PATH']}/rio.v", "w").write("\n".join(top_data))
+    write_file(project, f"{project['SOURCE_PATH']}/rio.v", "\n".join(top_data))
     project["verilog_files"].append("rio.v")
 
 
@@ -371,8 +404,10 @@ def generate(project):
 
     # general verilog-files
     project["verilog_files"].append("debouncer.v")
-    os.system(
-        f"cp -a generators/gateware/debouncer.v* {project['SOURCE_PATH']}/debouncer.v"
+    copy_file(
+        project,
+        "generators/gateware/debouncer.v",
+        f"{project['SOURCE_PATH']}/debouncer.v",
     )
 
     # system clock (pll setup)
@@ -403,27 +438,40 @@ def generate(project):
             divider.append("endmodule")
             divider.append("")
             divider.append("")
-            open(f"{project['SOURCE_PATH']}/pll.v", "w").write("\n".join(divider))
-        elif project["jdata"]["family"] == "ecp5":
-            os.system(
-                f"ecppll -f '{project['SOURCE_PATH']}/pll.v' -i {float(project['osc_clock']) / 1000000} -o {float(project['jdata']['clock']['speed']) / 1000000}"
-            )
-        elif project["jdata"]["type"] == "up5k":
-            os.system(
-                f"icepll -p -m -f '{project['SOURCE_PATH']}/pll.v' -i {float(project['osc_clock']) / 1000000} -o {float(project['jdata']['clock']['speed']) / 1000000}"
-            )
-        elif project["jdata"]["family"] == "GW1N-9C":
-            os.system(
-                f"python3 files/gowin-pll.py -d 'GW1NR-9 C6/I5' -f '{project['SOURCE_PATH']}/pll.v' -i {float(project['osc_clock']) / 1000000} -o {float(project['jdata']['clock']['speed']) / 1000000}"
-            )
-        elif project["jdata"]["family"] == "MAX 10":
-            os.system(
-                f"files/quartus-pll.sh \"{project['jdata']['family']}\" {float(project['osc_clock']) / 1000000} {float(project['jdata']['clock']['speed']) / 1000000} '{project['SOURCE_PATH']}/pll.v'"
+            write_file(
+                project, f"{project['SOURCE_PATH']}/pll.v", "\n".join(divider)
             )
         else:
-            os.system(
-                f"icepll -q -m -f '{project['SOURCE_PATH']}/pll.v' -i {float(project['osc_clock']) / 1000000} -o {float(project['jdata']['clock']['speed']) / 1000000}"
-            )
+            # the pll tools always rewrite their output, generate into a tempdir and only update on changes
+            with tempfile.TemporaryDirectory() as tmpdir:
+                pll_file = f"{tmpdir}/pll.v"
+                if project["jdata"]["family"] == "ecp5":
+                    command = (
+                        f"ecppll -f '{pll_file}' -i {float(project['osc_clock']) / 1000000} -o {float(project['jdata']['clock']['speed']) / 1000000}"
+                    )
+                elif project["jdata"]["type"] == "up5k":
+                    command = (
+                        f"icepll -p -m -f '{pll_file}' -i {float(project['osc_clock']) / 1000000} -o {float(project['jdata']['clock']['speed']) / 1000000}"
+                    )
+                elif project["jdata"]["family"] == "GW1N-9C":
+                    command = (
+                        f"python3 files/gowin-pll.py -d 'GW1NR-9 C6/I5' -f '{pll_file}' -i {float(project['osc_clock']) / 1000000} -o {float(project['jdata']['clock']['speed']) / 1000000}"
+                    )
+                elif project["jdata"]["family"] == "MAX 10":
+                    command = (
+                        f"files/quartus-pll.sh \"{project['jdata']['family']}\" {float(project['osc_clock']) / 1000000} {float(project['jdata']['clock']['speed']) / 1000000} '{pll_file}'"
+                    )
+                else:
+                    command = (
+                        f"icepll -q -m -f '{pll_file}' -i {float(project['osc_clock']) / 1000000} -o {float(project['jdata']['clock']['speed']) / 1000000}"
+                    )
+                profiler.system(command)
+                if os.path.isfile(pll_file):
+                    write_file(
+                        project,
+                        f"{project['SOURCE_PATH']}/pll.v",
+                        open(pll_file, "r").read(),
+                    )
         project["verilog_files"].append("pll.v")
 
     verilog_top(project)
@@ -447,6 +495,3 @@ def generate(project):
         buildsys_diamond(project)
     elif project["jdata"].get("toolchain") == "verilator":
         buildsys_verilator(project)
-
-    # backup active configuration
-    open(f"{project['SOURCE_PATH']}/config.json", "w").write(json.dumps(project["jdata"], indent=2))
@@ -1,3 +1,6 @@
+from fileWriter import write_file
+
+
 def pins_lpf(project, diamond=False):
     lpf_data = []
     if diamond:
@@ -37,7 +40,7 @@ def pins_lpf(project, diamond=False):
 
         lpf_data.append("")
     lpf_data.append("")
-    open(f"{project['PINS_PATH']}/pins.lpf", "w").write("\n".join(lpf_data))
+    write_file(project, f"{project['PINS_PATH']}/pins.lpf", "\n".join(lpf_data))
 
 
 def pins_cst(project):
@@ -59,7 +62,7 @@ def pins_cst(project):
 
         data.append("")
     data.append("")
-    open(f"{project['PINS_PATH']}/pins.cst", "w").write("\n".join(data))
+    write_file(project, f"{project['PINS_PATH']}/pins.cst", "\n".join(data))
 
 
 def pins_pcf(project):
@@ -77,7 +80,7 @@ def pins_pcf(project):
 
             data.append(f"set_io {options} {pin[0]} {pin[1]}")
         data.append("")
-    open(f"{project['PINS_PATH']}/pins.pcf", "w").write("\n".join(data))
+    write_file(project, f"{project['PINS_PATH']}/pins.pcf", "\n".join(data))
 
 
 def pins_xdc(project):
@@ -95,7 +98,7 @@ def pins_xdc(project):
             if len(pin) > 3 and pin[3]:
                 data.append(f"set_property PULLUP TRUE [get_ports {pin[0]}]")
         data.append("")
-    open(f"{project['PINS_PATH']}/pins.xdc", "w").write("\n".join(data))
+    write_file(project, f"{project['PINS_PATH']}/pins.xdc", "\n".join(data))
 
 
 def pins_qdf(project):
@@ -118,7 +121,7 @@ def pins_qdf(project):
                 )
 
         data.append("")
-    open(f"{project['PINS_PATH']}/pins.qdf", "w").write("\n".join(data))
+    write_file(project, f"{project['PINS_PATH']}/pins.qdf", "\n".join(data))
 
 
 def pins_ucf(project):
@@ -137,4 +140,4 @@ def pins_ucf(project):
 
         data.append("")
 
-    open(f"{project['PINS_PATH']}/pins.ucf", "w").write("\n".join(data))
+    write_file(project, f"{project['PINS_PATH']}/pins.ucf", "\n".join(data))
@@ -1,3 +1,6 @@
+from fileWriter import write_file
+
+
 def testbench(project):
     # experimental/uncompleted testbench generator
     top_arguments = []
@@ -59,4 +62,4 @@ def testbench(project):
     testb_data.append("endmodule")
     testb_data.append("")
 
-    open(f"{project['SOURCE_PATH']}/testb.v", "w").write("\n".join(testb_data))
+    write_file(project, f"{project['SOURCE_PATH']}/testb.v", "\n".join(testb_data))
@@ -1,6 +1,216 @@
 import os
+import struct
 import sys
 
+from fileWriter import copy_files, write_file
+from frameLayout import CRC_TABLES
+from transferTable import vin_table
+
+# fixed point jointFreqCmd: rio.c divides a per joint constant by the frequency in 1/16 Hz
+FREQ_FRAC_BITS = 4
+INT32_MAX = 0x7FFFFFFF
+
+# bcm2835 spi: core clock of the Raspberry 4 (500MHz, the Raspberry 3 runs at 400MHz),
+# the fastest spi clock for a divider, rpispi CORE_CLOCK for other boards
+SPI_CORE_CLOCK = 500000000
+SPI_DIVIDERS = [1 << n for n in range(1, 17)]
+# hardware chip selects of SPI0 (gpio pin: bcm2835 cs)
+SPI_HW_CS = {8: "BCM2835_SPI_CS0", 7: "BCM2835_SPI_CS1"}
+
+
+# array sizes of the frame regions in rio.h
+REGION_SIZES = {
+    "jointFreqCmd32": "JOINTS_32",
+    "jointFreqCmd16": "JOINTS_16",
+    "jointFreqCmd8": "JOINTS_8",
+    "jointFeedback": "JOINTS",
+    "setPoint32": "VARIABLE_OUTPUTS_32",
+    "setPoint16": "VARIABLE_OUTPUTS_16",
+    "setPoint8": "VARIABLE_OUTPUTS_8",
+    "processVariable32": "VARIABLE_INPUTS_32",
+    "processVariable16": "VARIABLE_INPUTS_16",
+    "processVariable8": "VARIABLE_INPUTS_8",
+    "jointEnable": "JOINT_ENABLE_BYTES",
+    "outputs": "DIGITAL_OUTPUT_BYTES",
+    "inputs": "DIGITAL_INPUT_BYTES",
+}
+
+
+def joint_cmd_num(osc, jtype):
+    """numerator of the jointFreqCmd division (joints_cmd_num in rio.h), 0 for joint_pwmdir (sends the frequency)"""
+    if jtype == "joint_pwmdir":
+        return 0
+    if jtype == "joint_rcservo":
+        return osc << FREQ_FRAC_BITS
+    # joint_stepper: PRU_OSC / freq / 2
+    return osc << (FREQ_FRAC_BITS - 1)
+
+
+def joint_cmd_max(bits):
+    """largest jointFreqCmd (or setPoint) of a joint (vout) with the given width (joints_cmd_max in rio.h)"""
+    return (1 << (bits - 1)) - 1
+
+
+def freq_cmd(num, freq, cmd_max=INT32_MAX):
+    """bit exact reference of freq_cmd() in rio.c (the frequency is a float there)"""
+    freq = struct.unpack("<f", struct.pack("<f", freq))[0]
+    if num == 0:
+        return int(max(min(freq, cmd_max), -cmd_max))
+    freq_q = int(freq * (1 << FREQ_FRAC_BITS))
+    if freq_q == 0:
+        return 0
+    cmd = num // abs(freq_q)
+    if cmd > cmd_max:
+        # slower than the width of the joint can encode: stop
+        return 0
+    return cmd if freq_q > 0 else -cmd
+
+
+def spi_prescaler(bits, budget, fpga_clock, core_clock=SPI_CORE_CLOCK):
+    """
+    slowest spi clock divider that transfers a frame of bits within budget (s), returns (divider, time)
+
+    the spi slave samples SCK with the fpga clock and needs 4 clocks per SCK period,
+    if the frame does not fit the budget, the fastest divider of the fpga is used
+    """
+    valid = [divider for divider in SPI_DIVIDERS if core_clock / divider <= fpga_clock / 4] or SPI_DIVIDERS[-1:]
+    fitting = [divider for divider in valid if bits * divider / core_clock <= budget]
+    divider = fitting[-1] if fitting else valid[0]
+    return (divider, bits * divider / core_clock)
+
+
+def linear_conversion(plugin, setup, direction):
+    """(scale, offset) of the vin/vout conversion, None if it is not linear (called as calc_ function)"""
+    if not hasattr(plugin, f"calculation_{direction}_c"):
+        return (1.0, 0.0)
+    if hasattr(plugin, f"calculation_{direction}_linear"):
+        return getattr(plugin, f"calculation_{direction}_linear")(setup)
+    return None
+
+
+def c_float(value):
+    """float constant for rio.h (float precision)"""
+    text = f"{float(value):.9g}"
+    if "." not in text and "e" not in text:
+        text += ".0"
+    return f"{text}f"
+
+
+def linear_expression(value, scale, offset):
+    """value * scale + offset as C expression, identities are left out"""
+    if scale != 1.0:
+        value = f"{value} * {c_float(scale)}"
+    if offset != 0.0:
+        value = f"{value} + {c_float(offset)}"
+    return value
+
+
+def frame_members(layout, direction, kind):
+    """the struct member of every field of a kind by index, like processVariable16[2] or slot1.setPoint32[0]"""
+    members = {}
+    for region in layout.regions[direction]:
+        if region["kind"] != kind:
+            continue
+        if region["type"] == "slots":
+            for slot, sregions in enumerate(region["slots"]):
+                for sregion in sregions:
+                    for pos, field in enumerate(sregion["fields"]):
+                        members[field["index"]] = f"slot{slot}.{sregion['name']}[{pos}]"
+        else:
+            for pos, field in enumerate(region["fields"]):
+                members[field["index"]] = f"{region['name']}[{pos}]"
+    return members
+
+
+def frame_slots(layout, direction, kind):
+    """the slot of every slow field of a kind by index (rotating sub-frame), None for the fast ones"""
+    return {field["index"]: field.get("slot") for field in layout.kind(direction, kind)}
+
+
+def convert_body(lines, frame):
+    """the lines of a convert function by slot, the slow fields only while their slot is in the frame"""
+    body = list(lines.get(None, []))
+    slots = sorted(slot for slot in lines if slot is not None)
+    if slots:
+        body.append(f"    switch ({frame}->slot) {{")
+        for slot in slots:
+            body.append(f"    case {slot}:")
+            body += [f"    {line}" for line in lines[slot]]
+            body.append("        break;")
+        body.append("    }")
+    return body
+
+
+def frame_crc(bits):
+    """the crc functions of the frame trailer (see frameLayout.py: crc)"""
+    ctype = f"uint{bits}_t"
+    size = bits // 8
+    lines = []
+    lines.append("// header of a dropped answer (wrong crc)")
+    lines.append("#define PRU_CRC_ERROR       0x63726365")
+    lines.append("")
+    lines.append(f"// frame crc, msb first, init all ones, no final xor, the last {size} bytes of the frame (big endian)")
+    lines.append(f"static const {ctype} crc_table[256] = {{")
+    table = CRC_TABLES[bits]
+    for start in range(0, 256, 8):
+        lines.append("    " + ", ".join(f"0x{value:0{size * 2}x}" for value in table[start : start + 8]) + ",")
+    lines.append("};")
+    lines.append("")
+    lines.append(f"static inline {ctype} frame_crc(const uint8_t *data, int size) {{")
+    lines.append(f"    {ctype} crc = 0x{(1 << bits) - 1:x};")
+    lines.append("    int i;")
+    lines.append("    for (i = 0; i < size; i++) {")
+    lines.append(f"        crc = (crc << 8) ^ crc_table[(crc >> {bits - 8}) ^ data[i]];")
+    lines.append("    }")
+    lines.append("    return crc;")
+    lines.append("}")
+    lines.append("")
+    lines.append("static inline void frame_crc_set(uint8_t *buffer) {")
+    lines.append(f"    {ctype} crc = frame_crc(buffer, SPIBUFSIZE - {size});")
+    for num in range(size):
+        shift = bits - 8 - num * 8
+        lines.append(f"    buffer[SPIBUFSIZE - {size - num}] = crc >> {shift};" if shift else f"    buffer[SPIBUFSIZE - {size - num}] = crc;")
+    lines.append("}")
+    lines.append("")
+    lines.append("// the crc over a frame with a valid trailer is 0")
+    lines.append("static inline int frame_crc_check(const uint8_t *buffer) {")
+    lines.append("    return frame_crc(buffer, SPIBUFSIZE) == 0;")
+    lines.append("}")
+    lines.append("")
+    return lines
+
+
+def frame_struct(layout, direction):
+    """the members of the txData_t (rx frame) or rxData_t (tx frame) struct"""
+    members = []
+    for region in layout.regions[direction]:
+        ctype = f"int{region['bits']}_t" if region["signed"] else f"uint{region['bits']}_t"
+        if region["kind"] in ("header", "sequence", "slot", "crc"):
+            members.append(f"        {ctype} {region['name']};")
+        elif region["type"] == "slots":
+            # rotating sub-frame: one struct per slot at the same offset
+            if not region["width"]:
+                continue
+            members.append("        union {")
+            for slot, sregions in enumerate(region["slots"]):
+                if not sregions:
+                    continue
+                members.append("            struct {")
+                for sregion in sregions:
+                    members.append(
+                        f"                int{sregion['bits']}_t {sregion['name']}[{len(sregion['fields'])}];"
+                    )
+                members.append(f"            }} slot{slot};")
+            members.append(f"            uint8_t slotBuffer[{region['width'] // 8}];")
+            members.append("        };")
+        elif layout.slots:
+            # the defines count the slow fields too
+            members.append(f"        {ctype} {region['name']}[{region['width'] // region['bits']}];")
+        else:
+            size = REGION_SIZES.get(region["name"], region["width"] // region["bits"])
+            members.append(f"        {ctype} {region['name']}[{size}];")
+    return members
+
 
 def generate(project):
     print("generating linux-cnc component")
@@ -42,7 +252,32 @@ def generate(project):
         rpi_spi_miso = project['jdata'].get('rpispi', {}).get('MISO', 9)
         rpi_spi_clk = project['jdata'].get('rpispi', {}).get('CLK', 11)
         rpi_spi_cs = project['jdata'].get('rpispi', {}).get('CS', 7)
+        rpi_spi_hwcs = project['jdata'].get('rpispi', {}).get('HWCS', False)
         rpi_spi_prescaler = project['jdata'].get('rpispi', {}).get('PRESCALER', 256)
+        rpi_spi_core_clock = int(project['jdata'].get('rpispi', {}).get('CORE_CLOCK', SPI_CORE_CLOCK))
+        # transfer time of one frame (us)
+        rpi_spi_budget = float(project['jdata'].get('rpispi', {}).get('BUDGET', 100))
+        fpga_clock = int(project['jdata']['clock']['speed'])
+        if rpi_spi_prescaler == "auto":
+            rpi_spi_prescaler, transfer = spi_prescaler(
+                project['data_size'], rpi_spi_budget / 1000000, fpga_clock, rpi_spi_core_clock
+            )
+            if transfer * 1000000 > rpi_spi_budget:
+                print(
+                    f"WARNING: spi transfer of the frame takes {transfer * 1000000:.1f}us "
+                    f"(PRESCALER {rpi_spi_prescaler}), more than the BUDGET of {rpi_spi_budget:.1f}us"
+                )
+        elif not str(rpi_spi_prescaler).isdigit() or int(rpi_spi_prescaler) not in SPI_DIVIDERS:
+            print(f"ERROR: rpispi PRESCALER must be auto or a power of 2 (2-65536): {rpi_spi_prescaler}")
+            sys.exit(1)
+        elif rpi_spi_core_clock / int(rpi_spi_prescaler) > fpga_clock / 4:
+            print(
+                f"WARNING: spi clock {rpi_spi_core_clock / int(rpi_spi_prescaler) / 1000000:.2f}MHz "
+                f"(PRESCALER {rpi_spi_prescaler}) is faster than the fpga can sample (clock / 4)"
+            )
+        if rpi_spi_hwcs and int(rpi_spi_cs) not in SPI_HW_CS:
+            print(f"ERROR: rpispi HWCS needs CS on CE0 (8) or CE1 (7): {rpi_spi_cs}")
+            sys.exit(1)
         rio_data.append("#define TRANSPORT_SPI")
         rio_data.append("// for Raspberry 3 and 4")
         rio_data.append("// If you are using a different board refer to this for the pin mapping")
@@ -53,19 +288,33 @@ def generate(project):
         rio_data.append(f"#define SPI_PIN_CLK {rpi_spi_clk}")
         rio_data.append(f"#define SPI_PIN_CS {rpi_spi_cs}")
         rio_data.append(f"#define SPI_SPEED BCM2835_SPI_CLOCK_DIVIDER_{rpi_spi_prescaler}")
+        if rpi_spi_hwcs:
+            rio_data.append(f"#define SPI_HW_CS {SPI_HW_CS[int(rpi_spi_cs)]}")
     elif transport == "FTDI":
         print("##################################################################")
         print("# WARNING: do not use usb for real systems, this will not work ! #")
         print("##################################################################")
         rio_data.append("#define TRANSPORT_FTDI")
+    elif transport == "SHM":
+        # shared memory mailbox with the verilator simulation or boardEmulator.py --shm
+        rio_data.append("#define TRANSPORT_SHM")
+        rio_data.append(
+            f"#define SHM_FILE \"{project['jdata'].get('shm', '/dev/shm/rio')}\""
+        )
     else:
-        print(f"ERROR: UNKNOWN transport protocol: {transport} (UDP, SPI, SERIAL)")
+        print(f"ERROR: UNKNOWN transport protocol: {transport} (UDP, SPI, SERIAL, FTDI, SHM)")
         sys.exit(1)
 
     rio_data.append("")
     rio_data.append(f"#define JOINTS               {project['joints']}")
+    for bits in (32, 16, 8):
+        count = len([joint for joint in project["jointnames"] if joint.get("_bits", 32) == bits])
+        rio_data.append(f"#define {f'JOINTS_{bits}':<20} {count}")
     rio_data.append(f"#define JOINT_ENABLE_BYTES   {project['joints_en_total'] // 8}")
     rio_data.append(f"#define VARIABLE_OUTPUTS     {project['vouts']}")
+    for bits in (32, 16, 8):
+        count = len([vout for vout in project["voutnames"] if vout.get("_bits", 32) == bits])
+        rio_data.append(f"#define {f'VARIABLE_OUTPUTS_{bits}':<20} {count}")
 
     vinBits = {
         32: 0,
@@ -88,6 +337,14 @@ def generate(project):
     rio_data.append(f"#define DIGITAL_INPUTS       {project['dins']}")
     rio_data.append(f"#define DIGITAL_INPUT_BYTES  {project['dins_total'] // 8}")
     rio_data.append(f"#define SPIBUFSIZE           {project['data_size'] // 8}")
+    if project["frame_layout"].slots:
+        rio_data.append(f"#define FRAME_SLOTS          {project['frame_layout'].slots}")
+    if project["frame_layout"].crc:
+        rio_data.append(f"#define FRAME_CRC            {project['frame_layout'].crc}")
+    if project["frame_layout"].sequence:
+        # the answer carries the sequence number of the frame FRAME_LATENCY frames before
+        rio_data.append("#define FRAME_SEQUENCE")
+        rio_data.append(f"#define FRAME_LATENCY        {1 if project['frame_pipelined'] else 0}")
     index_num = 0
     for num in range(project["dins"]):
         dname = project["dinnames"][num]["_name"]
@@ -104,6 +361,7 @@ def generate(project):
     rio_data.append("#define PRU_READ            0x72656164")
     rio_data.append("#define PRU_WRITE           0x77726974")
     rio_data.append("#define PRU_ESTOP           0x65737470")
+    rio_data.append("#define PRU_NO_ANSWER       0x6e6f6e65")
     rio_data.append("#define STEPBIT             22")
     rio_data.append("#define STEP_MASK           (1L<<STEPBIT)")
     rio_data.append("#define STEP_OFFSET         (1L<<(STEPBIT-1))")
@@ -209,18 +467,20 @@ def generate(project):
     rio_data.append(f"uint8_t joints_type[JOINTS] = {{{', '.join(joints_type)}}};")
     rio_data.append("")
 
+    osc = int(project["jdata"]["clock"]["speed"])
+    joints_cmd_num = [str(joint_cmd_num(osc, joint.get("type"))) for joint in project["jointnames"]]
+    rio_data.append(f"#define FREQ_FRAC_BITS {FREQ_FRAC_BITS}")
+    rio_data.append(f"uint64_t joints_cmd_num[JOINTS] = {{{', '.join(joints_cmd_num)}}};")
+    joints_cmd_max = [str(joint_cmd_max(joint.get("_bits", 32))) for joint in project["jointnames"]]
+    rio_data.append(f"const int32_t joints_cmd_max[JOINTS] = {{{', '.join(joints_cmd_max)}}};")
+    rio_data.append("")
+
     rio_data.append("typedef union {")
     rio_data.append("    struct {")
     rio_data.append("        uint8_t txBuffer[SPIBUFSIZE];")
     rio_data.append("    };")
     rio_data.append("    struct {")
-    rio_data.append("        int32_t header;")
-    rio_data.append("        int32_t jointFreqCmd[JOINTS];")
-    rio_data.append("        int32_t setPoint[VARIABLE_OUTPUTS];")
-    for num, bout in enumerate(project["boutnames"]):
-        rio_data.append(f"        uint8_t {bout['_prefix']}[{bout['size'] // 8}];")
-    rio_data.append("        uint8_t jointEnable[JOINT_ENABLE_BYTES];")
-    rio_data.append("        uint8_t outputs[DIGITAL_OUTPUT_BYTES];")
+    rio_data += frame_struct(project["frame_layout"], "rx")
     rio_data.append("    };")
     rio_data.append("} txData_t;")
     rio_data.append("")
@@ -230,16 +490,7 @@ def generate(project):
     rio_data.append("        uint8_t rxBuffer[SPIBUFSIZE];")
     rio_data.append("    };")
     rio_data.append("    struct {")
-    rio_data.append("        int32_t header;")
-    rio_data.append("        int32_t jointFeedback[JOINTS];")
-
-    for bits, num in vinBits.items():
-        rio_data.append(f"        int{bits}_t processVariable{bits}[VARIABLE_INPUTS_{bits}];")
-
-    for num, bins in enumerate(project["binnames"]):
-        rio_data.append(f"        uint8_t {bins['_prefix']}[{bins['size'] // 8}];")
-
-    rio_data.append("        uint8_t inputs[DIGITAL_INPUT_BYTES];")
+    rio_data += frame_struct(project["frame_layout"], "tx")
     rio_data.append("    };")
     rio_data.append("} rxData_t;")
     rio_data.append("")
@@ -255,17 +506,6 @@ def generate(project):
     rio_data.append("};")
     rio_data.append("")
 
-    rio_data.append("const uint8_t vin_bits[] = {")
-    for bitsize, num in vinBits.items():
-        for num in range(project["vins"]):
-            vin = project["vinnames"][num]
-            dname = vin["_name"]
-            bits = vin.get("_bits", 32)
-            if bits == bitsize:
-                rio_data.append(f'    {bits},')
-    rio_data.append("};")
-    rio_data.append("")
-
     rio_data.append("const char vout_names[][32] = {")
     for num in range(project["vouts"]):
         dname = project["voutnames"][num]["_name"]
@@ -335,62 +575,128 @@ def generate(project):
         rio_data.append(" \\\n".join(bin_callbacks))
         rio_data.append("")
 
-    rio_data.append("typedef float (*calc)(float);")
+    # transfer tables of the vins (see transferTable.py: TransferTable.lookup)
+    rio_data.append("static inline float table_lookup(const float *table, int size, float raw_min, float raw_scale, float value) {")
+    rio_data.append("    float pos = (value - raw_min) * raw_scale;")
+    rio_data.append("    if (pos <= 0.0) {")
+    rio_data.append("        return table[0];")
+    rio_data.append("    }")
+    rio_data.append("    if (pos >= size) {")
+    rio_data.append("        return table[size];")
+    rio_data.append("    }")
+    rio_data.append("    int index = (int)pos;")
+    rio_data.append("    return table[index] + (table[index + 1] - table[index]) * (pos - index);")
+    rio_data.append("}")
     rio_data.append("")
 
+    if project["frame_layout"].crc:
+        rio_data += frame_crc(project["frame_layout"].crc)
+
+    # vins in the order of the rx frame (32, 16 and 8 bit)
+    vin_order = []
     for bitsize, num in vinBits.items():
         for num in range(project["vins"]):
-            vin = project["vinnames"][num]
-            plugin_name = vin["_plugin"]
-            bits = vin.get("_bits", 32)
-            if bits == bitsize:
-                rio_data.append(f"float calc_{plugin_name}{num}(float value) {{")
-                if hasattr(project["plugins"][plugin_name], "calculation_vin_c"):
-                    func = project["plugins"][plugin_name].calculation_vin_c(vin).strip()
-                    rio_data.append(f"    {func}")
-                rio_data.append("    return value;")
-                rio_data.append("}")
-                rio_data.append("")
+            if project["vinnames"][num].get("_bits", 32) == bitsize:
+                vin_order.append(num)
+
+    vin_members = frame_members(project["frame_layout"], "tx", "vin")
+    vin_slots = frame_slots(project["frame_layout"], "tx", "vin")
+    vin_lines = {}
+    for index, num in enumerate(vin_order):
+        vin = project["vinnames"][num]
+        plugin_name = vin["_plugin"]
+        raw = f"(float)rx->{vin_members[num]}"
+        lines = vin_lines.setdefault(vin_slots[num], [])
+        try:
+            table = vin_table(project["plugins"][plugin_name], vin)
+        except ValueError as error:
+            print(f"ERROR: vin {vin['_name']}: {error}")
+            sys.exit(1)
+        linear = linear_conversion(project["plugins"][plugin_name], vin, "vin")
+        if table is not None:
+            rio_data.append(f"// {vin['_name']}: {table.raw_min:g} .. {table.raw_max:g} -> {table.unit}")
+            rio_data.append(f"const float table_{plugin_name}{num}[{table.size + 1}] = {{")
+            for pos in range(0, table.size + 1, 8):
+                rio_data.append("    " + " ".join(f"{c_float(value)}," for value in table.values[pos : pos + 8]))
+            rio_data.append("};")
+            rio_data.append("")
+            lines.append(
+                f"    values[{index}] = table_lookup(table_{plugin_name}{num}, {table.size}, "
+                f"{c_float(table.raw_min)}, {c_float(table.raw_scale)}, {raw});"
+            )
+        elif linear is None:
+            func = project["plugins"][plugin_name].calculation_vin_c(vin).strip()
+            rio_data.append(f"float calc_{plugin_name}{num}(float value) {{")
+            rio_data.append(f"    {func}")
+            rio_data.append("    return value;")
+            rio_data.append("}")
+            rio_data.append("")
+            lines.append(f"    values[{index}] = calc_{plugin_name}{num}({raw});")
+        else:
+            lines.append(f"    values[{index}] = {linear_expression(raw, *linear)};")
 
+    vout_members = frame_members(project["frame_layout"], "rx", "vout")
+    vout_slots = frame_slots(project["frame_layout"], "rx", "vout")
+    vout_lines = {}
     for num in range(project["vouts"]):
         vout = project["voutnames"][num]
         plugin_name = vout["_plugin"]
-        rio_data.append(f"float calc_{plugin_name}{num}(float value) {{")
-        if hasattr(project["plugins"][plugin_name], "calculation_vout_c"):
+        lines = vout_lines.setdefault(vout_slots[num], [])
+        linear = linear_conversion(project["plugins"][plugin_name], vout, "vout")
+        if linear is None:
             func = project["plugins"][plugin_name].calculation_vout_c(vout).strip()
+            rio_data.append(f"float calc_{plugin_name}{num}(float value) {{")
             rio_data.append(f"    {func}")
+            rio_data.append("    return value;")
+            rio_data.append("}")
+            rio_data.append("")
+            value = f"calc_{plugin_name}{num}(values[{num}])"
+        else:
+            value = linear_expression(f"values[{num}]", *linear)
+        if vout.get("_bits", 32) < 32:
+            value = f"vout_limit({value}, {c_float(joint_cmd_max(vout['_bits']))})"
+        lines.append(f"    tx->{vout_members[num]} = {value};")
+
+    # identity and linear conversions are inlined, only the non-linear ones call their calc_ function
+    # values of slow vins in other slots are kept
+    rio_data.append("static inline void vin_convert(const rxData_t *rx, float *values) {")
+    rio_data += convert_body(vin_lines, "rx")
+    rio_data.append("}")
+    rio_data.append("")
+
+    if any(vout.get("_bits", 32) < 32 for vout in project["voutnames"]):
+        # the float to int conversion is undefined outside of the width
+        rio_data.append("static inline float vout_limit(float value, float limit) {")
+        rio_data.append("    if (value > limit) {")
+        rio_data.append("        return limit;")
+        rio_data.append("    } else if (value < -limit) {")
+        rio_data.append("        return -limit;")
+        rio_data.append("    }")
         rio_data.append("    return value;")
         rio_data.append("}")
         rio_data.append("")
 
-    rio_data.append("const calc vin_calc[] = {")
-    for bitsize, num in vinBits.items():
-        for num in range(project["vins"]):
-            vin = project["vinnames"][num]
-            plugin_name = vin["_plugin"]
-            bits = vin.get("_bits", 32)
-            if bits == bitsize:
-                rio_data.append(f"    &calc_{plugin_name}{num},")
-    rio_data.append("};")
+    rio_data.append("static inline void vout_convert(const float *values, txData_t *tx) {")
+    rio_data += convert_body(vout_lines, "tx")
+    rio_data.append("}")
     rio_data.append("")
 
-    rio_data.append("const calc vout_calc[] = {")
-    for num in range(project["vouts"]):
-        vout = project["voutnames"][num]
-        plugin_name = vout["_plugin"]
-        rio_data.append(f"    &calc_{plugin_name}{num},")
-    rio_data.append("};")
+    # joint commands into the members of their width
+    rio_data.append("static inline void joint_convert(const int32_t *cmds, txData_t *tx) {")
+    for num, member in sorted(frame_members(project["frame_layout"], "rx", "joint").items()):
+        rio_data.append(f"    tx->{member} = cmds[{num}];")
+    rio_data.append("}")
     rio_data.append("")
 
-
     rio_data.append("#endif")
     rio_data.append("")
 
-    open(f"{project['LINUXCNC_PATH']}/Components/rio.h", "w").write("\n".join(rio_data))
-
-    os.system(
-        f"cp -a generators/linuxcnc_component/*.c {project['LINUXCNC_PATH']}/Components/"
+    write_file(
+        project, f"{project['LINUXCNC_PATH']}/Components/rio.h", "\n".join(rio_data)
     )
-    os.system(
-        f"cp -a generators/linuxcnc_component/*.h {project['LINUXCNC_PATH']}/Components/"
+
+    copy_files(
+        project,
+        "generators/linuxcnc_component/*.[ch]",
+        f"{project['LINUXCNC_PATH']}/Components",
     )
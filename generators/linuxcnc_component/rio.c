@@ -97,6 +97,14 @@ typedef struct {
     hal_bit_t		*PRUreset;
     bool			SPIresetOld;
     hal_bit_t		*SPIstatus;
+#ifdef FRAME_CRC
+    hal_u32_t		*crcErrors;					// pin: answers with a wrong crc
+    hal_u32_t		*crcErrorsFpga;				// pin: frames with a wrong crc, dropped by the gateware
+    uint8_t			crcErrorsFpgaOld;
+#endif
+#ifdef FRAME_SEQUENCE
+    hal_u32_t		*framesLate;				// pin: answers with the sequence number of another frame
+#endif
     hal_bit_t 		*stepperEnable[JOINTS];
     int				pos_mode[JOINTS];
     hal_float_t 	*pos_cmd[JOINTS];			// pin: position command (position units)
@@ -136,6 +144,12 @@ typedef struct {
 static data_t *data;
 static txData_t txData;
 static rxData_t rxData;
+#ifdef FRAME_SLOTS
+static int frame_slot = 0;
+#endif
+#ifdef FRAME_SEQUENCE
+static uint16_t frame_sequence = 0;
+#endif
 
 long stamp = 0;
 
@@ -175,6 +189,9 @@ struct sockaddr_in dstAddr, srcAddr;
 struct hostent *server;
 static const char *dstAddress = UDP_IP;
 static int UDP_init(void);
+#ifdef FRAME_SEQUENCE
+static int UDP_answer(const uint8_t *buffer, int size, uint16_t sequence);
+#endif
 #endif
 
 
@@ -182,6 +199,28 @@ static int UDP_init(void);
 int serial_fd = -1;
 #endif
 
+#ifdef TRANSPORT_SHM
+// shared memory mailbox (see transport.py: ShmMailbox)
+// the host writes request_frame and then increments request,
+// the board writes answer_frame and then sets answer = request
+#define SHM_MAGIC 0x6F697273
+#define SHM_SLOT ((SPIBUFSIZE + 3) / 4 * 4)
+// spin only a small part of the servo period, a late board is a counted miss (like UDP)
+#define SHM_TIMEOUT_NS 10000
+
+typedef struct {
+    uint32_t magic;
+    uint32_t size;
+    uint32_t request;
+    uint32_t answer;
+    uint8_t request_frame[SHM_SLOT];
+    uint8_t answer_frame[SHM_SLOT];
+} shm_mailbox_t;
+
+static shm_mailbox_t *shm;
+static int errCount;
+#endif
+
 /***********************************************************************
 *                  LOCAL FUNCTION DECLARATIONS                         *
 ************************************************************************/
@@ -311,7 +350,15 @@ int rtapi_app_main(void)
     bcm2835_spi_setBitOrder(BCM2835_SPI_BIT_ORDER_MSBFIRST);
     bcm2835_spi_setDataMode(BCM2835_SPI_MODE0);
     bcm2835_spi_setClockDivider(SPI_SPEED);
+#ifdef SPI_HW_CS
+    // the spi controller drives CS for the whole transfer
+    bcm2835_spi_chipSelect(SPI_HW_CS);
+    bcm2835_spi_setChipSelectPolarity(SPI_HW_CS, LOW);
+#else
     bcm2835_spi_chipSelect(BCM2835_SPI_CS_NONE);
+    bcm2835_gpio_fsel(SPI_PIN_CS, BCM2835_GPIO_FSEL_OUTP);
+    bcm2835_gpio_write(SPI_PIN_CS, HIGH);
+#endif
 #endif
 
 #ifdef TRANSPORT_FTDI
@@ -319,6 +366,27 @@ int rtapi_app_main(void)
 	spi_init();
 #endif
 
+#ifdef TRANSPORT_SHM
+    rtapi_print("Info: Initialize shared memory: %s\n", SHM_FILE);
+    int shm_fd = open(SHM_FILE, O_RDWR | O_CREAT, 0666);
+    if (shm_fd < 0 || ftruncate(shm_fd, sizeof(shm_mailbox_t)) < 0) {
+        rtapi_print_msg(RTAPI_MSG_ERR, "Error: can't open %s\n", SHM_FILE);
+        return -1;
+    }
+    shm = mmap(NULL, sizeof(shm_mailbox_t), PROT_READ | PROT_WRITE, MAP_SHARED, shm_fd, 0);
+    close(shm_fd);
+    if (shm == MAP_FAILED) {
+        rtapi_print_msg(RTAPI_MSG_ERR, "Error: can't map %s\n", SHM_FILE);
+        return -1;
+    }
+    if (shm->magic != SHM_MAGIC || shm->size != SPIBUFSIZE) {
+        shm->size = SPIBUFSIZE;
+        shm->request = 0;
+        shm->answer = 0;
+        __atomic_store_n(&shm->magic, SHM_MAGIC, __ATOMIC_RELEASE);
+    }
+#endif
+
     retval = hal_pin_bit_newf(HAL_IN, &(data->SPIenable),
                               comp_id, "%s.SPI-enable", prefix);
     if (retval != 0) goto error;
@@ -336,6 +404,25 @@ int rtapi_app_main(void)
                               comp_id, "%s.PRU-reset", prefix);
     if (retval != 0) goto error;
 
+#ifdef FRAME_CRC
+    retval = hal_pin_u32_newf(HAL_OUT, &(data->crcErrors),
+                              comp_id, "%s.crc-errors", prefix);
+    if (retval != 0) goto error;
+    *(data->crcErrors) = 0;
+
+    retval = hal_pin_u32_newf(HAL_OUT, &(data->crcErrorsFpga),
+                              comp_id, "%s.crc-errors-fpga", prefix);
+    if (retval != 0) goto error;
+    *(data->crcErrorsFpga) = 0;
+#endif
+
+#ifdef FRAME_SEQUENCE
+    retval = hal_pin_u32_newf(HAL_OUT, &(data->framesLate),
+                              comp_id, "%s.frames-late", prefix);
+    if (retval != 0) goto error;
+    *(data->framesLate) = 0;
+#endif
+
 
     // export all the variables for each joint
     for (n = 0; n < JOINTS; n++) {
@@ -580,6 +667,26 @@ int UDP_init(void)
     return 0;
 }
 
+#ifdef FRAME_SEQUENCE
+// a received datagram is the answer if it carries the sequence number of the frame, late answers are dropped
+int UDP_answer(const uint8_t *buffer, int size, uint16_t sequence)
+{
+    rxData_t answer;
+
+    if (size != SPIBUFSIZE) {
+        rtapi_print("wrong size = %d\n", size);
+        return 0;
+    }
+    memcpy(answer.rxBuffer, buffer, SPIBUFSIZE);
+    if (answer.sequence != sequence) {
+        *(data->framesLate) += 1;
+        return 0;
+    }
+    memcpy(rxData.rxBuffer, buffer, SPIBUFSIZE);
+    return 1;
+}
+#endif
+
 #endif
 
 #ifdef TRANSPORT_SPI
@@ -962,6 +1069,34 @@ void update_freq(void *arg, long period)
 }
 
 
+// jointFreqCmd = num / freq in fixed point (1 / 2^FREQ_FRAC_BITS Hz), no float division in the servo thread
+// num = 0 (JOINT_PWMDIR) sends the frequency, bit exact with freq_cmd() in linuxcnc_component.py
+// cmd_max is the width of the joint in the frame (joints_cmd_max): limits the frequency of JOINT_PWMDIR,
+// slower steps than the width can encode stop the joint (like below 1 / 2^FREQ_FRAC_BITS Hz)
+static int32_t freq_cmd(uint64_t num, float freq, int32_t cmd_max)
+{
+    int64_t freq_q = (int64_t)(freq * (1 << FREQ_FRAC_BITS));
+    uint64_t cmd;
+
+    if (num == 0) {
+        if (freq > cmd_max) {
+            return cmd_max;
+        } else if (freq < -cmd_max) {
+            return -cmd_max;
+        }
+        return (int32_t)freq;
+    }
+    if (freq_q == 0) {
+        return 0;
+    }
+    cmd = num / (uint64_t)(freq_q < 0 ? -freq_q : freq_q);
+    if (cmd > (uint64_t)cmd_max) {
+        return 0;
+    }
+    return freq_q < 0 ? -(int32_t)cmd : (int32_t)cmd;
+}
+
+
 void rio_readwrite()
 {
     int i = 0;
@@ -985,15 +1120,11 @@ void rio_readwrite()
             txData.header = PRU_WRITE;
 
             // Joint frequency commands
+            int32_t jointFreqCmds[JOINTS];
             for (i = 0; i < JOINTS; i++) {
-                if (joints_type[i] == JOINT_PWMDIR) {
-                    txData.jointFreqCmd[i] = data->freq[i];
-                } else if (joints_type[i] == JOINT_STEPPER) {
-                    txData.jointFreqCmd[i] = PRU_OSC / data->freq[i] / 2;
-                } else {
-                    txData.jointFreqCmd[i] = PRU_OSC / data->freq[i];
-                }
+                jointFreqCmds[i] = freq_cmd(joints_cmd_num[i], data->freq[i], joints_cmd_max[i]);
             }
+            joint_convert(jointFreqCmds, &txData);
 
             for (bi = 0; bi < JOINT_ENABLE_BYTES; bi++) {
                 txData.jointEnable[bi] = 0;
@@ -1005,12 +1136,22 @@ void rio_readwrite()
             }
 
             // Set points
+            float setPoints[VARIABLE_OUTPUTS];
             for (i = 0; i < VARIABLE_OUTPUTS; i++) {
                 float value = *(data->setPoint[i]);
                 value *= *(data->setPointScale[i]);
                 value += *(data->setPointOffset[i]);
-                txData.setPoint[i] = vout_calc[i](value);
+                setPoints[i] = value;
             }
+#ifdef FRAME_SLOTS
+            // rotating sub-frame: the slow vouts of one slot per frame
+            txData.slot = frame_slot;
+            frame_slot = (frame_slot + 1) % FRAME_SLOTS;
+#endif
+#ifdef FRAME_SEQUENCE
+            txData.sequence = frame_sequence++;
+#endif
+            vout_convert(setPoints, &txData);
 
             // Outputs
             int byte_out = 0;
@@ -1035,13 +1176,37 @@ void rio_readwrite()
                 }
             }
 
+#ifdef FRAME_CRC
+            frame_crc_set(txData.txBuffer);
+#endif
             rio_transfer();
 
+#ifdef FRAME_SEQUENCE
+            // no answer to this frame (lost or late, see UDP_answer), the feedback keeps the values of the last frame
+            if (rxData.sequence != (uint16_t)(txData.sequence - FRAME_LATENCY)) {
+                rxData.header = PRU_NO_ANSWER;
+            }
+#endif
+
+#ifdef FRAME_CRC
+            // a corrupted answer is dropped, the feedback keeps the values of the last frame
+            if (rxData.header != PRU_NO_ANSWER && !frame_crc_check(rxData.rxBuffer)) {
+                *(data->crcErrors) += 1;
+                rxData.header = PRU_CRC_ERROR;
+            }
+#endif
+
             switch (rxData.header) {	// only process valid SPI payloads. This rejects bad payloads
             case PRU_DATA:
                 // we have received a GOOD payload from the PRU
                 *(data->SPIstatus) = 1;
 
+#ifdef FRAME_CRC
+                // the gateware counts the dropped frames (8bit)
+                *(data->crcErrorsFpga) += (uint8_t)(rxData.crcErrors - data->crcErrorsFpgaOld);
+                data->crcErrorsFpgaOld = rxData.crcErrors;
+#endif
+
                 for (i = 0; i < JOINTS; i++) {
                     if (data->fb_scale[i] == 0.0) {
                         data->fb_scale[i] = data->pos_scale[i];
@@ -1061,17 +1226,11 @@ void rio_readwrite()
                 }
 
                 // Feedback
+                // static: the slow vins of the rotating sub-frame keep their value until their slot is received
+                static float processValues[VARIABLE_INPUTS];
+                vin_convert(&rxData, processValues);
                 for (i = 0; i < VARIABLE_INPUTS; i++) {
-                    float value = 0;
-                    if (vin_bits[i] == 32) {
-                        value = (float)rxData.processVariable32[i];
-                    } else if (vin_bits[i] == 16) {
-                        value = (float)rxData.processVariable16[i - VARIABLE_INPUTS_32];
-                    } else if (vin_bits[i] == 8) {
-                        value = (float)rxData.processVariable8[i - VARIABLE_INPUTS_32 - VARIABLE_INPUTS_16];
-                    }
-
-                    value = vin_calc[i](value);
+                    float value = processValues[i];
                     value += *(data->processVariableOffset[i]);
                     value *= *(data->processVariableScale[i]);
                     *(data->processVariable[i]) = value;
@@ -1113,6 +1272,18 @@ void rio_readwrite()
 
                 break;
 
+#ifdef FRAME_CRC
+            case PRU_CRC_ERROR:
+                // keep the status, the next frame is checked again
+                break;
+#endif
+
+#ifdef FRAME_SEQUENCE
+            case PRU_NO_ANSWER:
+                // the status is reset by rio_transfer() after some frames without answer
+                break;
+#endif
+
             case PRU_ESTOP:
                 // we have an eStop notification from the PRU
                 *(data->SPIstatus) = 0;
@@ -1141,7 +1312,46 @@ void rio_readwrite()
 void rio_transfer()
 {
 
-#ifdef TRANSPORT_UDP
+#if defined(TRANSPORT_UDP) && defined(FRAME_SEQUENCE)
+    int ret;
+    int received = 0;
+    uint8_t rxBufferTmp[SPIBUFSIZE*2];
+    uint16_t sequence = txData.sequence - FRAME_LATENCY;
+
+#if FRAME_LATENCY
+    // pipelined: the answer of the last frame is already in the socket buffer, no waiting in the servo thread
+    while ((ret = recv(udpSocket, rxBufferTmp, SPIBUFSIZE*2, MSG_DONTWAIT)) > 0) {
+        received |= UDP_answer(rxBufferTmp, ret, sequence);
+    }
+    send(udpSocket, txData.txBuffer, SPIBUFSIZE, 0);
+#else
+    long t1;
+
+    send(udpSocket, txData.txBuffer, SPIBUFSIZE, 0);
+
+    // wait for the answer of this frame, the answers of older frames are dropped
+    t1 = rtapi_get_time();
+    while (!received && (rtapi_get_time() - t1) < 20*1000*1000) {
+        ret = recv(udpSocket, rxBufferTmp, SPIBUFSIZE*2, MSG_DONTWAIT);
+        if (ret > 0) {
+            received = UDP_answer(rxBufferTmp, ret, sequence);
+        } else {
+            rtapi_delay(READ_PCK_DELAY_NS);
+        }
+    }
+#endif
+
+    if (received) {
+        errCount = 0;
+    } else {
+        errCount++;
+        rtapi_print("Ethernet ERROR: no answer N = %d\n", errCount);
+    }
+
+    if (errCount > 2) {
+        *(data->SPIstatus) = 0;
+    }
+#elif defined(TRANSPORT_UDP)
     int i;
     int ret;
     long t1;
@@ -1207,16 +1417,15 @@ void rio_transfer()
 #endif
 
 #ifdef TRANSPORT_SPI
-    int i;
-
-    bcm2835_gpio_fsel(SPI_PIN_CS, BCM2835_GPIO_FSEL_OUTP);
+    // the whole frame in one transfer through the fifos
+#ifndef SPI_HW_CS
     bcm2835_gpio_write(SPI_PIN_CS, LOW);
-
-    for (i = 0; i < SPIBUFSIZE; i++) {
-        rxData.rxBuffer[i] = bcm2835_spi_transfer(txData.txBuffer[i]);
-    }
+#endif
+    bcm2835_spi_transfernb((char *)txData.txBuffer, (char *)rxData.rxBuffer, SPIBUFSIZE);
+#ifndef SPI_HW_CS
     bcm2835_gpio_write(SPI_PIN_CS, HIGH);
 #endif
+#endif
 
 #ifdef TRANSPORT_FTDI
     int i;
@@ -1224,6 +1433,31 @@ void rio_transfer()
 	spi_rw_buffer(txData.txBuffer, rxData.rxBuffer, SPIBUFSIZE);
 #endif
 
+#ifdef TRANSPORT_SHM
+    uint32_t seq;
+    long t1;
+
+    // no syscalls: post the frame and spin on the answer sequence
+    memcpy(shm->request_frame, txData.txBuffer, SPIBUFSIZE);
+    seq = shm->request + 1;
+    __atomic_store_n(&shm->request, seq, __ATOMIC_RELEASE);
+
+    t1 = rtapi_get_time();
+    while (__atomic_load_n(&shm->answer, __ATOMIC_ACQUIRE) != seq && rtapi_get_time() - t1 < SHM_TIMEOUT_NS);
+
+    if (__atomic_load_n(&shm->answer, __ATOMIC_ACQUIRE) == seq) {
+        errCount = 0;
+        memcpy(rxData.rxBuffer, shm->answer_frame, SPIBUFSIZE);
+    } else {
+        errCount++;
+        rtapi_print("SHM ERROR: no answer, N = %d\n", errCount);
+    }
+
+    if (errCount > 2) {
+        *(data->SPIstatus) = 0;
+    }
+#endif
+
 }
 
 static CONTROL parse_ctrl_type(const char *ctrl)
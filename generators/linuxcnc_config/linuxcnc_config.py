@@ -1,6 +1,8 @@
 import os
 import sys
 
+from fileWriter import copy_file, copy_tree, write_file
+
 axis_names = ["X", "Y", "Z", "A", "C", "B", "U", "V", "W"]
 netlist = []
 
@@ -871,8 +873,10 @@ def generate_rio_ini(project):
             cfgini_data.append(f"{key} = {value}")
         cfgini_data.append("")
 
-    open(f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/rio.ini", "w").write(
-        "\n".join(cfgini_data)
+    write_file(
+        project,
+        f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/rio.ini",
+        "\n".join(cfgini_data),
     )
 
 
@@ -1366,8 +1370,10 @@ net j{num}enable 		<= joint.{num}.amp-enable-out 	=> rio.joint.{num}.enable
 
 
 
-    open(f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/rio.hal", "w").write(
-        "\n".join(cfghal_data)
+    write_file(
+        project,
+        f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/rio.hal",
+        "\n".join(cfghal_data),
     )
 
 
@@ -1565,15 +1571,19 @@ def generate_custom_postgui_hal(project):
                 f"#net {prefix}-spindle-current    vfd.rated-motor-current   => {prefix}.spindle-current"
             )
 
-    open(f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/custom_postgui.hal", "w").write(
-        "\n".join(customhal_data)
+    write_file(
+        project,
+        f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/custom_postgui.hal",
+        "\n".join(customhal_data),
     )
 
     postgui_list = []
     postgui_list.append("source custom_postgui.hal")
-    open(
-        f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/postgui_call_list.hal", "w"
-    ).write("\n".join(postgui_list))
+    write_file(
+        project,
+        f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/postgui_call_list.hal",
+        "\n".join(postgui_list),
+    )
 
 
 def generate_rio_gui(project):
@@ -1884,23 +1894,25 @@ def generate_rio_gui(project):
     cfgxml_data += gui_gen.draw_end()
 
     if gui == "qtdragon":
-        os.system(f"mkdir -p {project['LINUXCNC_PATH']}/ConfigSamples/rio/rio_hd")
-        os.system(
-            f"cp -a generators/linuxcnc_config/rio_hd/* {project['LINUXCNC_PATH']}/ConfigSamples/rio/rio_hd/"
-        )
-        os.system(
-            f"cat generators/linuxcnc_config/rio_hd/rio_hd.ui.pre > {project['LINUXCNC_PATH']}/ConfigSamples/rio/rio_hd/rio_hd.ui"
+        copy_tree(
+            project,
+            "generators/linuxcnc_config/rio_hd",
+            f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/rio_hd",
+            exclude=("rio_hd.ui",),
         )
-        open(
-            f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/rio_hd/rio_hd.ui", "a"
-        ).write("\n".join(cfgxml_data))
-        os.system(
-            f"cat generators/linuxcnc_config/rio_hd/rio_hd.ui.post >> {project['LINUXCNC_PATH']}/ConfigSamples/rio/rio_hd/rio_hd.ui"
+        ui_pre = open("generators/linuxcnc_config/rio_hd/rio_hd.ui.pre", "r").read()
+        ui_post = open("generators/linuxcnc_config/rio_hd/rio_hd.ui.post", "r").read()
+        write_file(
+            project,
+            f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/rio_hd/rio_hd.ui",
+            ui_pre + "\n".join(cfgxml_data) + ui_post,
         )
 
     else:
-        open(f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/rio-gui.xml", "w").write(
-            "\n".join(cfgxml_data)
+        write_file(
+            project,
+            f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/rio-gui.xml",
+            "\n".join(cfgxml_data),
         )
 
 
@@ -1910,8 +1922,10 @@ def generate_tool_tbl(project):
     tool_tbl.append("T2 P2 D0.062500 Z+0.100000 ;1/16 end mill")
     tool_tbl.append("T3 P3 D0.201000 Z+1.273000 ;#7 tap drill")
     tool_tbl.append("T99999 P99999 Z+0.100000 ;big tool number")
-    open(f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/tool.tbl", "w").write(
-        "\n".join(tool_tbl)
+    write_file(
+        project,
+        f"{project['LINUXCNC_PATH']}/ConfigSamples/rio/tool.tbl",
+        "\n".join(tool_tbl),
     )
 
 
@@ -1924,6 +1938,8 @@ def generate(project):
     generate_rio_gui(project)
     generate_tool_tbl(project)
 
-    os.system(
-        f"cp -a generators/linuxcnc_config/linuxcnc.var {project['LINUXCNC_PATH']}/ConfigSamples/rio"
+    copy_file(
+        project,
+        "generators/linuxcnc_config/linuxcnc.var",
+        f"{project['LINUXCNC_PATH']}/ConfigSamples/rio",
     )
@@ -1,6 +1,5 @@
-
 module interface_spislave
-    #(parameter BUFFER_SIZE=64, parameter MSGID=32'h74697277, parameter TIMEOUT=32'd4800000)
+    #(parameter BUFFER_SIZE=64, parameter MSGID=32'h74697277, parameter TIMEOUT=32'd4800000, parameter CRC=0)
      (
          input clk,
          input SPI_SCK,
@@ -9,7 +8,8 @@ module interface_spislave
          input [BUFFER_SIZE-1:0] tx_data,
          output [BUFFER_SIZE-1:0] rx_data,
          output SPI_MISO,
-         output pkg_timeout
+         output pkg_timeout,
+         output reg [7:0] crc_errors = 0
          //output [15:0] counter
      );
     reg [31:0] timeout_counter = 0;
@@ -28,6 +28,38 @@ module interface_spislave
     reg timeout = 1;
     assign pkg_timeout = timeout;
     assign rx_data = byte_data_received;
+
+    // optional crc trailer (CRC bits at the end of the frame), calculated while the bits are shifted
+    localparam CRC_WIDTH = (CRC == 32) ? 32 : 16;
+    wire [CRC_WIDTH-1:0] rx_crc;
+    wire [CRC_WIDTH-1:0] tx_crc;
+    wire [BUFFER_SIZE-1:0] tx_trailer;
+    generate
+        if (CRC != 0) begin
+            // over the whole rx frame, 0 with a valid trailer
+            frame_crc #(CRC_WIDTH, 1) rx_frame_crc (
+                .clk (clk),
+                .init (SSEL_startmessage),
+                .enable (SCK_risingedge),
+                .data (SPI_MOSI),
+                .crc (rx_crc)
+            );
+            // over the tx payload, sent instead of the last CRC bits of tx_data
+            frame_crc #(CRC_WIDTH, 1) tx_frame_crc (
+                .clk (clk),
+                .init (SSEL_startmessage),
+                .enable (SCK_risingedge && bitcnt < BUFFER_SIZE - CRC),
+                .data (SPI_MISO),
+                .crc (tx_crc)
+            );
+            assign tx_trailer = {tx_crc, {(BUFFER_SIZE-CRC_WIDTH){1'b0}}};
+        end else begin
+            assign rx_crc = 0;
+            assign tx_crc = 0;
+            assign tx_trailer = 0;
+        end
+    endgenerate
+
     always @(posedge clk) begin
         if(~SSEL_active) begin
             bitcnt <= 16'd0;
@@ -40,7 +72,12 @@ module interface_spislave
     end
     always @(posedge clk) begin
         if (SSEL_endmessage) begin
-            if (byte_data_receive[BUFFER_SIZE-1:BUFFER_SIZE-32] == MSGID) begin
+            if (rx_crc != 0) begin
+                // not for the select edge at power up (no bits)
+                if (bitcnt != 16'd0) begin
+                    crc_errors <= crc_errors + 8'd1;
+                end
+            end else if (byte_data_receive[BUFFER_SIZE-1:BUFFER_SIZE-32] == MSGID) begin
                 byte_data_received <= byte_data_receive;
                 timeout_counter <= 0;
             end
@@ -59,6 +96,8 @@ module interface_spislave
                 if(SCK_fallingedge) begin
                     if(bitcnt==16'd0)
                         byte_data_sent <= 0;  // after that, we send 0s
+                    else if(CRC != 0 && bitcnt == BUFFER_SIZE - CRC)
+                        byte_data_sent <= tx_trailer;  // payload sent, now the crc
                     else
                         byte_data_sent <= {byte_data_sent[BUFFER_SIZE-2:0], 1'b0};
                 end
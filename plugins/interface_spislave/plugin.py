@@ -62,9 +62,11 @@ class Plugin:
         func_out = []
         for num, interface in enumerate(self.jdata.get("interface", [])):
             if interface["type"] == "spi":
-                func_out.append(
-                    f"    interface_spislave #(BUFFER_SIZE, 32'h74697277, 32'd{int(self.jdata['clock']['speed']) // 4}) spi1 ("
-                )
+                crc = int(self.jdata.get("frame", {}).get("crc", 0))
+                params = f"BUFFER_SIZE, 32'h74697277, 32'd{int(self.jdata['clock']['speed']) // 4}"
+                if crc:
+                    params += f", {crc}"
+                func_out.append(f"    interface_spislave #({params}) spi1 (")
                 func_out.append("        .clk (sysclk),")
                 func_out.append("        .SPI_SCK (INTERFACE_SPI_SCK),")
                 func_out.append("        .SPI_SSEL (INTERFACE_SPI_SSEL),")
@@ -72,12 +74,18 @@ class Plugin:
                 func_out.append("        .SPI_MISO (INTERFACE_SPI_MISO),")
                 func_out.append("        .rx_data (rx_data),")
                 func_out.append("        .tx_data (tx_data),")
-                func_out.append("        .pkg_timeout (INTERFACE_TIMEOUT)")
+                if crc:
+                    func_out.append("        .pkg_timeout (INTERFACE_TIMEOUT),")
+                    func_out.append("        .crc_errors (INTERFACE_CRC_ERRORS)")
+                else:
+                    func_out.append("        .pkg_timeout (INTERFACE_TIMEOUT)")
                 func_out.append("    );")
         return func_out
 
     def ips(self):
         for num, interface in enumerate(self.jdata.get("interface", [])):
             if interface["type"] == "spi":
+                if self.jdata.get("frame", {}).get("crc"):
+                    return ["interface_spislave.v", "frame_crc.v"]
                 return ["interface_spislave.v"]
         return []
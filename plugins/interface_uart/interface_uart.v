@@ -1,12 +1,13 @@
 
 module interface_uart
-    #(parameter BUFFER_SIZE=80, parameter MSGID=32'h74697277, parameter TIMEOUT=32'd4800000, parameter ClkFrequency=12000000, parameter Baud=2000000)
+    #(parameter BUFFER_SIZE=80, parameter MSGID=32'h74697277, parameter TIMEOUT=32'd4800000, parameter ClkFrequency=12000000, parameter Baud=2000000, parameter CRC=0)
      (
          input clk,
          output reg [BUFFER_SIZE-1:0] rx_data,
          input [BUFFER_SIZE-1:0] tx_data,
          output UART_TX,
-         input UART_RX
+         input UART_RX,
+         output reg [7:0] crc_errors = 0
      );
 
     reg [BUFFER_SIZE-1:0] tx_data_buffer;
@@ -42,12 +43,58 @@ module interface_uart
     reg [7:0] rx_counter = 0;
     reg [7:0] tx_counter = 0;
 
+    // optional crc trailer (CRC bits at the end of the frame), calculated per byte
+    localparam CRC_WIDTH = (CRC == 32) ? 32 : 16;
+    localparam PAYLOAD_BYTES = (BUFFER_SIZE - CRC) / 8;
+    reg rx_check = 0;
+    wire rx_byte = (RxD_endofpacket == 0 && tx_state == 0 && RxD_data_ready == 1);
+    wire tx_byte = (tx_state == 1 && TxD_busy == 1 && TxD_start == 1 && tx_counter < PAYLOAD_BYTES);
+    wire [CRC_WIDTH-1:0] rx_crc;
+    wire [CRC_WIDTH-1:0] tx_crc;
+    wire [CRC_WIDTH-1:0] tx_crc_shifted = tx_crc << (8 * (tx_counter - PAYLOAD_BYTES));
+    generate
+        if (CRC != 0) begin
+            // over the whole rx frame, 0 with a valid trailer
+            frame_crc #(CRC_WIDTH, 8) rx_frame_crc (
+                .clk (clk),
+                .init (RxD_endofpacket || rx_check),
+                .enable (rx_byte),
+                .data (RxD_data),
+                .crc (rx_crc)
+            );
+            // over the tx payload, sent instead of the last CRC bits of tx_data
+            frame_crc #(CRC_WIDTH, 8) tx_frame_crc (
+                .clk (clk),
+                .init (tx_state == 0),
+                .enable (tx_byte),
+                .data (TxD_data),
+                .crc (tx_crc)
+            );
+        end else begin
+            assign rx_crc = 0;
+            assign tx_crc = 0;
+        end
+    endgenerate
+
     always @(posedge clk) begin
+        if (rx_check == 1) begin
+            // the crc includes the last byte one clock after the frame
+            rx_check <= 0;
+            if (rx_crc == 0) begin
+                rx_data <= rx_data_buffer;
+            end else begin
+                crc_errors <= crc_errors + 8'd1;
+            end
+        end
         if (RxD_endofpacket == 1) begin
             rx_counter <= 0;
         end else if (tx_state == 1) begin
             if (TxD_busy == 0) begin
-                TxD_data <= tx_data_buffer[BUFFER_SIZE-1:BUFFER_SIZE-1-7];
+                if (CRC != 0 && tx_counter >= PAYLOAD_BYTES) begin
+                    TxD_data <= tx_crc_shifted[CRC_WIDTH-1:CRC_WIDTH-8];
+                end else begin
+                    TxD_data <= tx_data_buffer[BUFFER_SIZE-1:BUFFER_SIZE-1-7];
+                end
                 TxD_start <= 1;
             end else if (TxD_start == 1) begin
                 TxD_start <= 0;
@@ -64,7 +111,12 @@ module interface_uart
                 rx_counter <= rx_counter + 1;
             end else begin
                 // TODO: check MSGID
-                rx_data <= {rx_data_buffer[BUFFER_SIZE-1-8:0], RxD_data};
+                if (CRC != 0) begin
+                    rx_data_buffer <= {rx_data_buffer[BUFFER_SIZE-1-8:0], RxD_data};
+                    rx_check <= 1;
+                end else begin
+                    rx_data <= {rx_data_buffer[BUFFER_SIZE-1-8:0], RxD_data};
+                end
                 rx_counter <= 0;
                 tx_counter <= 0;
                 tx_data_buffer <= tx_data;
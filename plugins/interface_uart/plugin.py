@@ -48,15 +48,21 @@ class Plugin:
         for num, interface in enumerate(self.jdata.get("interface", [])):
             if interface["type"] == "uart":
                 baud = interface.get("baud", 1000000)
+                crc = int(self.jdata.get("frame", {}).get("crc", 0))
+                params = f"BUFFER_SIZE, 32'h74697277, 32'd{int(self.jdata['clock']['speed']) // 4}, {self.jdata['clock']['speed']}, {baud}"
+                if crc:
+                    params += f", {crc}"
                 func_out.append("    assign INTERFACE_TIMEOUT = 0;")
-                func_out.append(
-                    f"    interface_uart #(BUFFER_SIZE, 32'h74697277, 32'd{int(self.jdata['clock']['speed']) // 4}, {self.jdata['clock']['speed']}, {baud}) uart1 ("
-                )
+                func_out.append(f"    interface_uart #({params}) uart1 (")
                 func_out.append("        .clk (sysclk),")
                 func_out.append("        .UART_RX (INTERFACE_UART_RX),")
                 func_out.append("        .UART_TX (INTERFACE_UART_TX),")
                 func_out.append("        .rx_data (rx_data),")
-                func_out.append("        .tx_data (tx_data)")
+                if crc:
+                    func_out.append("        .tx_data (tx_data),")
+                    func_out.append("        .crc_errors (INTERFACE_CRC_ERRORS)")
+                else:
+                    func_out.append("        .tx_data (tx_data)")
                 # func_out.append("        .pkg_timeout (INTERFACE_TIMEOUT)")
                 func_out.append("    );")
         return func_out
@@ -64,5 +70,7 @@ class Plugin:
     def ips(self):
         for num, interface in enumerate(self.jdata.get("interface", [])):
             if interface["type"] == "uart":
+                if self.jdata.get("frame", {}).get("crc"):
+                    return ["uart_baud.v", "uart_rx.v", "uart_tx.v", "interface_uart.v", "frame_crc.v"]
                 return ["uart_baud.v", "uart_rx.v", "uart_tx.v", "interface_uart.v"]
         return []
@@ -6,7 +6,8 @@ module interface_w5500
          parameter TIMEOUT=32'd4800000,
          parameter IP_ADDR={8'd192, 8'd168, 8'd10, 8'd193},
          parameter MAC_ADDR={8'hAA, 8'hAF, 8'hFA, 8'hCC, 8'hE3, 8'h1C},
-         parameter PORT=2390
+         parameter PORT=2390,
+         parameter CRC=0
      )
      (
          input clk,
@@ -16,12 +17,14 @@ module interface_w5500
          output W5500_SSEL,
          input [BUFFER_SIZE-1:0] tx_data,
          output [BUFFER_SIZE-1:0] rx_data,
-         output reg pkg_timeout = 0
+         output reg pkg_timeout = 0,
+         output reg [7:0] crc_errors = 0
      );
     reg [31:0] timeout_counter = 0;
 
 
     wire data_output_valid;
+    wire data_output_crc_error;
 
     reg [15:0] counter = 16'd0;
     reg flush_requested = 1'b0;
@@ -37,9 +40,14 @@ module interface_w5500
     always @(posedge clk) begin
 
         if (data_output_valid == 1) begin
+            // frames with a wrong crc are answered (with the error counter) but do not reset the timeout
             do_transmit <= 1;
-            timeout_counter <= 0;
-            pkg_timeout <= 0;
+            if (data_output_crc_error == 1) begin
+                crc_errors <= crc_errors + 8'd1;
+            end else begin
+                timeout_counter <= 0;
+                pkg_timeout <= 0;
+            end
         end else begin
 
             if (timeout_counter < TIMEOUT) begin
@@ -70,7 +78,7 @@ module interface_w5500
         end
     end
 
-    wiznet5500 #(.IP_ADDR(IP_ADDR), .MAC_ADDR(MAC_ADDR), .PORT(PORT), .BUFFER_SIZE_RX(BUFFER_SIZE), .BUFFER_SIZE_TX(BUFFER_SIZE), .MSGID(MSGID)) eth_iface (
+    wiznet5500 #(.IP_ADDR(IP_ADDR), .MAC_ADDR(MAC_ADDR), .PORT(PORT), .BUFFER_SIZE_RX(BUFFER_SIZE), .BUFFER_SIZE_TX(BUFFER_SIZE), .MSGID(MSGID), .CRC(CRC)) eth_iface (
                    .clk(clk),
                    .miso(W5500_MISO),
                    .mosi(W5500_MOSI),
@@ -89,6 +97,7 @@ module interface_w5500
                    .data_input_valid(data_out_valid),
                    .data_output(rx_data),
                    .data_output_valid(data_output_valid),
+                   .data_output_crc_error(data_output_crc_error),
                    .flush_requested(flush_requested)
                );
 endmodule
@@ -103,7 +112,8 @@ module wiznet5500
          parameter PORT = 2390,
          parameter BUFFER_SIZE_RX = 192,
          parameter BUFFER_SIZE_TX = 192,
-         parameter MSGID=32'h74697277
+         parameter MSGID=32'h74697277,
+         parameter CRC=0
      )
      (
          input clk,
@@ -124,6 +134,7 @@ module wiznet5500
          output reg data_read_valid = 1'b0,
    `endif
          output reg data_output_valid = 0,
+         output reg data_output_crc_error = 0,
          output is_available
      );
 
@@ -254,8 +265,38 @@ module wiznet5500
     reg [15:0] tx_buffer_write_pointer = 16'd0;
     reg [15:0] rx_buffer_read_pointer = 16'd0;
 
+    // optional crc trailer (CRC bits at the end of the frame), calculated while the bits are shifted
+    localparam CRC_WIDTH = (CRC == 32) ? 32 : 16;
+    wire [CRC_WIDTH-1:0] rx_crc;
+    wire [CRC_WIDTH-1:0] tx_crc;
+    wire [CRC_WIDTH-1:0] tx_crc_shifted = tx_crc << (spi_clock_count - (BUFFER_SIZE_TX + 24 - CRC));
+    generate
+        if (CRC != 0) begin
+            // over the whole rx payload (behind the udp header), 0 with a valid trailer
+            frame_crc #(CRC_WIDTH, 1) rx_frame_crc (
+                .clk (clk),
+                .init (state == STATE_RX_START),
+                .enable (spi_clk == 1'b0 && state == STATE_PULLING_DATA && spi_clock_count >= 24 + HEADER_SIZE),
+                .data (miso),
+                .crc (rx_crc)
+            );
+            // over the tx payload, sent instead of the last CRC bits of data_input
+            frame_crc #(CRC_WIDTH, 1) tx_frame_crc (
+                .clk (clk),
+                .init (state == STATE_IDLE),
+                .enable (spi_clk == 1'b1 && state == STATE_PUSHING_DATA && spi_clock_count >= 24 && spi_clock_count < BUFFER_SIZE_TX + 24 - CRC),
+                .data (tx_buffer[(BUFFER_SIZE_TX+24-1) - spi_clock_count]),
+                .crc (tx_crc)
+            );
+        end else begin
+            assign rx_crc = 0;
+            assign tx_crc = 0;
+        end
+    endgenerate
+
     always @(posedge clk) begin
         data_output_valid <= 0;
+        data_output_crc_error <= 0;
 
         if (state == STATE_IDLE && flush_requested) begin
             spi_clk <= 1'b0;
@@ -314,7 +355,11 @@ module wiznet5500
             if (rx_buffer[BUFFER_SIZE_RX-1:BUFFER_SIZE_RX-32] == MSGID) begin
                 dst_ip <= rx_buffer[BUFFER_SIZE_RX+HEADER_SIZE-HEADER_IP_OFFSET-1:BUFFER_SIZE_RX+HEADER_SIZE-HEADER_IP_OFFSET-32];
                 dst_port <= rx_buffer[BUFFER_SIZE_RX+HEADER_SIZE-HEADER_PORT_OFFSET-1:BUFFER_SIZE_RX+HEADER_SIZE-HEADER_PORT_OFFSET-16];
-                data_output <= rx_buffer[BUFFER_SIZE_RX-1:0];
+                if (rx_crc == 0) begin
+                    data_output <= rx_buffer[BUFFER_SIZE_RX-1:0];
+                end else begin
+                    data_output_crc_error <= 1;
+                end
                 data_output_valid <= 1;
             end
         end else if (state == STATE_RX_WRITE_PTR1) begin
@@ -570,6 +615,8 @@ module wiznet5500
     always @(posedge clk) begin
         if (spi_clk == 1'b1 && state == STATE_SENDING_COMMAND && spi_clock_count < 32) begin
             mosi <= current_instruction[8'd31 - spi_clock_count];
+        end else if (spi_clk == 1'b1 && state == STATE_PUSHING_DATA && CRC != 0 && spi_clock_count >= BUFFER_SIZE_TX+24-CRC && spi_clock_count < BUFFER_SIZE_TX+24) begin
+            mosi <= tx_crc_shifted[CRC_WIDTH-1];
         end else if (spi_clk == 1'b1 && state == STATE_PUSHING_DATA && spi_clock_count < BUFFER_SIZE_TX+24) begin
             mosi <= tx_buffer[(BUFFER_SIZE_TX+24-1) - spi_clock_count];
         end else if (spi_clk == 1'b1 && state == STATE_PULLING_DATA && spi_clock_count < 24) begin
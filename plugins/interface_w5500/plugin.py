@@ -62,6 +62,7 @@ class Plugin:
                 ip = interface.get("ip", "192.168.10.193").split(".")
                 ip_addr = f"{{8'd{ip[0]}, 8'd{ip[1]}, 8'd{ip[2]}, 8'd{ip[3]}}}"
                 port = interface.get("port", 2390)
+                crc = int(self.jdata.get("frame", {}).get("crc", 0))
 
                 func_out.append("    interface_w5500 #(")
                 func_out.append("        .BUFFER_SIZE(BUFFER_SIZE),")
@@ -69,7 +70,11 @@ class Plugin:
                 func_out.append(f"        .TIMEOUT(32'd{int(self.jdata['clock']['speed']) // 4}),")
                 func_out.append(f"        .MAC_ADDR({mac_addr}),")
                 func_out.append(f"        .IP_ADDR({ip_addr}),")
-                func_out.append(f"        .PORT({port})")
+                if crc:
+                    func_out.append(f"        .PORT({port}),")
+                    func_out.append(f"        .CRC({crc})")
+                else:
+                    func_out.append(f"        .PORT({port})")
                 func_out.append("    ) w55001(")
                 func_out.append("        .clk (sysclk),")
                 func_out.append("        .W5500_SCK (INTERFACE_W5500_SCK),")
@@ -78,12 +83,18 @@ class Plugin:
                 func_out.append("        .W5500_MISO (INTERFACE_W5500_MISO),")
                 func_out.append("        .rx_data (rx_data),")
                 func_out.append("        .tx_data (tx_data),")
-                func_out.append("        .pkg_timeout (INTERFACE_TIMEOUT)")
+                if crc:
+                    func_out.append("        .pkg_timeout (INTERFACE_TIMEOUT),")
+                    func_out.append("        .crc_errors (INTERFACE_CRC_ERRORS)")
+                else:
+                    func_out.append("        .pkg_timeout (INTERFACE_TIMEOUT)")
                 func_out.append("    );")
         return func_out
 
     def ips(self):
         for num, interface in enumerate(self.jdata.get("interface", [])):
             if interface["type"] == "w5500":
+                if self.jdata.get("frame", {}).get("crc"):
+                    return ["interface_w5500.v", "frame_crc.v"]
                 return ["interface_w5500.v"]
         return []
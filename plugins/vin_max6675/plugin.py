@@ -55,6 +55,9 @@ class Plugin:
     value = value * 0.25;
         """
 
+    def calculation_vin_linear(self, setup):
+        return (0.25, 0.0)
+
     def pinlist(self):
         pinlist_out = []
         for num, data in enumerate(self.jdata["plugins"]):
@@ -53,6 +53,9 @@ class Plugin:
     }
         """
 
+    def calculation_vin_linear(self, setup):
+        return (1000.0 / int(self.jdata["clock"]["speed"]) / 20.0 * 343.2, 0.0)
+
     def pinlist(self):
         pinlist_out = []
         for num, data in enumerate(self.jdata["plugins"]):
@@ -1,3 +1,6 @@
+from transferTable import ntc_celsius
+
+
 class Plugin:
     ptype = "vin_tlc549c"
 
@@ -49,18 +52,17 @@ class Plugin:
         return (value, unit)
 
     def calculation_vin_c(self, setup):
-        if setup.get("sensor") == "NTC":
-            return """
-    value = value * 3.3 / 255.0;
-    float Rt = 10.0 * value / (3.3 - value);
-    float tempK = 1.0 / (log(Rt / 10.0) / 3950.0 + 1.0 / (273.15 + 25.0));
-    float tempC = tempK - 273.15;
-    value = tempC;
-            """
-        else:
-            return """
+        return """
     value /= 1000.0;
-            """
+        """
+
+    def calculation_vin_linear(self, setup):
+        return (0.001, 0.0)
+
+    def calculation_vin_table(self, setup):
+        if setup.get("sensor") == "NTC":
+            return (lambda value: ntc_celsius(value * 3.3 / 255.0), 4, 251, "°C")
+        return None
 
     def pinlist(self):
         pinlist_out = []
@@ -86,6 +86,18 @@ class Plugin:
     value = (value - {vmin}) * (PRU_OSC / {freq}) / ({vmax} - {vmin});
             """
 
+    def calculation_vout_linear(self, setup):
+        # same integer divider as PRU_OSC / freq in calculation_vout_c
+        divider = int(self.jdata["clock"]["speed"]) // int(setup.get("frequency", 100000))
+        vmax = int(setup.get("max", 100))
+        vmin = int(setup.get("min", 0))
+        if "dir" in setup:
+            vmin = 0
+        if vmax == vmin:
+            return None
+        scale = divider / (vmax - vmin)
+        return (scale, -vmin * scale)
+
     def pinlist(self):
         pinlist_out = []
         for num, data in enumerate(self.jdata["plugins"]):
@@ -53,6 +53,10 @@ class Plugin:
     value = ((value + 300)) * (PRU_OSC / 200000);
         """
 
+    def calculation_vout_linear(self, setup):
+        divider = int(self.jdata["clock"]["speed"]) // 200000
+        return (float(divider), 300.0 * divider)
+
     def pinlist(self):
         pinlist_out = []
         for num, data in enumerate(self.jdata["plugins"]):
@@ -0,0 +1,152 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_roots = []
+_start = time.perf_counter()
+
+
+def enable():
+    global _enabled, _start
+    _enabled = True
+    _start = time.perf_counter()
+    _roots.clear()
+
+
+def enabled():
+    return _enabled
+
+
+def current():
+    """the open span of this thread, to be passed as parent to spans running in other threads"""
+    stack = getattr(_local, "stack", None)
+    if stack:
+        return stack[-1]
+    return None
+
+
+@contextlib.contextmanager
+def span(name, cat="stage", parent=None, **args):
+    """records the wall time of the enclosed block as a child of the currently open span of this thread"""
+    if not _enabled:
+        yield
+        return
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    if stack:
+        parent = stack[-1]
+    node = {
+        "name": name,
+        "cat": cat,
+        "thread": threading.current_thread().name,
+        "start": time.perf_counter() - _start,
+        "duration": 0.0,
+        "children": [],
+    }
+    if args:
+        node["args"] = args
+    with _lock:
+        if parent:
+            parent["children"].append(node)
+        else:
+            _roots.append(node)
+    stack.append(node)
+    try:
+        yield
+    finally:
+        node["duration"] = time.perf_counter() - _start - node["start"]
+        stack.pop()
+
+
+def system(command, name=None):
+    """os.system() with the call recorded as a 'tool' span"""
+    if not name:
+        words = command.split()
+        if words[0].startswith("python") and len(words) > 1:
+            words.pop(0)
+        name = os.path.basename(words[0])
+    with span(name, cat="tool", command=command):
+        return os.system(command)
+
+
+class PluginProxy:
+    """wraps a plugin instance, every method call is recorded as a 'plugin' span"""
+
+    def __init__(self, plugin, name):
+        self._plugin = plugin
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self._plugin, attr)
+        if not callable(value):
+            return value
+
+        @functools.wraps(value)
+        def hook(*args, **kwargs):
+            with span(f"{self._name}.{attr}", cat="plugin"):
+                return value(*args, **kwargs)
+
+        return hook
+
+
+def wrap_plugin(plugin, name):
+    if not _enabled:
+        return plugin
+    return PluginProxy(plugin, name)
+
+
+def trace():
+    """hierarchical timings, times in seconds"""
+    return {"total": time.perf_counter() - _start, "spans": list(_roots)}
+
+
+def chrome_trace():
+    """the timings in the chrome trace-event format (chrome://tracing, perfetto)"""
+    events = []
+    threads = {}
+
+    def add(node):
+        tid = threads.setdefault(node["thread"], len(threads) + 1)
+        event = {
+            "name": node["name"],
+            "cat": node["cat"],
+            "ph": "X",
+            "ts": round(node["start"] * 1000000, 3),
+            "dur": round(node["duration"] * 1000000, 3),
+            "pid": os.getpid(),
+            "tid": tid,
+        }
+        if "args" in node:
+            event["args"] = node["args"]
+        events.append(event)
+        for child in node["children"]:
+            add(child)
+
+    for node in _roots:
+        add(node)
+    for name, tid in threads.items():
+        events.append(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": {"name": name},
+            }
+        )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def save(filename, fmt="json"):
+    if fmt == "chrome":
+        data = chrome_trace()
+    else:
+        data = trace()
+    open(filename, "w").write(json.dumps(data, indent=2))
@@ -1,12 +1,199 @@
 import copy
 import glob
+import hashlib
 import importlib
 import json
 import os
+import pickle
+import re
 import sys
 
+import profiler
+from frameLayout import STRUCT_CODES, FrameLayout
+
+PLUGIN_SECTIONS = ("interface", "expansion", "joints", "plugins")
+
+CACHE_PATH = "Output/.cache"
+CACHE_VERSION = 1
+
+_plugin_types = None
+
+# parsed board and module files, reused when loading more than one config per process
+_json_files = {}
+
+
+def load_json(path):
+    """returns a private copy of the parsed json file"""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _json_files.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, json.loads(open(path, "r").read()))
+        _json_files[path] = cached
+    return copy.deepcopy(cached[1])
+
+
+def plugin_types():
+    """maps every config "type" to the plugins that handle it (without importing them)"""
+    global _plugin_types
+    if _plugin_types is None:
+        _plugin_types = {}
+        for path in sorted(glob.glob("plugins/*/plugin.py")):
+            plugin = path.split("/")[1]
+            source = open(path, "r").read()
+            ptypes = {plugin}
+            ptypes.update(re.findall(r'\bptype\w*\s*=\s*"([^"]+)"', source))
+            for match in re.findall(
+                r'(?:\["type"\]|\.get\("type"\))\s*(?:==|in)\s*(\[[^\]]*\]|"[^"]*")',
+                source,
+            ):
+                ptypes.update(re.findall(r'"([^"]+)"', match))
+            for ptype in ptypes:
+                _plugin_types.setdefault(ptype, []).append(plugin)
+    return _plugin_types
+
+
+def plugins_used(jdata):
+    """returns the sorted list of plugins referenced by the config"""
+    registry = plugin_types()
+    used = set()
+    for ftype in PLUGIN_SECTIONS:
+        for entry in jdata.get(ftype, []):
+            ptype = entry.get("type")
+            if ptype in registry:
+                used.update(registry[ptype])
+            elif ptype:
+                print(f"WARNING: no plugin found for type: {ptype}")
+    return sorted(used)
+
+
+def cache_key(configfile, data, jdata):
+    """hash over all inputs of the resolved project: config, board, modules, plugins, this loader and the frame layout"""
+    key = hashlib.sha256()
+    key.update(f"{CACHE_VERSION}:{configfile}\n".encode())
+    key.update(data.encode())
+    paths = [__file__, "frameLayout.py"]
+    board = jdata.get("boardcfg")
+    if board:
+        paths.append(f"boards/{board}.json")
+    paths += sorted(glob.glob("modules/*.json"))
+    paths += sorted(glob.glob("plugins/*/plugin.py"))
+    for path in paths:
+        key.update(f"\n{path}\n".encode())
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                key.update(f.read())
+    return key.hexdigest()
+
+
+def load_plugins(project):
+    # loading plugins (only the ones referenced by the config)
+    project["plugins"] = {}
+    for plugin in plugins_used(project["jdata"]):
+        with profiler.span(f"import {plugin}", cat="import"):
+            vplugin = importlib.import_module(".plugin", f"plugins.{plugin}")
+        project["plugins"][plugin] = profiler.wrap_plugin(
+            vplugin.Plugin(project["jdata"]), plugin
+        )
+
+
+def load_generators(project):
+    project["generators"] = {}
+    for path in glob.glob("generators/*"):
+        generator = path.split("/")[1]
+        if os.path.isfile(f"generators/{generator}/{generator}.py"):
+            project["generators"][generator] = importlib.import_module(
+                f".{generator}", f"generators.{generator}"
+            )
+
+
+def cache_read(key):
+    cachefile = f"{CACHE_PATH}/{key}.pickle"
+    if not os.path.isfile(cachefile):
+        return None
+    try:
+        with open(cachefile, "rb") as f:
+            project = pickle.load(f)
+    except Exception as err:
+        print(f"WARNING: ignoring broken cache file {cachefile}: {err}")
+        return None
+    load_plugins(project)
+    load_generators(project)
+    return project
+
 
-def load(configfile):
+def cache_write(key, project):
+    cachefile = f"{CACHE_PATH}/{key}.pickle"
+    cdata = {
+        name: value
+        for name, value in project.items()
+        if name not in {"plugins", "generators"}
+    }
+    try:
+        os.makedirs(CACHE_PATH, exist_ok=True)
+        with open(f"{cachefile}.tmp", "wb") as f:
+            pickle.dump(cdata, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{cachefile}.tmp", cachefile)
+    except OSError as err:
+        print(f"WARNING: can not write cache file {cachefile}: {err}")
+
+
+def pin_index(project):
+    """applies the pinmapping and builds project["pins"] (pin id -> owner, name, direction and pullup)
+
+    all conflicts are reported, returns False if there are any
+    """
+    pinmapping = project["jdata"].get("pinmapping", {})
+    expansion_ports = set()
+    for expansions in project["expansions"].values():
+        expansion_ports.update(expansions)
+
+    project["pins"] = {}
+    project["expansion_pins"] = []
+    errors = []
+    for pname, pins in project["pinlists"].items():
+        pinlist = []
+        for pinsetup in pins or []:
+            pinsetup = list(pinsetup)
+            pin_id = pinmapping.get(pinsetup[1], pinsetup[1])
+            pinsetup[1] = pin_id
+            pinlist.append(pinsetup)
+            pin = {
+                "owner": pname,
+                "name": pinsetup[0],
+                "direction": pinsetup[2],
+                "pullup": pinsetup[3] if len(pinsetup) > 3 else False,
+                "setup": pinsetup,
+            }
+            if pin_id in project["pins"]:
+                errors.append(
+                    f"ERROR: pin {pin_id} allready in use\n  old: {project['pins'][pin_id]['setup']}\n  new: {pinsetup}"
+                )
+                continue
+            project["pins"][pin_id] = pin
+
+            if pin_id.startswith("EXPANSION"):
+                project["expansion_pins"].append(pin_id)
+                port = pin_id.split("[")[0]
+                if port not in expansion_ports:
+                    errors.append(f"ERROR: unknown expansion port: {pinsetup}")
+                elif pinsetup[2] == "OUTPUT" and "_OUTPUT" not in port:
+                    errors.append(f"ERROR: pin-direction do not match: {pinsetup}")
+                elif pinsetup[2] != "OUTPUT" and "_INPUT" not in port:
+                    errors.append(f"ERROR: pin-direction do not match: {pinsetup}")
+        project["pinlists"][pname] = pinlist
+
+    for error in errors:
+        print()
+        print(error)
+    return not errors
+
+
+def load(configfile, cache=True):
+    with profiler.span("projectLoader.load", config=configfile):
+        return _load(configfile, cache)
+
+
+def _load(configfile, cache):
     project = {}
     project["config"] = configfile
     if not os.path.isfile(project["config"]):
@@ -37,36 +224,47 @@ def load(configfile):
         print("ERROR: old json config format, please run 'python3 convert-configs.py'")
         sys.exit(1)
 
+    key = None
+    if cache:
+        with profiler.span("cache_key"):
+            key = cache_key(configfile, data, project["jdata"])
+        with profiler.span("cache_read"):
+            cached = cache_read(key)
+        if cached:
+            return cached
+
+    with profiler.span("resolve"):
+        resolve(project)
+
+    if key:
+        with profiler.span("cache_write"):
+            cache_write(key, project)
+
+    return project
+
+
+def resolve(project):
     # loading board data
     board = project["jdata"].get("boardcfg")
     if board:
         print(f"loading board setup: {board}")
-        bdata = open(f"boards/{board}.json", "r").read()
-        project["board_data"] = json.loads(bdata)
-        if "name" in project["board_data"]:
-            project["board"] = project["board_data"]["name"]
-        for key, value in project["board_data"].items():
-            if key not in project["jdata"]:
-                project["jdata"][key] = value
-
-        print(f"loading board setup: {board}")
-        bdata = open(f"boards/{board}.json", "r").read()
-        project["board"] = json.loads(bdata)
+        project["board_data"] = load_json(f"boards/{board}.json")
+        project["board"] = copy.deepcopy(project["board_data"])
         if "name" in project["board"]:
-            project["board"]["boardname"] = project["board"]["name"]
-            del project["board"]["name"]
-        for key, value in project["board"].items():
+            project["board"]["boardname"] = project["board"].pop("name")
+        for key, value in project["board_data"].items():
             if key not in project["jdata"]:
                 project["jdata"][key] = value
+        if "boardname" in project["board"] and "boardname" not in project["jdata"]:
+            project["jdata"]["boardname"] = project["board"]["boardname"]
 
     # loading modules
     project["modules"] = {}
     for path in glob.glob("modules/*.json"):
         module = path.split("/")[1].split(".")[0]
-        mdata = open(path, "r").read()
-        project["modules"][module] = json.loads(mdata)
+        project["modules"][module] = load_json(path)
 
-    for ftype in ("interface", "expansion", "joints", "plugins"):
+    for ftype in PLUGIN_SECTIONS:
         if ftype not in project["jdata"]:
             project["jdata"][ftype] = []
 
@@ -102,7 +300,7 @@ def load(configfile):
                     project["jdata"]["enable"]["pin"] = slot["pins"][
                         module_data["enable"]["pin"]
                     ]
-                for ftype in ("interface", "expansion", "joints", "plugins"):
+                for ftype in PLUGIN_SECTIONS:
                     if ftype in module_data:
                         for jn, msetup in enumerate(module_data.get(ftype, [])):
                             # overwrite with setup data
@@ -124,21 +322,8 @@ def load(configfile):
                 print(f"ERROR: module {module} not found")
                 exit(1)
 
-    # loading plugins
-    project["plugins"] = {}
-    for path in sorted(glob.glob("plugins/*")):
-        plugin = path.split("/")[1]
-        if os.path.isfile(f"plugins/{plugin}/plugin.py"):
-            vplugin = importlib.import_module(".plugin", f"plugins.{plugin}")
-            project["plugins"][plugin] = vplugin.Plugin(project["jdata"])
-
-    project["generators"] = {}
-    for path in glob.glob("generators/*"):
-        generator = path.split("/")[1]
-        if os.path.isfile(f"generators/{generator}/{generator}.py"):
-            project["generators"][generator] = importlib.import_module(
-                f".{generator}", f"generators.{generator}"
-            )
+    load_plugins(project)
+    load_generators(project)
 
     project["verilog_files"] = []
     project["component_files"] = []
@@ -188,32 +373,8 @@ def load(configfile):
                 project["plugins"][plugin].gateware_extrafiles()
             )
 
-    # pinmapping
-    pinmapping = project["jdata"].get("pinmapping", {})
-    for pname, pins in project["pinlists"].items():
-        project["pinlists"][pname] = list(project["pinlists"][pname])
-        if pins:
-            pins = list(pins)
-            for pn, pin in enumerate(pins):
-                project["pinlists"][pname][pn] = list(project["pinlists"][pname][pn])
-                if project["pinlists"][pname][pn][1] in pinmapping:
-                    project["pinlists"][pname][pn][1] = pinmapping[project["pinlists"][pname][pn][1]]
-
-    # check for double assigned pins
-    double_pins = False
-    uniq_pins = {}
-    for pinlist in project["pinlists"].values():
-        for pinsetup in pinlist:
-            pin_id = pinsetup[1]
-            if pin_id in uniq_pins:
-                print()
-                print(f"ERROR: pin {pin_id} allready in use")
-                print(f"  old: {uniq_pins[pin_id]}")
-                print(f"  new: {pinsetup}")
-                double_pins = True
-            else:
-                uniq_pins[pin_id] = pinsetup
-    if double_pins:
+    # pinmapping and pin index
+    if not pin_index(project):
         print("")
         exit(1)
 
@@ -233,33 +394,67 @@ def load(configfile):
         project[f"{dtype}s"] = len(project[tname])
         project[f"{dtype}s_total"] = max((len(project[tname]) + 7) // 8 * 8, 8)
 
+    # width of the joint commands and vouts in the rx frame ("bits" option, default 32)
+    for dtype in ("vout", "joint"):
+        for part in project[f"{dtype}names"]:
+            bits = int(part.get("bits", part.get("_bits", 32)))
+            if bits not in STRUCT_CODES:
+                print(f"ERROR: {dtype} {part.get('_name')}: unsupported bits: {bits} (8, 16 or 32)")
+                exit(1)
+            part["_bits"] = bits
+
+    # 8/16 bit vouts are limited to their width by rio.c, the full scale of a linear conversion should fit
+    for vout in project["voutnames"]:
+        plugin = project["plugins"][vout["_plugin"]]
+        if vout["_bits"] == 32 or not hasattr(plugin, "calculation_vout_linear") or not hasattr(plugin, "vminmax"):
+            continue
+        linear = plugin.calculation_vout_linear(vout)
+        if linear is None:
+            continue
+        scale, offset = linear
+        full = max(abs(value * scale + offset) for value in plugin.vminmax(vout))
+        limit = (1 << (vout["_bits"] - 1)) - 1
+        if full > limit:
+            print(
+                f"WARNING: vout {vout.get('_name')}: full scale {full:.0f} does not fit {vout['_bits']} bits "
+                f"(max {limit}), the values are limited"
+            )
+
     project["jointtypes"] = []
     for joint in project["jointnames"]:
         project["jointtypes"].append(joint["type"])
 
     project["joints_en_total"] = (project["joints"] + 7) // 8 * 8
 
-    project["tx_data_size"] = 32
-    project["tx_data_size"] += project["joints"] * 32
-
-    for vin in project["vinnames"]:
-        bits = vin.get("_bits", 32)
-        project["tx_data_size"] += bits
-
-    project["tx_data_size"] += project["dins_total"]
-    if "binnames" in project:
-        for binpart in project["binnames"]:
-            project["tx_data_size"] += binpart["size"]
-
-    project["rx_data_size"] = 32
-    project["rx_data_size"] += project["joints"] * 32
-    project["rx_data_size"] += project["vouts"] * 32
-    project["rx_data_size"] += project["joints_en_total"]
-    project["rx_data_size"] += project["douts_total"]
-    if "boutnames" in project:
-        for binpart in project["boutnames"]:
-            project["rx_data_size"] += binpart["size"]
-
-    project["data_size"] = max(project["tx_data_size"], project["rx_data_size"])
+    # rotating sub-frame for the slow vins/vouts
+    frame = project["jdata"].get("frame", {})
+    project["frame_slots"] = 0
+    if frame.get("mode", "full") == "rotating":
+        project["frame_slots"] = int(frame.get("slots", 4))
+        if not 1 <= project["frame_slots"] <= 127:
+            print(f"ERROR: frame: unsupported slots: {project['frame_slots']} (1-127)")
+            exit(1)
+    elif frame.get("mode", "full") != "full":
+        print(f"ERROR: frame: unknown mode: {frame['mode']} (full, rotating)")
+        exit(1)
+    # crc trailer, checked on the fly by the interface
+    project["frame_crc"] = int(frame.get("crc", 0))
+    if project["frame_crc"] not in (0, 16, 32):
+        print(f"ERROR: frame: unsupported crc: {project['frame_crc']} (16, 32)")
+        exit(1)
+    if project["frame_crc"]:
+        for interface in project["jdata"].get("interface", []):
+            if interface["type"] not in ("spi", "uart", "w5500"):
+                print(f"ERROR: frame: no crc support in the {interface['type']} interface")
+                exit(1)
+    # sequence number echoed by the gateware, pipelined: rio.c uses the answer of the last frame
+    project["frame_pipelined"] = bool(frame.get("pipelined", False))
+    project["frame_sequence"] = bool(frame.get("sequence", False)) or project["frame_pipelined"]
+    if project["frame_sequence"] and project["jdata"].get("transport", "SPI") != "UDP":
+        print("ERROR: frame: sequence and pipelined need the UDP transport")
+        exit(1)
 
-    return project
+    project["frame_layout"] = FrameLayout(project)
+    project["tx_data_size"] = project["frame_layout"].size["tx"]
+    project["rx_data_size"] = project["frame_layout"].size["rx"]
+    project["data_size"] = project["frame_layout"].data_size
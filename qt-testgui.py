@@ -1,8 +1,8 @@
 import argparse
 import sys
+import threading
 import time
 from functools import partial
-from struct import *
 import traceback
 
 from PyQt5 import QtGui
@@ -19,6 +19,10 @@ from PyQt5.QtWidgets import (
 )
 
 import projectLoader
+from frameLayout import PRU_DATA, PRU_WRITE, FrameCodec
+from generators.linuxcnc_component.linuxcnc_component import freq_cmd, joint_cmd_max, joint_cmd_num
+from transferTable import vin_table
+from transport import open_transport
 
 parser = argparse.ArgumentParser()
 parser.add_argument("json", help="json config", type=str, default=None)
@@ -26,6 +30,7 @@ parser.add_argument("--graph", "-g", help="graph", type=bool, default=False)
 parser.add_argument("--baud", "-b", help="baudrate", type=int, default=1000000)
 parser.add_argument("--port", "-p", help="udp port", type=int, default=2390)
 parser.add_argument("--debug", "-d", help="debug", type=bool, default=False)
+parser.add_argument("--interval", "-i", help="bus interval (ms)", type=float, default=1)
 parser.add_argument(
     "device",
     help="device like: /dev/ttyUSB0 | 192.168.10.13",
@@ -36,200 +41,18 @@ parser.add_argument(
 args = parser.parse_args()
 
 
-class CH341():
-
-    DEFAULT_TIMEOUT         = 1000     # 1000mS for USB timeouts
-    BULK_WRITE_ENDPOINT     = 0x02
-    BULK_READ_ENDPOINT      = 0x82
-
-    PACKET_LENGTH     = 0x20
-    MAX_PACKETS       = 256
-    MAX_PACKET_LEN    = (PACKET_LENGTH * MAX_PACKETS)
-    USB_VENDOR       = 0x1A86
-    USB_PRODUCT      = 0x5512
-
-    CMD_SET_OUTPUT   = 0xA1
-    CMD_IO_ADDR      = 0xA2
-    CMD_PRINT_OUT    = 0xA3
-    CMD_SPI_STREAM   = 0xA8
-    CMD_SIO_STREAM   = 0xA9
-    CMD_I2C_STREAM   = 0xAA
-    CMD_UIO_STREAM   = 0xAB
-
-    CMD_I2C_STM_STA  = 0x74
-    CMD_I2C_STM_STO  = 0x75
-    CMD_I2C_STM_OUT  = 0x80
-    CMD_I2C_STM_IN   = 0xC0
-    CMD_I2C_STM_MAX  = min(0x3F, PACKET_LENGTH)
-    CMD_I2C_STM_SET  = 0x60
-    CMD_I2C_STM_US   = 0x40
-    CMD_I2C_STM_MS   = 0x50
-    CMD_I2C_STM_DLY  = 0x0F
-    CMD_I2C_STM_END  = 0x00
-
-    CMD_UIO_STM_IN   = 0x00
-    CMD_UIO_STM_DIR  = 0x40
-    CMD_UIO_STM_OUT  = 0x80
-    CMD_UIO_STM_US   = 0xC0
-    CMD_UIO_STM_END  = 0x20
-
-    STM_I2C_20K      = 0x00
-    STM_I2C_100K     = 0x01
-    STM_I2C_400K     = 0x02
-    STM_I2C_750K     = 0x03
-    STM_SPI_DBL      = 0x04
-
-    reverse_table = [
-        0x00, 0x80, 0x40, 0xc0, 0x20, 0xa0, 0x60, 0xe0,
-        0x10, 0x90, 0x50, 0xd0, 0x30, 0xb0, 0x70, 0xf0,
-        0x08, 0x88, 0x48, 0xc8, 0x28, 0xa8, 0x68, 0xe8,
-        0x18, 0x98, 0x58, 0xd8, 0x38, 0xb8, 0x78, 0xf8,
-        0x04, 0x84, 0x44, 0xc4, 0x24, 0xa4, 0x64, 0xe4,
-        0x14, 0x94, 0x54, 0xd4, 0x34, 0xb4, 0x74, 0xf4,
-        0x0c, 0x8c, 0x4c, 0xcc, 0x2c, 0xac, 0x6c, 0xec,
-        0x1c, 0x9c, 0x5c, 0xdc, 0x3c, 0xbc, 0x7c, 0xfc,
-        0x02, 0x82, 0x42, 0xc2, 0x22, 0xa2, 0x62, 0xe2,
-        0x12, 0x92, 0x52, 0xd2, 0x32, 0xb2, 0x72, 0xf2,
-        0x0a, 0x8a, 0x4a, 0xca, 0x2a, 0xaa, 0x6a, 0xea,
-        0x1a, 0x9a, 0x5a, 0xda, 0x3a, 0xba, 0x7a, 0xfa,
-        0x06, 0x86, 0x46, 0xc6, 0x26, 0xa6, 0x66, 0xe6,
-        0x16, 0x96, 0x56, 0xd6, 0x36, 0xb6, 0x76, 0xf6,
-        0x0e, 0x8e, 0x4e, 0xce, 0x2e, 0xae, 0x6e, 0xee,
-        0x1e, 0x9e, 0x5e, 0xde, 0x3e, 0xbe, 0x7e, 0xfe,
-        0x01, 0x81, 0x41, 0xc1, 0x21, 0xa1, 0x61, 0xe1,
-        0x11, 0x91, 0x51, 0xd1, 0x31, 0xb1, 0x71, 0xf1,
-        0x09, 0x89, 0x49, 0xc9, 0x29, 0xa9, 0x69, 0xe9,
-        0x19, 0x99, 0x59, 0xd9, 0x39, 0xb9, 0x79, 0xf9,
-        0x05, 0x85, 0x45, 0xc5, 0x25, 0xa5, 0x65, 0xe5,
-        0x15, 0x95, 0x55, 0xd5, 0x35, 0xb5, 0x75, 0xf5,
-        0x0d, 0x8d, 0x4d, 0xcd, 0x2d, 0xad, 0x6d, 0xed,
-        0x1d, 0x9d, 0x5d, 0xdd, 0x3d, 0xbd, 0x7d, 0xfd,
-        0x03, 0x83, 0x43, 0xc3, 0x23, 0xa3, 0x63, 0xe3,
-        0x13, 0x93, 0x53, 0xd3, 0x33, 0xb3, 0x73, 0xf3,
-        0x0b, 0x8b, 0x4b, 0xcb, 0x2b, 0xab, 0x6b, 0xeb,
-        0x1b, 0x9b, 0x5b, 0xdb, 0x3b, 0xbb, 0x7b, 0xfb,
-        0x07, 0x87, 0x47, 0xc7, 0x27, 0xa7, 0x67, 0xe7,
-        0x17, 0x97, 0x57, 0xd7, 0x37, 0xb7, 0x77, 0xf7,
-        0x0f, 0x8f, 0x4f, 0xcf, 0x2f, 0xaf, 0x6f, 0xef,
-        0x1f, 0x9f, 0x5f, 0xdf, 0x3f, 0xbf, 0x7f, 0xff
-    ]
-
-    def __init__(self, vid=USB_VENDOR, pid=USB_PRODUCT):
-        dev = usb.core.find(idVendor=vid, idProduct=pid)
-
-        if dev is None:
-            raise ConnectionError("Device not found (%x:%x)" % (vid, pid))
-        print(f'Found CH341 device ({vid:x}:{pid:x})')
-        if (dev.bNumConfigurations != 1):
-            raise ConnectionError("Device configuration error")
-        dev.set_configuration()
-        self.dev = dev
-
-
-        #cmd = [self.CMD_I2C_STREAM, self.CMD_UIO_STM_US | 100, self.CMD_UIO_STM_END]
-        #cnt = self.dev.write(self.BULK_WRITE_ENDPOINT, cmd)
-        #if (cnt != len(cmd)):
-        #    raise ConnectionError("Failed to issue Command")
-
-        cmd = [self.CMD_UIO_STREAM, self.CMD_UIO_STM_DIR | 0x3F, self.CMD_UIO_STM_END]
-        cnt = self.dev.write(self.BULK_WRITE_ENDPOINT, cmd)
-        if (cnt != len(cmd)):
-            raise ConnectionError("Failed to issue dir command")
-
-
-    def spi_trans(self, data):
-        cmd = [self.CMD_UIO_STREAM, self.CMD_UIO_STM_OUT | 0x36, self.CMD_UIO_STM_END]
-        cnt = self.dev.write(self.BULK_WRITE_ENDPOINT, cmd)
-        if (cnt != len(cmd)):
-            raise ConnectionError("Failed to issue select cs")
-
-        cmd = [self.CMD_SPI_STREAM]
-        for c in data:
-            cmd.append(self.reverse_table[c])
-
-        cnt = self.dev.write(self.BULK_WRITE_ENDPOINT, cmd)
-        #if (cnt != len(cmd)):
-        #    raise ConnectionError("Failed to write data")
-
-        data = self.dev.read(self.BULK_READ_ENDPOINT, cnt-1)
-
-        cmd = [self.CMD_UIO_STREAM, self.CMD_UIO_STM_OUT | 0x37, self.CMD_UIO_STM_END]
-        cnt = self.dev.write(self.BULK_WRITE_ENDPOINT, cmd)
-        if (cnt != len(cmd)):
-            raise ConnectionError("Failed to issue unselect cs")
-
-        ret = []
-        for c in data:
-            ret.append(self.reverse_table[c])
-
-        return list(ret)
+project = projectLoader.load(args.json)
 
+transport = open_transport(project, args.device, args.baud, args.port)
 
+# bus rate (ms) and display rate (ms)
+INTERVAL = args.interval
+DISPLAY_INTERVAL = 100
 
-project = projectLoader.load(args.json)
 
-SHM_FILE = ""
-SERIAL = ""
-NET_IP = ""
-SPI_CH341 = None
-SPI_FTDI = None
-if args.device and args.device.startswith("/dev/tty"):
-    import serial
-    SERIAL = args.device
-    BAUD = args.baud
-    ser = serial.Serial(SERIAL, BAUD, timeout=0.01)
-
-elif args.device and args.device.startswith("/dev/shm/"):
-    SHM_FILE = args.device
-    fd = open(f"{SHM_FILE}.rx", "wb")
-    fd.write(b'0'*10)
-    fd.close()
-
-elif args.device and args.device.startswith("CH341"):
-    import usb.core
-    import usb.util
-    SPI_CH341 = CH341()
-
-elif args.device and args.device.startswith("FTDI"):
-    from pyftdi.spi import SpiController
-    spi = SpiController(cs_count=2)
-    spi.configure('ftdi://ftdi:2232h/2')
-    SPI_FTDI = spi.get_port(cs=0, freq=1E6, mode=0)
-
-elif args.device and args.device != "":
-    NET_IP = args.device
-    NET_PORT = args.port
-    print("IP:", NET_IP)
-    import socket
-
-    UDPClientSocket = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
-    UDPClientSocket.bind(('0.0.0.0', args.port))
-    # clear buffer
-    try:
-        UDPClientSocket.settimeout(0.2)
-        UDPClientSocket.recvfrom(100000)
-    except:
-        pass
-
-else:
-    import spidev
-
-    bus = 0
-    device = 1
-    spi = spidev.SpiDev()
-    spi.open(bus, device)
-    spi.max_speed_hz = project["jdata"]["interface"][0].get("max", args.baud)
-    spi.mode = 0
-    spi.lsbfirst = False
-
-INTERVAL = 100
-
-
-data = [0] * (project["data_size"] // 8)
-data[0] = 0x74
-data[1] = 0x69
-data[2] = 0x72
-data[3] = 0x77
+# host -> fpga (rx frame) and fpga -> host (tx frame)
+COMMAND = FrameCodec(project["frame_layout"], "rx")
+FEEDBACK = FrameCodec(project["frame_layout"], "tx")
 
 JOINTS = project["joints"]
 VOUTS = project["vouts"]
@@ -248,6 +71,10 @@ vouts = [0] * project["vouts"]
 douts = [0] * project["douts"]
 
 PRU_OSC = int(project["jdata"]["clock"]["speed"])
+JOINT_CMD_NUMS = [joint_cmd_num(PRU_OSC, jtype) for jtype in JOINT_TYPES]
+JOINT_CMD_MAX = [joint_cmd_max(joint["_bits"]) for joint in project["jointnames"]]
+# setpoints are limited to the width of the vout in the frame
+VOUT_MAX = [(1 << (vout["_bits"] - 1)) - 1 for vout in project["voutnames"]]
 
 vout_types = []
 for num, vout in enumerate(project["voutnames"]):
@@ -257,7 +84,9 @@ vin_types = []
 for num, vin in enumerate(project["vinnames"]):
     vin_types.append(vin["type"])
 
-JOINT_ENABLE_BYTES = project["joints_en_total"] // 8
+# the same transfer tables as in rio.h
+VIN_TABLES = [vin_table(project["plugins"][vin["_plugin"]], vin) for vin in project["vinnames"]]
+
 DIGITAL_OUTPUT_BYTES = project["douts_total"] // 8
 DIGITAL_INPUT_BYTES = project["dins_total"] // 8
 
@@ -291,8 +120,9 @@ class modbus_vfd:
     speed_command = 0
     spindle_speed_fb = 0
     freq_cmd = 0
-    modbus_interval = 1
-    modbus_counter = 0
+    # seconds between two modbus frames (the old 100ms bus loop sent every third call)
+    modbus_interval = 0.3
+    modbus_last = 0.0
     cmd_counter = 0
 
     rated_motor_voltage = 0
@@ -432,8 +262,9 @@ class modbus_vfd:
 
     def transmit(self):
         data = [0] * 9
-        if self.modbus_counter > self.modbus_interval:
-            self.modbus_counter = 0
+        now = time.monotonic()
+        if now - self.modbus_last >= self.modbus_interval:
+            self.modbus_last = now
 
             cmds = [
                 self.spindle_PD005,
@@ -486,14 +317,9 @@ class modbus_vfd:
             data[0] = len(cmd) + 2
             for n in range(len(cmd)):
                 data[n + 1] = cmd[n]
-                print("### ", data[n + 1])
             data[n + 2] = crcH
-            print("### ", data[n + 2])
             data[n + 3] = crcL
-            print("### ", data[n + 3])
 
-        else:
-            self.modbus_counter += 1
         return data
 
     def feedback(self):
@@ -579,6 +405,125 @@ class modbus_vfd:
                 self.freq_lower_limit = self.max_freq
 
 
+class Slot:
+    """latest-value slot: put() replaces the value by one reference assignment, get() returns the newest (sequence, value)"""
+
+    def __init__(self):
+        self.value = (0, None)
+
+    def put(self, value):
+        self.value = (self.value[0] + 1, value)
+
+    def get(self):
+        return self.value
+
+
+class IOWorker(threading.Thread):
+    """
+    exchanges the frames at a fixed rate, independent of the qt event loop
+
+    the ui puts the command values into the command slot, the worker
+    publishes every decoded answer with its statistics into the feedback slot
+    """
+
+    def __init__(self, transport, interval, vfd):
+        super().__init__(daemon=True)
+        self.transport = transport
+        self.interval = interval / 1000.0
+        self.vfd = vfd
+        self.command = Slot()
+        self.feedback = Slot()
+        # rotating sub-frame: slot of the next frame and the last value of every vin
+        self.slot = 0
+        self.vins = [0] * VINS
+        self.stats = {
+            "pkg_in": 1,
+            "pkg_out": 1,
+            "errors_spi": 0,
+            "errors_net": 0,
+            "time_trx": 0.0,
+            "time_trx_max": 0.0,
+        }
+
+    def run(self):
+        next_frame = time.perf_counter()
+        while True:
+            command = self.command.get()[1]
+            if command is not None:
+                self.exchange(command)
+            next_frame += self.interval
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # overrun, do not try to catch up
+                next_frame = time.perf_counter()
+
+    def exchange(self, command):
+        stats = self.stats
+        values = dict(command)
+
+        # boutnames
+        values["bout"] = [b""] * project["bouts"]
+        for num, bout in enumerate(project["boutnames"]):
+            if bout["type"] == "modbus":
+                for protocol in bout["protocols"]:
+                    if protocol["type"] == "hyvfd":
+                        package = self.vfd[protocol["addr"]].transmit()
+                        values["bout"][num] = bytes(package[: bout["size"] // 8])
+
+        values["slot"] = [self.slot]
+        self.slot = (self.slot + 1) % max(project["frame_slots"], 1)
+
+        data = COMMAND.encode(values)
+        stats["pkg_out"] += 1
+        if args.debug:
+            print("")
+            print(f"tx ({stats['pkg_out']}): {list(data)}")
+
+        start = time.perf_counter()
+        try:
+            rec = self.transport.exchange(data)
+            stats["time_trx"] = time.perf_counter() - start
+            stats["time_trx_max"] = max(stats["time_trx"], stats["time_trx_max"])
+            if len(rec) != len(data):
+                print(f"{stats['pkg_out']}/{stats['pkg_in']} WRONG DATASIZE: {len(rec)} / {len(data)}")
+            feedback = FEEDBACK.decode(rec)
+        except Exception as e:
+            print("ERROR", e)
+            stats["errors_net"] += 1
+            self.feedback.put({"error": f"ERROR: {e}", "stats": dict(stats)})
+            return
+
+        header = feedback["header"][0]
+        if header == PRU_DATA:
+            stats["pkg_in"] += 1
+            if args.debug:
+                print(f"PRU_DATA: 0x{header:x}")
+        else:
+            print(f"ERROR: Unknown Header: 0x{header:x}")
+            stats["errors_spi"] += 1
+
+        if args.debug:
+            print(f"Duration: {stats['time_trx'] * 1000:02.02f}ms / {stats['time_trx_max'] * 1000:02.02f}ms")
+            print(f"rx ({stats['pkg_in']}): {list(rec)}")
+
+        # slow vins of the other slots keep their last value
+        for num, value in enumerate(feedback.get("vin", [])):
+            if value is not None:
+                self.vins[num] = value
+        feedback["vin"] = list(self.vins)
+
+        # binnames
+        for num, bins in enumerate(project["binnames"]):
+            if bins["type"] == "modbus":
+                for protocol in bins["protocols"]:
+                    if protocol["type"] == "hyvfd":
+                        self.vfd[protocol["addr"]].receive(list(feedback["bin"][num]))
+
+        self.feedback.put({"header": header, "values": feedback, "stats": dict(stats)})
+
+
 class WinForm(QWidget):
     def __init__(self, parent=None):
         super(WinForm, self).__init__(parent)
@@ -590,13 +535,8 @@ class WinForm(QWidget):
         self.vminmax = {}
         self.animation = 0
         self.doutcounter = 0
-        self.error_counter_spi = 0
-        self.error_counter_net = 0
-        self.time_trx = 0
-        self.time_trx_max = 0
         self.vfd = {}
-        self.pkg_in = 1
-        self.pkg_out = 1
+        self.feedback_seq = 0
 
         # boutnames
         for num, bout in enumerate(project["boutnames"]):
@@ -842,19 +782,18 @@ class WinForm(QWidget):
 
         self.setLayout(layout)
 
+        self.io = IOWorker(transport, INTERVAL, self.vfd)
+        self.io.start()
+
         self.timer = QTimer()
         self.timer.timeout.connect(self.runTimer)
-        self.timer.start(INTERVAL)
+        self.timer.start(DISPLAY_INTERVAL)
 
     def slider_reset(self, key):
         self.widgets[key].setValue(0)
 
     def runTimer(self):
-        data[0] = 0x74
-        data[1] = 0x69
-        data[2] = 0x72
-        data[3] = 0x77
-
+        # the frames are exchanged by the io worker, this only passes the widget values and shows the newest answer
         try:
             for jn in range(JOINTS):
                 key = f"jcs{jn}"
@@ -869,7 +808,7 @@ class WinForm(QWidget):
                 key = f"vo{vn}"
                 self.widgets[key].setText(str(vouts[vn]))
 
-            douts = []
+            douts = [0] * DOUTS
             if project["douts"]:
                 if self.widgets["dout_auto"].isChecked():
                     for dbyte in range(DIGITAL_OUTPUT_BYTES):
@@ -889,187 +828,93 @@ class WinForm(QWidget):
                         self.doutcounter += 1
 
                 for dbyte in range(DIGITAL_OUTPUT_BYTES):
-                    douts.append(0)
                     for dn in range(8):
                         key = f"doc{dbyte}{dn}"
                         if self.widgets[key].isChecked():
-                            douts[dbyte] |= 1 << (7 - dn)
+                            douts[dbyte * 8 + dn] = 1
                         if dbyte * 8 + dn == DOUTS - 1:
                             break
 
-            bn = 4
+            jointcmds = []
             for jn, value in enumerate(joints):
-                # precalc
-                if value == 0:
-                    value = 0
-                else:
-                    if JOINT_TYPES[jn] == "joint_pwmdir":
-                        value = value
-                    else:
-                        value = int(PRU_OSC / value / 2)
+                # same fixed point conversion as rio.c
+                value = freq_cmd(JOINT_CMD_NUMS[jn], value, JOINT_CMD_MAX[jn])
 
                 key = f"jc{jn}"
                 self.widgets[key].setText(str(value))
+                jointcmds.append(value)
 
-                joint = list(pack("<i", value))
-                for byte in range(4):
-                    data[bn + byte] = joint[byte]
-                bn += 4
-
+            setpoints = []
             for vn, value in enumerate(vouts):
                 plugin_data = VOUT_NAMES[vn]
                 plugin = plugin_data["type"]
                 if hasattr(project["plugins"][plugin], "calculation_vout"):
                     value = int(project["plugins"][plugin].calculation_vout(plugin_data, value))
+                setpoints.append(max(min(int(value), VOUT_MAX[vn]), -VOUT_MAX[vn] - 1))
 
-                vout = list(pack("<i", (value)))
-                for byte in range(4):
-                    data[bn + byte] = vout[byte]
-                bn += 4
-
-            # boutnames
+            # boutnames (the modbus packages are built by the io worker)
             for num, bout in enumerate(project["boutnames"]):
-                boutsize = bout["size"]
                 if bout["type"] == "modbus":
                     name = bout["name"]
                     for protocol in bout["protocols"]:
                         if protocol["type"] == "hyvfd":
                             speed = self.widgets[f"{name}-hyvfd"].value()
-                            addr = protocol["addr"]
-                            self.vfd[addr].set_speed(speed)
-                            package = self.vfd[addr].transmit()
-                            for boutn in range(boutsize // 8):
-                                data[bn] = package[boutn]
-                                bn += 1
-
-            # jointEnable and dout (TODO: split in bits)
-            for dbyte in range(JOINT_ENABLE_BYTES):
-                data[bn] = 0xFF
-                bn += 1
-
-            # dout
-            if project["douts"]:
-                for dbyte in range(DIGITAL_OUTPUT_BYTES):
-                    data[bn] = douts[dbyte]
-                    bn += 1
-
+                            self.vfd[protocol["addr"]].set_speed(speed)
+
+            self.io.command.put(
+                {
+                    "header": [PRU_WRITE],
+                    "joint": jointcmds,
+                    "vout": setpoints,
+                    "enable": [1] * JOINTS,
+                    "dout": douts,
+                }
+            )
+
+            seq, feedback = self.io.feedback.get()
+            if seq == self.feedback_seq:
+                return
+            self.feedback_seq = seq
+            stats = feedback["stats"]
+
+            error_rate = stats["pkg_in"] * 100 / stats["pkg_out"]
+            self.widgets["errors_spi"].setText(str(stats["errors_spi"]))
+            self.widgets["errors_net"].setText(str(stats["errors_net"]))
+            self.widgets["time_trx"].setText(f"{stats['time_trx'] * 1000:02.02f}ms")
+            self.widgets["time_trx_max"].setText(f"{stats['time_trx_max'] * 1000:02.02f}ms")
+            self.widgets["error_rate"].setText(f"{error_rate:0.2f}%")
+
+            if "error" in feedback:
+                self.widgets["connection"].setText(feedback["error"])
+                self.widgets["connection"].setStyleSheet("background-color: red")
+                return
 
-            self.pkg_out += 1
-            if args.debug:
-                print("")
-                print(f"tx ({self.pkg_out}): {data}")
-            start = time.time()
-            if NET_IP:
-                UDPClientSocket.sendto(bytes(data), (NET_IP, NET_PORT))
-                UDPClientSocket.settimeout(0.2)
-                msgFromServer = UDPClientSocket.recvfrom(len(data)*4)
-                if len(msgFromServer[0]) == len(data):
-                    rec = list(msgFromServer[0])
-                else:
-                    print(f"{self.pkg_out}/{self.pkg_in} WRONG DATASIZE: {len(msgFromServer[0])} / {len(data)}")
-                    rec = list(msgFromServer[0])
-            elif SERIAL:
-                # clean_buffer
-                while ser.inWaiting() > 0:
-                    ser.read(1)
-                ser.write(bytes(data))
-                msgFromServer = ser.read(len(data))
-                rec = list(msgFromServer)
-
-            elif SPI_CH341 is not None:
-                rec = SPI_CH341.spi_trans(data)
-
-            elif SPI_FTDI is not None:
-                rec = list(SPI_FTDI.exchange(data, duplex=True))
-
-            elif SHM_FILE:
-                fd = open(f"{SHM_FILE}.tx", "wb")
-                fd.write(bytes(data))
-                fd.close()
-                fd = open(f"{SHM_FILE}.rx", "rb")
-                msgFromServer = fd.read(len(data))
-                fd.close()
-                rec = list(msgFromServer)
-            else:
-                rec = spi.xfer2(data)
-
-            self.time_trx = time.time() - start
-            self.time_trx_max = max(self.time_trx, self.time_trx_max)
-
-            pos = 0
-            header = unpack("<i", bytes(rec[pos : pos + 4]))[0]
-            pos += 4
-
-            if header == 0x64617461:
-                self.pkg_in += 1
-                if args.debug:
-                    print(f"PRU_DATA: 0x{header:x}")
-                    # for num in range(JOINTS):
-                    #    print(f' Joint({num}): {jointFeedback[num]} // 1')
-                    # for num in range(VINS):
-                    #    print(f' Var({num}): {processVariable[num]}')
-                    # print(f'inputs {inputs:08b}')
+            header = feedback["header"]
+            if header == PRU_DATA:
                 self.widgets["connection"].setText("CONNECTED")
                 self.widgets["connection"].setStyleSheet("background-color: green")
             else:
-                print(f"ERROR: Unknown Header: 0x{header:x}")
-                self.error_counter_spi += 1
                 self.widgets["connection"].setText(f"ERROR: 0x{header:x}")
                 self.widgets["connection"].setStyleSheet("background-color: red")
 
-            if args.debug:
-                print(f"Duration: {self.time_trx * 1000:02.02f}ms / {self.time_trx_max * 1000:02.02f}ms")
-                print(f"rx ({self.pkg_in}): {rec}")
-
-            jointFeedback = [0] * JOINTS
-            processVariable = [0] * VINS
-
-            for num in range(JOINTS):
-                jointFeedback[num] = unpack("<i", bytes(rec[pos : pos + 4]))[0]
-                pos += 4
-
-            for bitsize in (32, 16, 8):
-                for num in range(VINS):
-                    vin = project["vinnames"][num]
-                    bits = vin.get("_bits", 32)
-                    if bitsize != bits:
-                        continue
-                    size = (bits // 8)
-                    diff = (4 - size)
-                    if diff > 0:
-                        block = rec[pos : pos + size] + ([0] * diff)
-                    else:
-                        block = rec[pos : pos + size]
-                    processVariable[num] = unpack("<i", bytes(block))[0]
-                    pos += size
+            values = feedback["values"]
+            jointFeedback = values.get("joint", [])
+            processVariable = values.get("vin", [])
+            inputs = values.get("din", [])
 
             # binnames
-            binValues = {}
             for num, bins in enumerate(project["binnames"]):
-                binValues[num] = []
-                binsize = bins["size"]
-                for binn in range(binsize // 8):
-                    binValues[num].append(unpack("<B", bytes(rec[pos : pos + 1]))[0])
-                    pos += 1
                 if bins["type"] == "modbus":
                     name = bins["name"]
                     for protocol in bins["protocols"]:
                         if protocol["type"] == "hyvfd":
-                            addr = protocol["addr"]
-                            self.vfd[addr].receive(binValues[num])
-                            fbdata = self.vfd[addr].feedback()
+                            fbdata = self.vfd[protocol["addr"]].feedback()
                             for vname, vvalue in fbdata.items():
                                 if f"{name}-hyvfd-{vname}" in self.widgets:
                                     self.widgets[f"{name}-hyvfd-{vname}"].setText(
                                         str(vvalue)
                                     )
 
-            inputs = []
-            for dbyte in range(DIGITAL_INPUT_BYTES):
-                inputs.append(unpack("<B", bytes(rec[pos : pos + 1]))[0])
-                pos += 1
-
-
             for jn, value in enumerate(joints):
                 key = f"jf{jn}"
                 self.widgets[key].setText(str(jointFeedback[jn]))
@@ -1081,7 +926,10 @@ class WinForm(QWidget):
 
                 plugin_data = VIN_NAMES[vn]
                 plugin_name = plugin_data["_plugin"]
-                if hasattr(project["plugins"][plugin_name], "calculation_vin"):
+                if VIN_TABLES[vn] is not None:
+                    value = VIN_TABLES[vn].lookup(value)
+                    unit = VIN_TABLES[vn].unit
+                elif hasattr(project["plugins"][plugin_name], "calculation_vin"):
                     (value, unit) = project["plugins"][plugin_name].calculation_vin(plugin_data, value)
 
                 self.widgets[key].setText(f"{value:0.3f}{unit}")
@@ -1113,7 +961,7 @@ class WinForm(QWidget):
                     key = f"dic{dbyte}{dn}"
 
                     value = "0"
-                    if inputs[dbyte] & (1 << (7 - dn)) != 0:
+                    if dbyte * 8 + dn < DINS and inputs[dbyte * 8 + dn]:
                         value = "1"
 
                     self.widgets[key].setText(value)
@@ -1128,17 +976,9 @@ class WinForm(QWidget):
         except Exception as e:
             print("ERROR", e)
             print(traceback.format_exc())
-            self.error_counter_net += 1
             self.widgets["connection"].setText(f"ERROR: {e}")
             self.widgets["connection"].setStyleSheet("background-color: red")
 
-        error_rate = self.pkg_in * 100 / self.pkg_out
-        self.widgets["errors_spi"].setText(str(self.error_counter_spi))
-        self.widgets["errors_net"].setText(str(self.error_counter_net))
-        self.widgets["time_trx"].setText(f"{self.time_trx * 1000:02.02f}ms")
-        self.widgets["time_trx_max"].setText(f"{self.time_trx_max * 1000:02.02f}ms")
-        self.widgets["error_rate"].setText(f"{error_rate:0.2f}%")
-
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
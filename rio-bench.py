@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+#
+# transport benchmark: exchanges frames with the board as fast as possible
+# (or once per --period) and reports throughput, round-trip latencies and errors
+#
+# python3 rio-bench.py configs/Tangoboard/config.json 192.168.10.194 --duration 10
+# python3 rio-bench.py configs/Tangoboard/config.json /dev/ttyUSB0 --period 1000 --json-output bench.json
+#
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import statistics
+import sys
+import time
+
+import projectLoader
+from frameLayout import PRU_DATA, PRU_READ, FrameCodec
+from transport import open_transport
+
+
+def percentile(values, pct):
+    """nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(values)) - 1, 0)
+    return values[rank]
+
+
+def histogram(latencies):
+    """counts per power-of-two latency bucket (us)"""
+    buckets = {}
+    for latency in latencies:
+        bucket = int(math.log2(max(latency * 1000000, 1)))
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+    if not buckets:
+        return []
+    return [
+        [2**bucket, 2 ** (bucket + 1), buckets.get(bucket, 0)]
+        for bucket in range(min(buckets), max(buckets) + 1)
+    ]
+
+
+def wait_until(deadline):
+    # sleep the coarse part, spin the last 0.5ms
+    delay = deadline - time.perf_counter() - 0.0005
+    if delay > 0:
+        time.sleep(delay)
+    while time.perf_counter() < deadline:
+        pass
+
+
+def bench(transport, frame, duration, period):
+    latencies = []
+    lateness = []
+    errors = {"header": 0, "size": 0, "timeout": 0, "transport": 0}
+    start = time.perf_counter()
+    next_frame = start
+    while time.perf_counter() - start < duration:
+        if period:
+            wait_until(next_frame)
+            lateness.append(time.perf_counter() - next_frame)
+            next_frame += period
+        sent = time.perf_counter()
+        try:
+            rec = transport.exchange(frame)
+        except TimeoutError:
+            errors["timeout"] += 1
+            continue
+        except Exception as e:
+            print("ERROR", e)
+            errors["transport"] += 1
+            continue
+        latencies.append(time.perf_counter() - sent)
+        if len(rec) != len(frame):
+            errors["size"] += 1
+        elif int.from_bytes(rec[:4], "little") != PRU_DATA:
+            errors["header"] += 1
+    return (time.perf_counter() - start, latencies, lateness, errors)
+
+
+def report(args, elapsed, latencies, lateness, errors, frame_size):
+    frames = len(latencies) + errors["timeout"] + errors["transport"]
+    lsorted = sorted(latencies)
+
+    def us(value):
+        return round(value * 1000000, 1)
+
+    result = {
+        "config": args.json,
+        "device": args.device or "spidev",
+        "frame_size": frame_size,
+        "duration": round(elapsed, 3),
+        "period": args.period,
+        "frames": frames,
+        "frames_per_second": round(frames / elapsed, 1),
+        "bytes_per_second": round(frames * frame_size * 2 / elapsed, 1),
+        "latency_us": {
+            "min": us(percentile(lsorted, 0)),
+            "p50": us(percentile(lsorted, 50)),
+            "p99": us(percentile(lsorted, 99)),
+            "p99.9": us(percentile(lsorted, 99.9)),
+            "max": us(percentile(lsorted, 100)),
+            "mean": us(statistics.mean(lsorted)) if lsorted else 0.0,
+            "jitter": us(statistics.pstdev(lsorted)) if lsorted else 0.0,
+        },
+        "errors": errors,
+        "histogram_us": histogram(lsorted),
+    }
+    if args.period:
+        lateness.sort()
+        result["period_lateness_us"] = {
+            "p50": us(percentile(lateness, 50)),
+            "p99": us(percentile(lateness, 99)),
+            "max": us(percentile(lateness, 100)),
+        }
+    return result
+
+
+def print_report(result):
+    print(f"config:     {result['config']}")
+    print(f"device:     {result['device']}")
+    print(f"frame:      {result['frame_size']} bytes")
+    print(f"frames:     {result['frames']} in {result['duration']}s")
+    print(f"throughput: {result['frames_per_second']:.1f} frames/s, {result['bytes_per_second'] / 1000:.1f} kB/s")
+    latency = result["latency_us"]
+    print(
+        f"latency:    min {latency['min']}us  p50 {latency['p50']}us  p99 {latency['p99']}us  "
+        f"p99.9 {latency['p99.9']}us  max {latency['max']}us  jitter {latency['jitter']}us"
+    )
+    if "period_lateness_us" in result:
+        late = result["period_lateness_us"]
+        print(f"lateness:   p50 {late['p50']}us  p99 {late['p99']}us  max {late['max']}us")
+    errors = result["errors"]
+    print(
+        f"errors:     header {errors['header']}  size {errors['size']}  timeout {errors['timeout']}  transport {errors['transport']}"
+    )
+    print("")
+    counts = [count for low, high, count in result["histogram_us"]]
+    scale = 50 / max(counts) if counts else 0
+    for low, high, count in result["histogram_us"]:
+        print(f"{low:>8d}-{high:<8d}us {count:>9d} {'#' * math.ceil(count * scale)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("json", help="json config", type=str, default=None)
+    parser.add_argument(
+        "device",
+        help="device like: /dev/ttyUSB0 | 192.168.10.13 | /dev/shm/rio | CH341 | FTDI (default: spidev)",
+        nargs="?",
+        type=str,
+        default=None,
+    )
+    parser.add_argument("--baud", "-b", help="baudrate", type=int, default=1000000)
+    parser.add_argument("--port", "-p", help="udp port", type=int, default=2390)
+    parser.add_argument("--local-port", help="local udp port (default: --port)", type=int, default=None)
+    parser.add_argument("--timeout", help="udp timeout (s)", type=float, default=0.2)
+    parser.add_argument("--duration", "-t", help="seconds", type=float, default=5.0)
+    parser.add_argument("--period", help="servo period (us), 0 = max rate", type=int, default=0)
+    parser.add_argument("--json-output", "-o", help="write the results as json ('-' for stdout)", type=str, default=None)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        project = projectLoader.load(args.json)
+    transport = open_transport(
+        project, args.device, args.baud, args.port, args.timeout, args.local_port
+    )
+    command = FrameCodec(project["frame_layout"], "rx")
+    # a read frame: all joints disabled, all outputs off
+    frame = bytes(command.encode({"header": [PRU_READ]}))
+
+    elapsed, latencies, lateness, errors = bench(
+        transport, frame, args.duration, args.period / 1000000
+    )
+    result = report(args, elapsed, latencies, lateness, errors, len(frame))
+
+    if args.json_output == "-":
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+        if args.json_output:
+            open(args.json_output, "w").write(json.dumps(result, indent=2))
+
+    if not latencies:
+        sys.exit(1)
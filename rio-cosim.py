@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+#
+# co-simulation with the verilator model of the gateware (toolchain: verilator)
+#
+# the model runs in lockstep: every servo period one frame is exchanged over the simulated interface,
+# then exactly one period (--period at clock.speed) is simulated and the step pulses of every
+# stepper joint are recorded, the report compares the commanded with the generated step frequency
+#
+# python3 buildtool.py configs/Verilator/config-cosim.json && make -C Output/Verilator/Gateware
+# python3 rio-cosim.py configs/Verilator/config-cosim.json Output/Verilator/Gateware/obj_dir/Vrio --freq 1000 -2500 40000
+# python3 rio-cosim.py configs/Verilator/config-cosim.json Output/Verilator/Gateware/obj_dir/Vrio --sweep 12
+#
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+
+import projectLoader
+from frameLayout import PRU_WRITE, FrameCodec
+from generators.linuxcnc_component.linuxcnc_component import INT32_MAX, freq_cmd, joint_cmd_max, joint_cmd_num
+from transport import ShmTransport
+
+
+def stepper_freq(osc, cmd):
+    """step frequency of joint_stepper.v: STP toggles every abs(cmd) + 1 clocks"""
+    if cmd == 0:
+        return 0.0
+    return osc / (2 * (abs(cmd) + 1))
+
+
+class CoSim:
+    """the verilator model in lockstep with the host, one call of period() is one servo period"""
+
+    def __init__(self, project, sim, period):
+        self.osc = int(project["jdata"]["clock"]["speed"])
+        self.cycles = round(self.osc * period)
+        self.cmd_nums = [joint_cmd_num(self.osc, jtype) for jtype in project["jointtypes"]]
+        self.cmd_max = [joint_cmd_max(joint["_bits"]) for joint in project["jointnames"]]
+        self.command = FrameCodec(project["frame_layout"], "rx")
+        self.feedback = FrameCodec(project["frame_layout"], "tx")
+        self.filename = f"/dev/shm/rio-cosim-{os.getpid()}"
+        self.transport = ShmTransport(self.filename, self.command.size, timeout=10.0)
+        self.process = subprocess.Popen(
+            [sim, "--shm", self.filename, "--cosim", str(self.cycles)],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+
+    def period(self, values):
+        """exchanges one frame, returns the feedback and the steps of the period: [(joint, cycle, dir), ...]"""
+        mailbox = self.transport.mailbox
+        mailbox.post(self.command.encode(values))
+        # the model writes the trace before it answers
+        steps = []
+        for line in self.process.stdout:
+            parts = line.split()
+            if parts[0] == "P":
+                break
+            if parts[0] == "S":
+                steps.append((int(parts[1]), int(parts[2]), int(parts[3])))
+        return (self.feedback.decode(mailbox.wait(self.transport.timeout)), steps)
+
+    def close(self):
+        self.process.kill()
+        self.process.wait()
+        os.unlink(self.filename)
+
+
+def run(cosim, freqs, periods, enable):
+    """
+    runs the servo periods with constant frequencies, returns the steps per joint and the position change
+
+    the new command reaches the joints during the first period (after the frame transfer), it is not recorded,
+    the feedback of a frame is latched at the start of the transfer, one more frame reads the final position
+    """
+    values = {
+        "header": [PRU_WRITE],
+        "joint": [freq_cmd(num, freq, cmd_max) for num, freq, cmd_max in zip(cosim.cmd_nums, freqs, cosim.cmd_max)],
+        "enable": enable,
+    }
+    trace = {num: [] for num in range(len(freqs))}
+    positions = []
+    for num in range(periods + 2):
+        feedback, steps = cosim.period(values)
+        positions.append(feedback["joint"])
+        if 1 <= num <= periods:
+            for joint, cycle, direction in steps:
+                trace[joint].append((cycle, direction))
+    moved = [end - start for start, end in zip(positions[1], positions[-1])]
+    return (trace, moved)
+
+
+def analyze(osc, freq, steps, moved, cmd_max=INT32_MAX):
+    cmd = freq_cmd(joint_cmd_num(osc, "joint_stepper"), freq, cmd_max)
+    result = {
+        "commanded_hz": freq,
+        "cmd": cmd,
+        "quantized_hz": round(stepper_freq(osc, cmd), 3),
+        "steps": len(steps),
+        "feedback": moved,
+        "generated_hz": 0.0,
+        "error_pct": -100.0 if freq else 0.0,
+        "jitter_us": 0.0,
+        "interval_cycles": [0, 0],
+        "max_rate_hz": 0.0,
+        "direction_ok": all(direction == (freq > 0) for cycle, direction in steps),
+    }
+    intervals = [b[0] - a[0] for a, b in zip(steps, steps[1:])]
+    if intervals:
+        generated = osc / statistics.mean(intervals)
+        result["generated_hz"] = round(generated, 3)
+        if freq:
+            result["error_pct"] = round((generated - abs(freq)) / abs(freq) * 100, 4)
+        result["jitter_us"] = round(statistics.pstdev(intervals) / osc * 1000000, 4)
+        result["interval_cycles"] = [min(intervals), max(intervals)]
+        result["max_rate_hz"] = round(osc / min(intervals), 3)
+    return result
+
+
+def print_joints(joints):
+    print(
+        f"{'joint':>5s} {'commanded':>12s} {'cmd':>9s} {'quantized':>12s} {'generated':>12s} {'error':>9s} "
+        f"{'jitter':>9s} {'interval':>15s} {'steps':>8s} {'feedback':>9s} dir"
+    )
+    for num, result in joints.items():
+        interval = f"{result['interval_cycles'][0]}-{result['interval_cycles'][1]}"
+        print(
+            f"{num:>5d} {result['commanded_hz']:>10.1f}Hz {result['cmd']:>9d} {result['quantized_hz']:>10.1f}Hz "
+            f"{result['generated_hz']:>10.1f}Hz {result['error_pct']:>8.3f}% {result['jitter_us']:>7.3f}us "
+            f"{interval:>15s} {result['steps']:>8d} {result['feedback']:>9d} {'ok' if result['direction_ok'] else 'WRONG'}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("json", help="json config", type=str, default=None)
+    parser.add_argument("sim", help="verilator model (Gateware/obj_dir/Vrio)", type=str, default=None)
+    parser.add_argument("--period", help="servo period (us)", type=int, default=1000)
+    parser.add_argument("--periods", "-n", help="servo periods per run", type=int, default=100)
+    parser.add_argument("--freq", help="step frequency per joint (Hz)", type=float, nargs="+", default=[1000.0])
+    parser.add_argument("--sweep", help="sweep all steppers from 100Hz to clock/4 in N steps", type=int, default=0)
+    parser.add_argument("--tolerance", help="frequency error for the max step rate of the sweep (%%)", type=float, default=1.0)
+    parser.add_argument("--trace", help="write the steps as csv (joint, cycle, time_us, dir)", type=str, default=None)
+    parser.add_argument("--json-output", "-o", help="write the results as json ('-' for stdout)", type=str, default=None)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        project = projectLoader.load(args.json)
+    steppers = [num for num, jtype in enumerate(project["jointtypes"]) if jtype == "joint_stepper"]
+    if not steppers:
+        print("ERROR: no joint_stepper in this config")
+        sys.exit(1)
+
+    cosim = CoSim(project, args.sim, args.period / 1000000)
+    osc = cosim.osc
+    enable = [1] * project["joints"]
+    result = {
+        "config": args.json,
+        "clock": osc,
+        "period_us": args.period,
+        "period_cycles": cosim.cycles,
+        "periods": args.periods,
+    }
+    try:
+        if args.sweep:
+            rows = []
+            for step in range(args.sweep):
+                freq = 100.0 * (osc / 4 / 100.0) ** (step / max(args.sweep - 1, 1))
+                freqs = [freq if num in steppers else 0.0 for num in range(project["joints"])]
+                # at least a few steps at low frequencies
+                periods = max(args.periods, math.ceil(4 / (freq * args.period / 1000000)))
+                trace, moved = run(cosim, freqs, periods, enable)
+                rows.append(analyze(osc, freq, trace[steppers[0]], moved[steppers[0]], cosim.cmd_max[steppers[0]]))
+            in_tolerance = [row["commanded_hz"] for row in rows if abs(row["error_pct"]) <= args.tolerance]
+            result["sweep"] = rows
+            result["max_step_rate_hz"] = round(max(in_tolerance), 3) if in_tolerance else 0.0
+        else:
+            freqs = [0.0] * project["joints"]
+            for snum, num in enumerate(steppers):
+                freqs[num] = args.freq[min(snum, len(args.freq) - 1)]
+            trace, moved = run(cosim, freqs, args.periods, enable)
+            result["joints"] = {
+                num: analyze(osc, freqs[num], trace[num], moved[num], cosim.cmd_max[num]) for num in steppers
+            }
+            if args.trace:
+                with open(args.trace, "w") as fd:
+                    fd.write("joint,cycle,time_us,dir\n")
+                    for num in steppers:
+                        for cycle, direction in trace[num]:
+                            fd.write(f"{num},{cycle},{cycle / osc * 1000000:.3f},{direction}\n")
+    finally:
+        cosim.close()
+
+    if args.json_output == "-":
+        print(json.dumps(result, indent=2))
+        sys.exit(0)
+
+    print(f"config:  {result['config']}")
+    print(f"clock:   {osc / 1000000:.3f}MHz, servo period {args.period}us ({cosim.cycles} cycles) x {args.periods}")
+    print("")
+    if args.sweep:
+        print_joints(dict(enumerate(result["sweep"])))
+        print("")
+        print(f"max step rate: {result['max_step_rate_hz']:.1f}Hz (error <= {args.tolerance}%), limit {osc / 4:.1f}Hz (cmd = 1)")
+    else:
+        print_joints(result["joints"])
+    if args.json_output:
+        open(args.json_output, "w").write(json.dumps(result, indent=2))
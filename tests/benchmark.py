@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+#
+# generation benchmark: times projectLoader.load and the generators
+# for all shipped configs and for synthetic large configs
+#
+# python3 tests/benchmark.py --save benchmark.json
+# python3 tests/benchmark.py --compare benchmark.json
+#
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import profiler  # noqa: E402
+from buildtool import main  # noqa: E402
+
+# name: (joints, vins, vouts, dins, douts)
+SYNTHETIC = {
+    "synthetic-32": (32, 100, 100, 200, 200),
+    "synthetic-64": (64, 200, 200, 400, 400),
+    "synthetic-128": (128, 400, 400, 800, 800),
+}
+
+
+def synthetic_config(name, joints, vins, vouts, dins, douts):
+    pins = (f"P{num}" for num in range(1000000))
+    jdata = {
+        "name": name,
+        "description": "synthetic benchmark config",
+        "boardcfg": "TangNano9K",
+        "interface": [
+            {
+                "type": "spi",
+                "pins": {
+                    "MOSI": next(pins),
+                    "MISO": next(pins),
+                    "SCK": next(pins),
+                    "SEL": next(pins),
+                },
+            }
+        ],
+        "enable": {"pin": next(pins)},
+        "plugins": [],
+    }
+    for num in range(joints):
+        jdata["plugins"].append(
+            {
+                "type": "joint_stepper",
+                "name": f"J{num}",
+                "pins": {"step": next(pins), "dir": next(pins)},
+            }
+        )
+    for num in range(vouts):
+        jdata["plugins"].append(
+            {"type": "vout_pwm", "name": f"PWM{num}", "pin": next(pins)}
+        )
+    for num in range(vins):
+        jdata["plugins"].append(
+            {"type": "vin_frequency", "name": f"FREQ{num}", "pin": next(pins)}
+        )
+    for num in range(dins):
+        jdata["plugins"].append(
+            {"type": "din_bit", "name": f"DIN{num}", "pin": next(pins)}
+        )
+    for num in range(douts):
+        jdata["plugins"].append(
+            {"type": "dout_bit", "name": f"DOUT{num}", "pin": next(pins)}
+        )
+    return jdata
+
+
+def run(configfile):
+    """returns the load, generate and total time of one buildtool run"""
+    profiler.enable()
+    with tempfile.TemporaryDirectory() as outputdir:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            main(configfile, outputdir, cache=False)
+        total = time.perf_counter() - start
+    durations = {}
+    for span in profiler.trace()["spans"]:
+        durations[span["name"]] = durations.get(span["name"], 0.0) + span["duration"]
+    return {
+        "load": durations.get("projectLoader.load", 0.0),
+        "generate": durations.get("generators", 0.0),
+        "total": total,
+    }
+
+
+def benchmark(configfile, repeat):
+    runs = [run(configfile) for _ in range(repeat)]
+    return {
+        key: round(statistics.median(result[key] for result in runs), 6)
+        for key in ("load", "generate", "total")
+    }
+
+
+def compare(results, baseline, threshold, noise):
+    regressions = []
+    print(f"{'name':50s} {'baseline':>10s} {'current':>10s} {'ratio':>7s}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:50s} {'-':>10s} {result['total'] * 1000:8.2f}ms")
+            continue
+        old = baseline[name]["total"]
+        new = result["total"]
+        ratio = new / old if old else 1.0
+        flag = ""
+        if ratio > threshold and new - old > noise:
+            flag = " REGRESSION"
+            regressions.append(name)
+        print(f"{name:50s} {old * 1000:8.2f}ms {new * 1000:8.2f}ms {ratio:6.2f}x{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", help="runs per config", type=int, default=3)
+    parser.add_argument("--filter", help="only configs containing this string", type=str, default="")
+    parser.add_argument("--save", help="write the results as baseline json", type=str, default=None)
+    parser.add_argument("--compare", help="compare against this baseline json", type=str, default=None)
+    parser.add_argument("--threshold", help="regression ratio (total time)", type=float, default=1.25)
+    parser.add_argument("--noise", help="ignore differences below this (seconds)", type=float, default=0.005)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as configdir:
+        configs = sorted(glob.glob("configs/*/config*.json"))
+        for name, size in SYNTHETIC.items():
+            configfile = f"{configdir}/{name}.json"
+            open(configfile, "w").write(json.dumps(synthetic_config(name, *size), indent=2))
+            configs.append(configfile)
+
+        for configfile in configs:
+            name = configfile
+            if configfile.startswith(configdir):
+                name = os.path.basename(configfile).split(".")[0]
+            if args.filter not in name:
+                continue
+            results[name] = benchmark(configfile, args.repeat)
+            if not args.compare:
+                result = results[name]
+                print(
+                    f"{name:50s} load {result['load'] * 1000:8.2f}ms  generate {result['generate'] * 1000:8.2f}ms  total {result['total'] * 1000:8.2f}ms"
+                )
+
+    if args.save:
+        open(args.save, "w").write(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "repeat": args.repeat,
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+
+    if args.compare:
+        baseline = json.loads(open(args.compare, "r").read())["results"]
+        regressions = compare(results, baseline, args.threshold, args.noise)
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            sys.exit(1)
@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+import projectLoader
+
+# the config of most tests, load_variant() changes a copy of it
+TEST_CONFIG = "tests/data/tangnano9k_1/config.json"
+
+
+@pytest.fixture
+def load_variant(tmp_path):
+    """
+    loads a variant of the test config (uncached): load_variant(change, **jdata)
+
+    the top level keys of jdata are replaced (frame, transport, ...), change(config) can edit the plugins
+    """
+
+    def load(change=None, **jdata):
+        with open(TEST_CONFIG) as fd:
+            config = json.load(fd)
+        config.update(jdata)
+        if change is not None:
+            change(config)
+        configfile = tmp_path / "config.json"
+        configfile.write_text(json.dumps(config))
+        return projectLoader.load(str(configfile), cache=False)
+
+    return load
@@ -0,0 +1,72 @@
+import threading
+
+import projectLoader
+from boardEmulator import BoardEmulator
+from frameLayout import PRU_DATA, PRU_READ, PRU_WRITE, FrameCodec
+from transport import ShmMailbox, ShmTransport
+
+
+def test_emulator_steps():
+    project = projectLoader.load("tests/data/tangnano9k_1/config.json")
+    emulator = BoardEmulator(project)
+    command = FrameCodec(project["frame_layout"], "rx")
+    feedback = FrameCodec(project["frame_layout"], "tx")
+
+    # 1000 steps/s
+    cmd = emulator.osc // 1000 // 2 - 1
+    frame = command.encode(
+        {
+            "header": [PRU_WRITE],
+            "joint": [cmd, -cmd, cmd, 0, 0],
+            "enable": [1, 1, 0, 1, 1],
+        }
+    )
+    values = feedback.decode(emulator.exchange(bytes(frame)))
+    assert values["header"] == [PRU_DATA]
+
+    emulator.step(1.0)
+    values = feedback.decode(emulator.exchange(bytes(command.encode({"header": [PRU_READ]}))))
+    assert 1000 <= values["joint"][0] < 1010
+    assert values["joint"][1] == -values["joint"][0]
+    assert values["joint"][2:] == [0, 0, 0]
+
+    assert emulator.exchange(b"\0" * command.size) is None
+
+
+def test_emulator_echo():
+    project = projectLoader.load("configs/Alhambra-II/config.json")
+    emulator = BoardEmulator(project)
+    command = FrameCodec(project["frame_layout"], "rx")
+    feedback = FrameCodec(project["frame_layout"], "tx")
+
+    frame = command.encode({"header": [PRU_WRITE], "vout": [-1234], "dout": [1, 0, 1, 0]})
+    values = feedback.decode(emulator.exchange(bytes(frame)))
+    assert values["vin"] == [-1234]
+    assert values["din"] == [1, 0]
+
+
+def test_emulator_shm(tmp_path):
+    project = projectLoader.load("configs/Alhambra-II/config.json")
+    emulator = BoardEmulator(project)
+    command = FrameCodec(project["frame_layout"], "rx")
+    feedback = FrameCodec(project["frame_layout"], "tx")
+    filename = str(tmp_path / "rio")
+    transport = ShmTransport(filename, command.size, timeout=5.0)
+    board = ShmMailbox(filename, command.size)
+
+    def serve(frames):
+        while frames:
+            data = board.pending()
+            if data is not None:
+                board.answer(emulator.exchange(data))
+                frames -= 1
+
+    thread = threading.Thread(target=serve, args=(100,))
+    thread.start()
+    for num in range(100):
+        frame = command.encode({"header": [PRU_WRITE], "vout": [num]})
+        values = feedback.decode(transport.exchange(frame))
+        assert values["header"] == [PRU_DATA]
+        assert values["vin"] == [num]
+    thread.join()
+    assert board.sequences() == (100, 100)
@@ -0,0 +1,26 @@
+import os
+
+from fileWriter import changed_files, copy_file, write_file
+
+
+def test_write_unchanged(tmp_path):
+    project = {}
+    filename = str(tmp_path / "rio.v")
+
+    assert write_file(project, filename, "module rio();\n")
+    os.utime(filename, (0, 0))
+    assert not write_file(project, filename, "module rio();\n")
+    assert os.stat(filename).st_mtime == 0
+    assert changed_files(project) == []
+
+    assert write_file(project, filename, "module rio2();\n")
+    assert changed_files(project) == [filename]
+
+
+def test_copy_unchanged(tmp_path):
+    project = {}
+    target = str(tmp_path / "blink.v")
+
+    assert copy_file(project, "generators/gateware/blink.v", target)
+    assert not copy_file(project, "generators/gateware/blink.v", str(tmp_path))
+    assert open(target).read() == open("generators/gateware/blink.v").read()
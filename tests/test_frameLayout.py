@@ -0,0 +1,153 @@
+from struct import Struct
+
+import pytest
+
+import projectLoader
+from boardEmulator import BoardEmulator
+from frameLayout import PRU_WRITE, FrameCodec, crc
+
+
+def test_frame_layout():
+    project = projectLoader.load("tests/data/tangnano9k_1/config.json")
+    layout = project["frame_layout"]
+
+    assert layout.size["rx"] == project["rx_data_size"]
+    assert layout.size["tx"] == project["tx_data_size"]
+    for direction in ("rx", "tx"):
+        assert Struct(layout.struct_format(direction)).size * 8 == project["data_size"]
+        offset = 0
+        for region in layout.regions[direction]:
+            assert region["offset"] == offset
+            offset += region["width"]
+            for field in region["fields"]:
+                assert region["offset"] <= field["offset"] < offset
+
+    joint = layout.kind("rx", "joint")[0]
+    assert joint["offset"] == 32
+    assert layout.buffer_bit(joint["offset"]) == project["data_size"] - 40
+
+
+def test_frame_codec():
+    project = projectLoader.load("tests/data/tangnano9k_1/config.json")
+    codec = FrameCodec(project["frame_layout"], "rx")
+    assert codec.size * 8 == project["data_size"]
+
+    values = {
+        "header": [PRU_WRITE],
+        "joint": [-1000 * num for num in range(project["joints"])],
+        "vout": [num for num in range(project["vouts"])],
+        "bout": [b""] * project["bouts"],
+        "enable": [1] * project["joints"],
+        "dout": [num % 2 for num in range(project["douts"])],
+    }
+    data = codec.encode(values)
+    assert data is codec.buffer
+    assert data[:4] == bytes([0x74, 0x69, 0x72, 0x77])
+
+    decoded = codec.decode(bytes(data))
+    for kind, kvalues in values.items():
+        assert decoded.get(kind, []) == kvalues
+
+    # the buffer is reused, stale bits are cleared
+    values["dout"] = [0] * project["douts"]
+    assert codec.decode(codec.encode(values))["dout"] == values["dout"]
+
+
+def test_frame_widths(load_variant):
+    def change(config):
+        for plugin in config["plugins"]:
+            if plugin["type"] == "vout_pwm":
+                plugin["bits"] = 16
+            elif plugin["type"] == "joint_stepper":
+                plugin["bits"] = 8
+
+    project = load_variant(change)
+    full = projectLoader.load("tests/data/tangnano9k_1/config.json")
+    layout = project["frame_layout"]
+
+    assert layout.size["rx"] == full["frame_layout"].size["rx"] - 16 - 5 * 24
+    assert layout.region("rx", "jointFreqCmd8")["width"] == 5 * 8
+    assert layout.region("rx", "setPoint16")["width"] == 16
+    # no padding in the structs of rio.h
+    for region in layout.regions["rx"]:
+        assert region["offset"] % region["bits"] == 0
+
+    codec = FrameCodec(layout, "rx")
+    values = {"header": [PRU_WRITE], "joint": [-128, 127, 1, 0, -1], "vout": [-32768]}
+    decoded = codec.decode(bytes(codec.encode(values)))
+    assert decoded["joint"] == values["joint"]
+    assert decoded["vout"] == values["vout"]
+
+
+def test_frame_rotating(load_variant):
+    def change(config):
+        pwm = [plugin for plugin in config["plugins"] if plugin["type"] == "vout_pwm"][0]
+        config["plugins"].append(dict(pwm, bits=16, pins={"pwm": "25"}))
+        config["plugins"].append(dict(pwm, fast=True, pins={"pwm": "26"}))
+
+    project = load_variant(change, frame={"mode": "rotating", "slots": 2})
+    layout = project["frame_layout"]
+
+    slots = layout.region("rx", "slots")
+    assert [(field["index"], field["slot"]) for field in slots["fields"]] == [(0, 0), (1, 1)]
+    assert slots["width"] == 32
+    assert layout.region("rx", "setPoint32")["width"] == 32
+    for direction in ("rx", "tx"):
+        for slot in range(2):
+            assert Struct(layout.struct_format(direction, slot)).size * 8 == project["data_size"]
+            for region in layout.frame_regions(direction, slot):
+                assert region["offset"] % region["bits"] == 0
+
+    codec = FrameCodec(layout, "rx")
+    values = {"header": [PRU_WRITE], "vout": [1, 2, -3], "slot": [1]}
+    decoded = codec.decode(bytes(codec.encode(values)))
+    assert decoded["slot"] == [1]
+    assert decoded["vout"] == [None, 2, -3]
+    values["slot"] = [2]
+    decoded = codec.decode(bytes(codec.encode(values)))
+    assert decoded["slot"] == [0]
+    assert decoded["vout"] == [1, None, -3]
+
+    data = bytearray(codec.encode(values))
+    data[layout.region("rx", "slot")["offset"] // 8] = 5
+    with pytest.raises(ValueError):
+        codec.decode(bytes(data))
+
+
+def test_frame_crc(load_variant):
+    assert crc(b"123456789", 16) == 0x29B1
+    assert crc(b"123456789", 32) == 0x0376E6E7
+
+    project = load_variant(frame={"crc": 16})
+    full = projectLoader.load("tests/data/tangnano9k_1/config.json")
+    layout = project["frame_layout"]
+    assert layout.data_size == full["data_size"] + 16
+    assert layout.region("tx", "crcErrors")["width"] == 8
+
+    codec = FrameCodec(layout, "rx")
+    values = {"header": [PRU_WRITE], "joint": [1, -2, 3, 0, 0]}
+    data = bytearray(codec.encode(values))
+    assert crc(data, 16) == 0
+    assert codec.decode(bytes(data))["joint"] == values["joint"]
+    data[5] ^= 0x01
+    with pytest.raises(ValueError):
+        codec.decode(bytes(data))
+
+
+def test_frame_sequence(load_variant):
+    project = load_variant(transport="UDP", frame={"pipelined": True})
+    layout = project["frame_layout"]
+    assert project["frame_sequence"]
+    for direction in ("rx", "tx"):
+        region = layout.region(direction, "sequence")
+        assert region["width"] == 16 and not region["signed"]
+        for region in layout.regions[direction]:
+            assert region["offset"] % region["bits"] == 0
+
+    # sent modulo 2^16 and echoed by the emulator
+    command = FrameCodec(layout, "rx")
+    feedback = FrameCodec(layout, "tx")
+    frame = command.encode({"header": [PRU_WRITE], "sequence": [70000]})
+    assert command.decode(bytes(frame))["sequence"] == [70000 & 0xFFFF]
+    values = feedback.decode(BoardEmulator(project).exchange(bytes(frame)))
+    assert values["sequence"] == [70000 & 0xFFFF]
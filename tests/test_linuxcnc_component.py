@@ -0,0 +1,60 @@
+import importlib
+
+from generators.linuxcnc_component.linuxcnc_component import (
+    freq_cmd,
+    joint_cmd_max,
+    joint_cmd_num,
+    linear_conversion,
+    linear_expression,
+    spi_prescaler,
+)
+
+
+def test_freq_cmd():
+    stepper = joint_cmd_num(12000000, "joint_stepper")
+    assert freq_cmd(stepper, 1000) == 6000
+    assert freq_cmd(stepper, -2500) == -2400
+    assert freq_cmd(stepper, 0) == 0
+    # below the resolution (1/16 Hz) the joint stops
+    assert freq_cmd(stepper, 0.05) == 0
+    assert freq_cmd(stepper, 0.0625) == 96000000
+
+    assert freq_cmd(joint_cmd_num(1000000, "joint_rcservo"), 50) == 20000
+    # slower than the width can encode: stop, not the fastest command
+    assert freq_cmd(joint_cmd_num(200000000, "joint_rcservo"), 0.0625) == 0
+    assert freq_cmd(joint_cmd_num(1000000, "joint_pwmdir"), -123.9) == -123
+
+    # joints with less than 32 bits in the frame
+    assert freq_cmd(stepper, 1000, joint_cmd_max(16)) == 6000
+    assert freq_cmd(stepper, -200, joint_cmd_max(16)) == -30000
+    assert freq_cmd(stepper, -100, joint_cmd_max(16)) == 0
+    assert freq_cmd(joint_cmd_num(1000000, "joint_pwmdir"), 1000.0, joint_cmd_max(8)) == 127
+
+
+def test_linear_conversion():
+    jdata = {"clock": {"speed": "12000000"}}
+    ads1115 = importlib.import_module("plugins.vin_ads1115.plugin").Plugin(jdata)
+    assert linear_conversion(ads1115, {}, "vin") == (0.001, 0.0)
+    assert linear_conversion(importlib.import_module("plugins.vin_frequency.plugin").Plugin(jdata), {}, "vin") is None
+    assert linear_conversion(importlib.import_module("plugins.vin_quadencoder.plugin").Plugin(jdata), {}, "vin") == (1.0, 0.0)
+
+    # the same setpoints like calculation_vout
+    pwm = importlib.import_module("plugins.vout_pwm.plugin").Plugin(jdata)
+    for setup in ({"frequency": 10000}, {"frequency": 10000, "min": 20, "max": 80}, {"frequency": 10000, "dir": "A1"}):
+        scale, offset = linear_conversion(pwm, setup, "vout")
+        for value in (-50, 0, 30, 100):
+            assert round(value * scale + offset) == pwm.calculation_vout(setup, value)
+
+    assert linear_expression("values[0]", 1.0, 0.0) == "values[0]"
+    assert linear_expression("values[0]", 0.25, -60) == "values[0] * 0.25f + -60.0f"
+
+
+def test_spi_prescaler():
+    # 12MHz fpga: not faster than 3MHz (divider 256 at 500MHz)
+    assert spi_prescaler(320, 0.001, 12000000) == (1024, 320 * 1024 / 500000000)
+    assert spi_prescaler(320, 0.0003, 12000000)[0] == 256
+    # the budget is too short, the fastest divider of the fpga
+    assert spi_prescaler(2048, 0.0001, 12000000)[0] == 256
+    assert spi_prescaler(2048, 0.0001, 100000000)[0] == 32
+    # Raspberry 3 core clock
+    assert spi_prescaler(2048, 0.0001, 100000000, 400000000)[0] == 16
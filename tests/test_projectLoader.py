@@ -0,0 +1,66 @@
+import json
+import shutil
+
+import pytest
+
+import projectLoader
+
+
+def test_lazy_plugins():
+    project = projectLoader.load("tests/data/tangnano9k_1/config.json")
+    used = set()
+    for ftype in projectLoader.PLUGIN_SECTIONS:
+        for entry in project["jdata"][ftype]:
+            used.update(projectLoader.plugin_types().get(entry["type"], []))
+
+    assert set(project["plugins"]) == used
+    assert "vout_7seg" not in project["plugins"]
+
+
+def test_project_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(projectLoader, "CACHE_PATH", str(tmp_path / "cache"))
+    configfile = tmp_path / "config.json"
+    shutil.copy("tests/data/tangnano9k_1/config.json", configfile)
+
+    cold = projectLoader.load(str(configfile))
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+    warm = projectLoader.load(str(configfile))
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+    assert warm["data_size"] == cold["data_size"]
+    assert warm["pinlists"] == cold["pinlists"]
+    assert set(warm["plugins"]) == set(cold["plugins"])
+
+    jdata = json.loads(configfile.read_text())
+    jdata["plugins"] = [p for p in jdata["plugins"] if p["type"] != "joint_stepper"]
+    configfile.write_text(json.dumps(jdata))
+    changed = projectLoader.load(str(configfile))
+    assert len(list((tmp_path / "cache").iterdir())) == 2
+    assert changed["joints"] == 0
+
+
+def test_pin_conflicts(load_variant, capsys):
+    def change(jdata):
+        dins = [p for p in jdata["plugins"] if p["type"] == "din_bit"]
+        douts = [p for p in jdata["plugins"] if p["type"] == "dout_bit"]
+        douts[0]["pin"] = dins[0]["pin"]
+        douts[1]["pin"] = dins[1]["pin"]
+        for din in dins:
+            if din["pin"] == "EXPANSION0_INPUT[7]":
+                din["pin"] = "EXPANSION0_OUTPUT[7]"
+        for dout in douts:
+            if dout["pin"] == "EXPANSION0_OUTPUT[7]":
+                dout["pin"] = "EXPANSION0_INPUT[7]"
+
+    with pytest.raises(SystemExit):
+        load_variant(change)
+    output = capsys.readouterr().out
+    assert output.count("allready in use") == 2
+    assert output.count("pin-direction do not match") == 2
+
+
+def test_pin_index():
+    project = projectLoader.load("tests/data/tangnano9k_1/config.json", cache=False)
+    for pname, pins in project["pinlists"].items():
+        for pin in pins:
+            assert project["pins"][pin[1]]["owner"] == pname
+    assert project["pins"]["EXPANSION0_INPUT[0]"]["direction"] == "INPUT"
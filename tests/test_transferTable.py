@@ -0,0 +1,34 @@
+import importlib
+
+import pytest
+
+from transferTable import TransferTable, ntc_celsius, vin_table
+
+
+def test_ntc_celsius():
+    # divider at the half: r_ntc == r_25
+    assert ntc_celsius(1.65) == pytest.approx(25.0)
+    assert ntc_celsius(1.0) > 25.0 > ntc_celsius(2.0)
+
+
+def test_lookup():
+    table = TransferTable(lambda value: value * 2.0 + 1.0, 0, 100, 10)
+    assert len(table.values) == 11
+    assert table.lookup(0) == 1.0
+    assert table.lookup(55) == pytest.approx(111.0)
+    # clamped outside of the range
+    assert table.lookup(-5) == 1.0
+    assert table.lookup(1000) == 201.0
+
+    with pytest.raises(ValueError):
+        TransferTable(lambda value: 1.0 / value, 0, 100, 10)
+
+
+def test_vin_table():
+    ads1115 = importlib.import_module("plugins.vin_ads1115.plugin").Plugin({})
+    assert vin_table(ads1115, {}) is None
+    table = vin_table(ads1115, {"sensor": "NTC", "table_size": 512})
+    assert table.size == 512
+    assert table.unit == "°C"
+    for raw in range(200, 3100, 7):
+        assert table.lookup(raw) == pytest.approx(ntc_celsius(raw / 1000.0), abs=0.01)
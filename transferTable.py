@@ -0,0 +1,79 @@
+import math
+from struct import Struct
+
+# default resolution of the lookup tables (intervals)
+TABLE_SIZE = 256
+
+FLOAT32 = Struct("<f")
+
+
+def float32(value):
+    """value rounded like a float in rio.c"""
+    return FLOAT32.unpack(FLOAT32.pack(value))[0]
+
+
+def ntc_celsius(volt, vref=3.3, r_series=10.0, r_25=10.0, beta=3950.0):
+    """temperature of a ntc (beta model) at the bottom of a voltage divider, resistors in kOhm"""
+    r_ntc = r_series * volt / (vref - volt)
+    return 1.0 / (math.log(r_ntc / r_25) / beta + 1.0 / (273.15 + 25.0)) - 273.15
+
+
+class TransferTable:
+    """
+    precomputed transfer function of a vin: raw value -> physical value
+
+    the function is sampled at size + 1 equidistant raw values from raw_min to raw_max,
+    lookup() interpolates linear between the samples and clamps outside of the range,
+    the same table and interpolation is emitted into rio.h (table_lookup)
+    """
+
+    def __init__(self, function, raw_min, raw_max, size=TABLE_SIZE, unit=""):
+        if size < 1 or raw_max <= raw_min:
+            raise ValueError(f"invalid table range: {raw_min}..{raw_max} / {size}")
+        self.raw_min = float32(raw_min)
+        self.raw_max = float32(raw_max)
+        self.size = size
+        self.unit = unit
+        # samples per raw unit
+        self.raw_scale = float32(size / (raw_max - raw_min))
+        self.values = []
+        for num in range(size + 1):
+            raw = raw_min + (raw_max - raw_min) * num / size
+            try:
+                value = function(raw)
+            except (ValueError, ZeroDivisionError):
+                value = math.nan
+            if not math.isfinite(value):
+                raise ValueError(f"transfer function is not defined at {raw}")
+            self.values.append(float32(value))
+
+    def lookup(self, value):
+        pos = (value - self.raw_min) * self.raw_scale
+        if pos <= 0.0:
+            return self.values[0]
+        if pos >= self.size:
+            return self.values[self.size]
+        index = int(pos)
+        return self.values[index] + (self.values[index + 1] - self.values[index]) * (pos - index)
+
+
+def vin_table(plugin, setup):
+    """
+    the TransferTable of a vin, None if the plugin has no table for this setup
+
+    plugins declare the transfer function with calculation_vin_table(setup) -> (function, raw_min, raw_max, unit),
+    the range and resolution can be overwritten per vin with table_min, table_max and table_size
+    """
+    if not hasattr(plugin, "calculation_vin_table"):
+        return None
+    declaration = plugin.calculation_vin_table(setup)
+    if declaration is None:
+        return None
+    function, raw_min, raw_max, unit = declaration
+    return TransferTable(
+        function,
+        float(setup.get("table_min", raw_min)),
+        float(setup.get("table_max", raw_max)),
+        int(setup.get("table_size", TABLE_SIZE)),
+        unit,
+    )
@@ -0,0 +1,323 @@
+# transports between the host tools (qt-testgui, rio-bench) and the board
+#
+# every transport has exchange(data) -> bytes: sends one frame and returns the answer frame
+#
+
+import mmap
+import os
+import struct
+import time
+
+
+class CH341():
+
+    DEFAULT_TIMEOUT         = 1000     # 1000mS for USB timeouts
+    BULK_WRITE_ENDPOINT     = 0x02
+    BULK_READ_ENDPOINT      = 0x82
+
+    PACKET_LENGTH     = 0x20
+    MAX_PACKETS       = 256
+    MAX_PACKET_LEN    = (PACKET_LENGTH * MAX_PACKETS)
+    USB_VENDOR       = 0x1A86
+    USB_PRODUCT      = 0x5512
+
+    CMD_SET_OUTPUT   = 0xA1
+    CMD_IO_ADDR      = 0xA2
+    CMD_PRINT_OUT    = 0xA3
+    CMD_SPI_STREAM   = 0xA8
+    CMD_SIO_STREAM   = 0xA9
+    CMD_I2C_STREAM   = 0xAA
+    CMD_UIO_STREAM   = 0xAB
+
+    CMD_I2C_STM_STA  = 0x74
+    CMD_I2C_STM_STO  = 0x75
+    CMD_I2C_STM_OUT  = 0x80
+    CMD_I2C_STM_IN   = 0xC0
+    CMD_I2C_STM_MAX  = min(0x3F, PACKET_LENGTH)
+    CMD_I2C_STM_SET  = 0x60
+    CMD_I2C_STM_US   = 0x40
+    CMD_I2C_STM_MS   = 0x50
+    CMD_I2C_STM_DLY  = 0x0F
+    CMD_I2C_STM_END  = 0x00
+
+    CMD_UIO_STM_IN   = 0x00
+    CMD_UIO_STM_DIR  = 0x40
+    CMD_UIO_STM_OUT  = 0x80
+    CMD_UIO_STM_US   = 0xC0
+    CMD_UIO_STM_END  = 0x20
+
+    STM_I2C_20K      = 0x00
+    STM_I2C_100K     = 0x01
+    STM_I2C_400K     = 0x02
+    STM_I2C_750K     = 0x03
+    STM_SPI_DBL      = 0x04
+
+    reverse_table = [
+        0x00, 0x80, 0x40, 0xc0, 0x20, 0xa0, 0x60, 0xe0,
+        0x10, 0x90, 0x50, 0xd0, 0x30, 0xb0, 0x70, 0xf0,
+        0x08, 0x88, 0x48, 0xc8, 0x28, 0xa8, 0x68, 0xe8,
+        0x18, 0x98, 0x58, 0xd8, 0x38, 0xb8, 0x78, 0xf8,
+        0x04, 0x84, 0x44, 0xc4, 0x24, 0xa4, 0x64, 0xe4,
+        0x14, 0x94, 0x54, 0xd4, 0x34, 0xb4, 0x74, 0xf4,
+        0x0c, 0x8c, 0x4c, 0xcc, 0x2c, 0xac, 0x6c, 0xec,
+        0x1c, 0x9c, 0x5c, 0xdc, 0x3c, 0xbc, 0x7c, 0xfc,
+        0x02, 0x82, 0x42, 0xc2, 0x22, 0xa2, 0x62, 0xe2,
+        0x12, 0x92, 0x52, 0xd2, 0x32, 0xb2, 0x72, 0xf2,
+        0x0a, 0x8a, 0x4a, 0xca, 0x2a, 0xaa, 0x6a, 0xea,
+        0x1a, 0x9a, 0x5a, 0xda, 0x3a, 0xba, 0x7a, 0xfa,
+        0x06, 0x86, 0x46, 0xc6, 0x26, 0xa6, 0x66, 0xe6,
+        0x16, 0x96, 0x56, 0xd6, 0x36, 0xb6, 0x76, 0xf6,
+        0x0e, 0x8e, 0x4e, 0xce, 0x2e, 0xae, 0x6e, 0xee,
+        0x1e, 0x9e, 0x5e, 0xde, 0x3e, 0xbe, 0x7e, 0xfe,
+        0x01, 0x81, 0x41, 0xc1, 0x21, 0xa1, 0x61, 0xe1,
+        0x11, 0x91, 0x51, 0xd1, 0x31, 0xb1, 0x71, 0xf1,
+        0x09, 0x89, 0x49, 0xc9, 0x29, 0xa9, 0x69, 0xe9,
+        0x19, 0x99, 0x59, 0xd9, 0x39, 0xb9, 0x79, 0xf9,
+        0x05, 0x85, 0x45, 0xc5, 0x25, 0xa5, 0x65, 0xe5,
+        0x15, 0x95, 0x55, 0xd5, 0x35, 0xb5, 0x75, 0xf5,
+        0x0d, 0x8d, 0x4d, 0xcd, 0x2d, 0xad, 0x6d, 0xed,
+        0x1d, 0x9d, 0x5d, 0xdd, 0x3d, 0xbd, 0x7d, 0xfd,
+        0x03, 0x83, 0x43, 0xc3, 0x23, 0xa3, 0x63, 0xe3,
+        0x13, 0x93, 0x53, 0xd3, 0x33, 0xb3, 0x73, 0xf3,
+        0x0b, 0x8b, 0x4b, 0xcb, 0x2b, 0xab, 0x6b, 0xeb,
+        0x1b, 0x9b, 0x5b, 0xdb, 0x3b, 0xbb, 0x7b, 0xfb,
+        0x07, 0x87, 0x47, 0xc7, 0x27, 0xa7, 0x67, 0xe7,
+        0x17, 0x97, 0x57, 0xd7, 0x37, 0xb7, 0x77, 0xf7,
+        0x0f, 0x8f, 0x4f, 0xcf, 0x2f, 0xaf, 0x6f, 0xef,
+        0x1f, 0x9f, 0x5f, 0xdf, 0x3f, 0xbf, 0x7f, 0xff
+    ]
+
+    def __init__(self, vid=USB_VENDOR, pid=USB_PRODUCT):
+        import usb.core
+        import usb.util
+
+        dev = usb.core.find(idVendor=vid, idProduct=pid)
+
+        if dev is None:
+            raise ConnectionError("Device not found (%x:%x)" % (vid, pid))
+        print(f'Found CH341 device ({vid:x}:{pid:x})')
+        if (dev.bNumConfigurations != 1):
+            raise ConnectionError("Device configuration error")
+        dev.set_configuration()
+        self.dev = dev
+
+
+        #cmd = [self.CMD_I2C_STREAM, self.CMD_UIO_STM_US | 100, self.CMD_UIO_STM_END]
+        #cnt = self.dev.write(self.BULK_WRITE_ENDPOINT, cmd)
+        #if (cnt != len(cmd)):
+        #    raise ConnectionError("Failed to issue Command")
+
+        cmd = [self.CMD_UIO_STREAM, self.CMD_UIO_STM_DIR | 0x3F, self.CMD_UIO_STM_END]
+        cnt = self.dev.write(self.BULK_WRITE_ENDPOINT, cmd)
+        if (cnt != len(cmd)):
+            raise ConnectionError("Failed to issue dir command")
+
+
+    def spi_trans(self, data):
+        cmd = [self.CMD_UIO_STREAM, self.CMD_UIO_STM_OUT | 0x36, self.CMD_UIO_STM_END]
+        cnt = self.dev.write(self.BULK_WRITE_ENDPOINT, cmd)
+        if (cnt != len(cmd)):
+            raise ConnectionError("Failed to issue select cs")
+
+        cmd = [self.CMD_SPI_STREAM]
+        for c in data:
+            cmd.append(self.reverse_table[c])
+
+        cnt = self.dev.write(self.BULK_WRITE_ENDPOINT, cmd)
+        #if (cnt != len(cmd)):
+        #    raise ConnectionError("Failed to write data")
+
+        data = self.dev.read(self.BULK_READ_ENDPOINT, cnt-1)
+
+        cmd = [self.CMD_UIO_STREAM, self.CMD_UIO_STM_OUT | 0x37, self.CMD_UIO_STM_END]
+        cnt = self.dev.write(self.BULK_WRITE_ENDPOINT, cmd)
+        if (cnt != len(cmd)):
+            raise ConnectionError("Failed to issue unselect cs")
+
+        ret = []
+        for c in data:
+            ret.append(self.reverse_table[c])
+
+        return list(ret)
+
+
+class UdpTransport:
+    """UDP bridge (W5500 / ESP32)"""
+
+    def __init__(self, ip, port, timeout=0.2, local_port=None):
+        import socket
+
+        self.address = (ip, port)
+        self.socket = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        self.socket.bind(("0.0.0.0", local_port or port))
+        self.socket.settimeout(timeout)
+        # clear buffer
+        try:
+            self.socket.recvfrom(100000)
+        except Exception:
+            pass
+
+    def exchange(self, data):
+        self.socket.sendto(data, self.address)
+        return self.socket.recvfrom(len(data) * 4)[0]
+
+
+class SerialTransport:
+    def __init__(self, device, baud):
+        import serial
+
+        self.serial = serial.Serial(device, baud, timeout=0.01)
+
+    def exchange(self, data):
+        # clean_buffer
+        while self.serial.inWaiting() > 0:
+            self.serial.read(1)
+        self.serial.write(data)
+        return self.serial.read(len(data))
+
+
+class SpidevTransport:
+    def __init__(self, speed, bus=0, device=1):
+        import spidev
+
+        self.spi = spidev.SpiDev()
+        self.spi.open(bus, device)
+        self.spi.max_speed_hz = speed
+        self.spi.mode = 0
+        self.spi.lsbfirst = False
+
+    def exchange(self, data):
+        return bytes(self.spi.xfer2(list(data)))
+
+
+class Ch341Transport:
+    def __init__(self):
+        self.ch341 = CH341()
+
+    def exchange(self, data):
+        return bytes(self.ch341.spi_trans(data))
+
+
+class FtdiTransport:
+    def __init__(self, url="ftdi://ftdi:2232h/2"):
+        from pyftdi.spi import SpiController
+
+        self.controller = SpiController(cs_count=2)
+        self.controller.configure(url)
+        self.port = self.controller.get_port(cs=0, freq=1e6, mode=0)
+
+    def exchange(self, data):
+        return self.port.exchange(data, duplex=True)
+
+
+# shared memory mailbox (/dev/shm/<name>), all fields little endian:
+#   0: magic, 4: frame size, 8: request sequence, 12: answer sequence,
+#   16: request frame (host -> fpga), SHM_HEADER + shm_slot(size): answer frame (fpga -> host)
+# the host owns the request frame while request == answer, it writes the frame and then increments request,
+# the board owns the answer frame while request != answer, it writes the answer and then sets answer = request
+# python has no memory fences: the stores are only ordered on x86 (TSO), so the readers re-check the
+# sequence after copying a frame and retry on a change, a copy that raced with the writer is never returned
+SHM_MAGIC = 0x6F697273
+SHM_HEADER = 16
+# polls before yielding the cpu while waiting for the other side
+SHM_SPINS = 100
+
+
+def shm_slot(size):
+    return (size + 3) // 4 * 4
+
+
+class ShmMailbox:
+    def __init__(self, filename, size):
+        self.size = size
+        self.answer_offset = SHM_HEADER + shm_slot(size)
+        length = self.answer_offset + shm_slot(size)
+        fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if os.fstat(fd).st_size != length:
+                os.ftruncate(fd, length)
+            self.mm = mmap.mmap(fd, length)
+        finally:
+            os.close(fd)
+        self.view = memoryview(self.mm)
+        self.header = struct.Struct("<IIII")
+        self.pending_request = None
+        magic, fsize, request, answer = self.header.unpack_from(self.mm, 0)
+        if magic != SHM_MAGIC or fsize != size:
+            self.header.pack_into(self.mm, 0, SHM_MAGIC, size, 0, 0)
+
+    def sequences(self):
+        return self.header.unpack_from(self.mm, 0)[2:]
+
+    def request(self, data, timeout):
+        """host side: posts one frame and waits (spinning, no syscalls) for the answer"""
+        self.post(data)
+        return self.wait(timeout)
+
+    def post(self, data):
+        """host side: posts one frame"""
+        request, answer = self.sequences()
+        self.view[SHM_HEADER : SHM_HEADER + self.size] = data
+        struct.pack_into("<I", self.mm, 8, (request + 1) & 0xFFFFFFFF)
+
+    def wait(self, timeout):
+        """host side: waits for the answer to the posted frame"""
+        request = self.sequences()[0]
+        deadline = time.perf_counter() + timeout
+        spins = 0
+        while True:
+            if struct.unpack_from("<I", self.mm, 12)[0] == request:
+                data = bytes(self.view[self.answer_offset : self.answer_offset + self.size])
+                if struct.unpack_from("<I", self.mm, 12)[0] == request:
+                    return data
+            spins += 1
+            if spins > SHM_SPINS:
+                # the board is slow (or shares the cpu): give it the cpu
+                os.sched_yield()
+                if time.perf_counter() > deadline:
+                    raise TimeoutError("shm: no answer")
+
+    def pending(self):
+        """board side: the request frame if there is an unanswered one"""
+        while True:
+            request, answer = self.sequences()
+            if request == answer:
+                return None
+            data = bytes(self.view[SHM_HEADER : SHM_HEADER + self.size])
+            if self.sequences()[0] == request:
+                self.pending_request = request
+                return data
+
+    def answer(self, data):
+        """board side: publishes the answer to the pending request"""
+        # answers the request that pending() copied, not a newer one posted meanwhile
+        request = self.pending_request if self.pending_request is not None else self.sequences()[0]
+        self.view[self.answer_offset : self.answer_offset + self.size] = data
+        struct.pack_into("<I", self.mm, 12, request)
+
+
+class ShmTransport:
+    """shared memory mailbox with the verilator simulation or rio.c (TRANSPORT_SHM)"""
+
+    def __init__(self, filename, size, timeout=0.2):
+        self.mailbox = ShmMailbox(filename, size)
+        self.timeout = timeout
+
+    def exchange(self, data):
+        return self.mailbox.request(data, self.timeout)
+
+
+def open_transport(project, device, baud=1000000, port=2390, timeout=0.2, local_port=None):
+    """the transport for a device: /dev/tty*, /dev/shm/*, CH341, FTDI, an ip address or spidev (no device)"""
+    if device and device.startswith("/dev/tty"):
+        return SerialTransport(device, baud)
+    elif device and device.startswith("/dev/shm/"):
+        return ShmTransport(device, project["data_size"] // 8, timeout)
+    elif device and device.startswith("CH341"):
+        return Ch341Transport()
+    elif device and device.startswith("FTDI"):
+        return FtdiTransport()
+    elif device:
+        print("IP:", device)
+        return UdpTransport(device, port, timeout, local_port)
+    return SpidevTransport(project["jdata"]["interface"][0].get("max", baud))